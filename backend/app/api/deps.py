@@ -1,28 +1,24 @@
-from typing import Generator, Optional
+from typing import Optional
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
 from ..core.config import settings
 from ..core.security import SecurityUtils
-from ..db.session import get_session, get_redis
+from ..db.session import get_db, get_redis
 from ..db.models.user import User, UserRole
 from redis import Redis
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-def get_db() -> Generator[Session, None, None]:
-    """Dependency for database session"""
-    return get_session()
-
 def get_redis_client() -> Redis:
     """Dependency for Redis client"""
     return get_redis()
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """Get current authenticated user"""
@@ -41,7 +37,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.get(User, int(user_id))
+    user = await db.get(User, int(user_id))
     if not user:
         raise credentials_exception
     if not user.is_active:
@@ -53,7 +49,7 @@ async def get_current_user(
     # Update last login
     user.last_login = datetime.utcnow()
     db.add(user)
-    db.commit()
+    await db.commit()
     
     return user
 
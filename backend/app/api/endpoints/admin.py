@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, List
 from ..models.user import User
+from ..deps import get_current_active_superuser
+from ...core.monitoring.query_profiler import query_profiler
 from ..models.subscription import Subscription
 
 router = APIRouter()
@@ -15,4 +17,18 @@ async def get_subscriptions():
     # Logic to retrieve subscriptions
     return []
 
+@router.get("/admin/slow-queries", response_model=List[Dict[str, Any]])
+async def get_slow_queries(
+    grouped: bool = Query(True, description="Group the log by statement fingerprint"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Any = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Recent slow statements and N+1 suspects from all workers and tasks.
+    Only accessible by superadmin.
+    """
+    if grouped:
+        return (await query_profiler.report())[:limit]
+    return await query_profiler.recent(limit)
+
 # Add more endpoints as needed
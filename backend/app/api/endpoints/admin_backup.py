@@ -1,10 +1,12 @@
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
 
 from ...db.session import get_session
 from ...db.models.user import User
+from ...db.models.backup import BackupMetadata
 from ...services.backup import backup_service
 from ...services.activity_logger import ActivityLogger
 from ..deps import get_current_active_superuser
@@ -15,7 +17,7 @@ router = APIRouter()
 @router.post("/backups/create", response_model=Dict[str, Any])
 async def create_backup(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser),
     background_tasks: BackgroundTasks
 ) -> Any:
@@ -25,10 +27,10 @@ async def create_backup(
     """
     try:
         # Check if another backup is in progress
-        recent_backup = db.query(BackupMetadata).filter(
+        recent_backup = (await db.exec(select(BackupMetadata).where(
             BackupMetadata.status == "in_progress",
             BackupMetadata.timestamp >= datetime.utcnow() - timedelta(hours=1)
-        ).first()
+        ))).first()
         
         if recent_backup:
             raise HTTPException(
@@ -67,7 +69,7 @@ async def create_backup(
 async def restore_backup(
     *,
     backup_path: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser),
     background_tasks: BackgroundTasks
 ) -> Any:
@@ -77,7 +79,9 @@ async def restore_backup(
     """
     try:
         # Validate backup exists
-        backup = db.query(BackupMetadata).filter_by(backup_path=backup_path).first()
+        backup = (await db.exec(
+            select(BackupMetadata).where(BackupMetadata.backup_path == backup_path)
+        )).first()
         if not backup:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -85,10 +89,10 @@ async def restore_backup(
             )
         
         # Check if restore is already in progress
-        recent_restore = db.query(BackupMetadata).filter(
+        recent_restore = (await db.exec(select(BackupMetadata).where(
             BackupMetadata.status == "restoring",
             BackupMetadata.timestamp >= datetime.utcnow() - timedelta(hours=1)
-        ).first()
+        ))).first()
         
         if recent_restore:
             raise HTTPException(
@@ -129,7 +133,7 @@ async def restore_backup(
 @router.get("/backups", response_model=List[Dict[str, Any]])
 async def list_backups(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
@@ -157,7 +161,7 @@ async def list_backups(
 async def delete_backup(
     *,
     backup_path: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
@@ -166,7 +170,9 @@ async def delete_backup(
     """
     try:
         # Validate backup exists
-        backup = db.query(BackupMetadata).filter_by(backup_path=backup_path).first()
+        backup = (await db.exec(
+            select(BackupMetadata).where(BackupMetadata.backup_path == backup_path)
+        )).first()
         if not backup:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -202,7 +208,7 @@ async def delete_backup(
 @router.get("/backups/status", response_model=Dict[str, Any])
 async def get_backup_status(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
@@ -211,9 +217,9 @@ async def get_backup_status(
     """
     try:
         # Get recent backups
-        recent_backups = db.query(BackupMetadata).filter(
+        recent_backups = (await db.exec(select(BackupMetadata).where(
             BackupMetadata.timestamp >= datetime.utcnow() - timedelta(days=7)
-        ).all()
+        ))).all()
         
         # Calculate statistics
         total_size = sum(b.size_bytes for b in recent_backups)
@@ -2,7 +2,8 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...core.config import settings
 from ...core.security import (
@@ -20,7 +21,7 @@ router = APIRouter()
 @router.post("/register", response_model=UserRead)
 async def register(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_in: UserCreate
 ) -> Any:
     """
@@ -34,9 +35,9 @@ async def register(
         )
 
     # Check if user exists
-    user = db.exec(
+    user = (await db.exec(
         select(User).where(User.phone == user_in.phone)
-    ).first()
+    )).first()
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -51,23 +52,23 @@ async def register(
         telegram_id=user_in.telegram_id
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     return db_user
 
 @router.post("/login/access-token")
 async def login_access_token(
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
     """
     # Try to authenticate the user
-    user = db.exec(
+    user = (await db.exec(
         select(User).where(User.phone == form_data.username)
-    ).first()
+    )).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -133,14 +134,14 @@ async def request_2fa(
 @router.post("/password-reset/request")
 async def request_password_reset(
     phone: str,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ) -> Any:
     """
     Request password reset via 2FA.
     """
-    user = db.exec(
+    user = (await db.exec(
         select(User).where(User.phone == phone)
-    ).first()
+    )).first()
     if not user:
         # Return success even if user doesn't exist to prevent user enumeration
         return {"msg": "If user exists, reset code will be sent"}
@@ -165,14 +166,14 @@ async def verify_password_reset(
     phone: str,
     code: str,
     new_password: str,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ) -> Any:
     """
     Reset password using 2FA code.
     """
-    user = db.exec(
+    user = (await db.exec(
         select(User).where(User.phone == phone)
-    ).first()
+    )).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -187,7 +188,7 @@ async def verify_password_reset(
 
     user.hashed_password = get_password_hash(new_password)
     db.add(user)
-    db.commit()
+    await db.commit()
 
     return {"msg": "Password reset successful"}
 
@@ -196,15 +197,15 @@ async def link_telegram(
     *,
     telegram_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ) -> Any:
     """
     Link Telegram account to user profile.
     """
     # Check if Telegram ID is already linked
-    existing_user = db.exec(
+    existing_user = (await db.exec(
         select(User).where(User.telegram_id == telegram_id)
-    ).first()
+    )).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -213,8 +214,8 @@ async def link_telegram(
 
     current_user.telegram_id = telegram_id
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
 
     return current_user
 
@@ -230,12 +231,12 @@ async def read_current_user(
 @router.post("/logout")
 async def logout(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ) -> Any:
     """
     Logout current user (update last logout time).
     """
     current_user.last_login = None
     db.add(current_user)
-    db.commit()
+    await db.commit()
     return {"msg": "Successfully logged out"}
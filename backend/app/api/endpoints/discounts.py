@@ -1,6 +1,7 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
 from ...db.session import get_session
@@ -20,7 +21,7 @@ router = APIRouter()
 @router.get("/", response_model=List[DiscountRead])
 async def list_discounts(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff),
     skip: int = 0,
     limit: int = 100,
@@ -43,13 +44,13 @@ async def list_discounts(
         query = query.where(Discount.status == DiscountStatus.ACTIVE)
     
     # Apply pagination
-    discounts = db.exec(query.offset(skip).limit(limit)).all()
+    discounts = (await db.exec(query.offset(skip).limit(limit))).all()
     return discounts
 
 @router.post("/", response_model=DiscountRead)
 async def create_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_in: DiscountCreate,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -58,9 +59,9 @@ async def create_discount(
     Only accessible by admin.
     """
     # Check if code already exists
-    existing_discount = db.exec(
+    existing_discount = (await db.exec(
         select(Discount).where(Discount.code == discount_in.code)
-    ).first()
+    )).first()
     if existing_discount:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,15 +78,15 @@ async def create_discount(
     # Create discount
     discount = Discount(**discount_in.dict())
     db.add(discount)
-    db.commit()
-    db.refresh(discount)
+    await db.commit()
+    await db.refresh(discount)
     
     return discount
 
 @router.get("/{discount_id}", response_model=DiscountRead)
 async def get_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
@@ -93,7 +94,7 @@ async def get_discount(
     Get discount by ID.
     Only accessible by admin and support staff.
     """
-    discount = db.get(Discount, discount_id)
+    discount = await db.get(Discount, discount_id)
     if not discount:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -104,7 +105,7 @@ async def get_discount(
 @router.put("/{discount_id}", response_model=DiscountRead)
 async def update_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_id: int,
     discount_in: DiscountUpdate,
     current_user: User = Depends(get_current_active_superuser)
@@ -113,7 +114,7 @@ async def update_discount(
     Update discount.
     Only accessible by admin.
     """
-    discount = db.get(Discount, discount_id)
+    discount = await db.get(Discount, discount_id)
     if not discount:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -126,14 +127,14 @@ async def update_discount(
         setattr(discount, field, value)
     
     db.add(discount)
-    db.commit()
-    db.refresh(discount)
+    await db.commit()
+    await db.refresh(discount)
     return discount
 
 @router.delete("/{discount_id}")
 async def delete_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -141,7 +142,7 @@ async def delete_discount(
     Delete discount.
     Only accessible by admin.
     """
-    discount = db.get(Discount, discount_id)
+    discount = await db.get(Discount, discount_id)
     if not discount:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -152,14 +153,14 @@ async def delete_discount(
     discount.is_deleted = True
     discount.status = DiscountStatus.DISABLED
     db.add(discount)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Discount successfully deleted"}
 
 @router.post("/{discount_id}/activate")
 async def activate_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -167,7 +168,7 @@ async def activate_discount(
     Activate disabled discount.
     Only accessible by admin.
     """
-    discount = db.get(Discount, discount_id)
+    discount = await db.get(Discount, discount_id)
     if not discount:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -182,15 +183,15 @@ async def activate_discount(
     
     discount.status = DiscountStatus.ACTIVE
     db.add(discount)
-    db.commit()
-    db.refresh(discount)
+    await db.commit()
+    await db.refresh(discount)
     
     return discount
 
 @router.post("/{discount_id}/deactivate")
 async def deactivate_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     discount_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -198,7 +199,7 @@ async def deactivate_discount(
     Deactivate active discount.
     Only accessible by admin.
     """
-    discount = db.get(Discount, discount_id)
+    discount = await db.get(Discount, discount_id)
     if not discount:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -213,15 +214,15 @@ async def deactivate_discount(
     
     discount.status = DiscountStatus.DISABLED
     db.add(discount)
-    db.commit()
-    db.refresh(discount)
+    await db.commit()
+    await db.refresh(discount)
     
     return discount
 
 @router.get("/verify/{code}")
 async def verify_discount(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     code: str,
     amount: float,
     current_user: User = Depends(get_current_active_user)
@@ -229,9 +230,9 @@ async def verify_discount(
     """
     Verify discount code and calculate discount amount.
     """
-    discount = db.exec(
+    discount = (await db.exec(
         select(Discount).where(Discount.code == code)
-    ).first()
+    )).first()
     
     if not discount or not discount.is_valid:
         raise HTTPException(
@@ -267,14 +268,14 @@ async def verify_discount(
 @router.get("/stats")
 async def get_discount_stats(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """
     Get discount usage statistics.
     Only accessible by admin and support staff.
     """
-    discounts = db.exec(select(Discount)).all()
+    discounts = (await db.exec(select(Discount))).all()
     
     total_discounts = len(discounts)
     active_discounts = sum(1 for d in discounts if d.status == DiscountStatus.ACTIVE)
@@ -282,7 +283,7 @@ async def get_discount_stats(
     
     # Calculate total discount amount given
     from ...db.models.payment import Payment
-    payments = db.exec(select(Payment)).all()
+    payments = (await db.exec(select(Payment))).all()
     total_discount_amount = sum(p.discount_amount for p in payments if p.discount_amount > 0)
     
     return {
@@ -1,7 +1,10 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlmodel import Session, select
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime, timedelta
 
 from ...db.session import get_session
 from ...db.models.payment import (
@@ -15,45 +18,71 @@ from ...db.models.payment import (
 )
 from ...db.models.user import User, UserRole
 from ...db.models.discount import Discount
-from ..deps import get_current_active_user, get_current_active_staff
+from ...db.models.subscription import Subscription
+from ..deps import get_current_active_user, get_current_active_staff, get_current_active_superuser
+from ..pagination import paginate, ndjson_export
 
 router = APIRouter()
 
+# Relationships serialized by PaymentRead; an async session can't lazy-load them
+PAYMENT_READ_OPTIONS = [selectinload(Payment.user), selectinload(Payment.subscription)]
+
+def _payments_query(
+    user_id: Optional[int] = None,
+    status: Optional[PaymentStatus] = None,
+    payment_type: Optional[PaymentType] = None
+):
+    query = select(Payment).options(*PAYMENT_READ_OPTIONS)
+    if user_id is not None:
+        query = query.where(Payment.user_id == user_id)
+    if status:
+        query = query.where(Payment.status == status)
+    if payment_type:
+        query = query.where(Payment.payment_type == payment_type)
+    return query
+
 @router.get("/", response_model=List[PaymentRead])
 async def list_payments(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
+    response: Response,
     current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[PaymentStatus] = None,
     payment_type: Optional[PaymentType] = None
 ) -> Any:
     """
-    Retrieve payments.
+    Retrieve payments, newest first.
+    The X-Next-Cursor response header is the cursor of the next page.
     Regular users can only see their own payments.
     Staff can see all payments.
     """
-    query = select(Payment)
-    
     # Regular users can only see their own payments
-    if current_user.role not in [UserRole.ADMIN, UserRole.SUPPORT]:
-        query = query.where(Payment.user_id == current_user.id)
-    
-    # Apply filters
-    if status:
-        query = query.where(Payment.status == status)
-    if payment_type:
-        query = query.where(Payment.payment_type == payment_type)
-    
-    # Apply pagination
-    payments = db.exec(query.offset(skip).limit(limit)).all()
-    return payments
+    is_staff = current_user.role in [UserRole.ADMIN, UserRole.SUPPORT]
+    query = _payments_query(None if is_staff else current_user.id, status, payment_type)
+    return await paginate(db, response, query, Payment, cursor=cursor, skip=skip, limit=limit)
+
+@router.get("/export")
+async def export_payments(
+    *,
+    current_user: User = Depends(get_current_active_superuser),
+    user_id: Optional[int] = None,
+    status: Optional[PaymentStatus] = None,
+    payment_type: Optional[PaymentType] = None
+) -> StreamingResponse:
+    """
+    Stream all matching payments as NDJSON.
+    Only accessible by admin.
+    """
+    query = _payments_query(user_id, status, payment_type)
+    return ndjson_export(query, Payment, PaymentRead, "payments")
 
 @router.post("/", response_model=PaymentRead)
 async def create_payment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_in: PaymentCreate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -63,9 +92,9 @@ async def create_payment(
     # Calculate final amount with discount if provided
     final_amount = payment_in.amount
     if payment_in.discount_code:
-        discount = db.exec(
+        discount = (await db.exec(
             select(Discount).where(Discount.code == payment_in.discount_code)
-        ).first()
+        )).first()
         if not discount or not discount.is_valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -97,15 +126,14 @@ async def create_payment(
     )
     
     db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    await db.commit()
     
-    return payment
+    return await db.get(Payment, payment.id, options=PAYMENT_READ_OPTIONS, populate_existing=True)
 
 @router.get("/{payment_id}", response_model=PaymentRead)
 async def get_payment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -113,7 +141,7 @@ async def get_payment(
     Get payment by ID.
     Regular users can only access their own payments.
     """
-    payment = db.get(Payment, payment_id)
+    payment = await db.get(Payment, payment_id, options=PAYMENT_READ_OPTIONS)
     if not payment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -133,7 +161,7 @@ async def get_payment(
 @router.post("/{payment_id}/upload-receipt")
 async def upload_receipt(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_id: int,
     receipt: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user)
@@ -141,7 +169,7 @@ async def upload_receipt(
     """
     Upload payment receipt.
     """
-    payment = db.get(Payment, payment_id)
+    payment = await db.get(Payment, payment_id)
     if not payment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -175,14 +203,14 @@ async def upload_receipt(
     payment.receipt_image = filepath
     payment.status = PaymentStatus.PENDING
     db.add(payment)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Receipt uploaded successfully"}
 
 @router.post("/{payment_id}/verify")
 async def verify_payment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
@@ -190,7 +218,7 @@ async def verify_payment(
     Verify payment and mark as completed.
     Only accessible by admin and support staff.
     """
-    payment = db.get(Payment, payment_id)
+    payment = await db.get(Payment, payment_id)
     if not payment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -208,29 +236,30 @@ async def verify_payment(
     
     # Update user wallet if payment type is wallet charge
     if payment.payment_type == PaymentType.WALLET_CHARGE:
-        user = db.get(User, payment.user_id)
+        user = await db.get(User, payment.user_id)
         user.wallet_balance += payment.final_amount
         db.add(user)
     
     # Update subscription if payment type is subscription
-    elif payment.payment_type == PaymentType.SUBSCRIPTION and payment.subscription:
-        subscription = payment.subscription
-        if subscription.status == "pending":
-            subscription.status = "active"
-        elif subscription.status == "active":
-            # Extend subscription period
-            subscription.end_date += timedelta(days=30)  # Assuming monthly subscription
-        db.add(subscription)
+    elif payment.payment_type == PaymentType.SUBSCRIPTION and payment.subscription_id:
+        subscription = await db.get(Subscription, payment.subscription_id)
+        if subscription:
+            if subscription.status == "pending":
+                subscription.status = "active"
+            elif subscription.status == "active":
+                # Extend subscription period
+                subscription.end_date += timedelta(days=30)  # Assuming monthly subscription
+            db.add(subscription)
     
     db.add(payment)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Payment verified successfully"}
 
 @router.post("/{payment_id}/reject")
 async def reject_payment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_id: int,
     reason: str,
     current_user: User = Depends(get_current_active_staff)
@@ -239,7 +268,7 @@ async def reject_payment(
     Reject payment.
     Only accessible by admin and support staff.
     """
-    payment = db.get(Payment, payment_id)
+    payment = await db.get(Payment, payment_id)
     if not payment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -255,14 +284,14 @@ async def reject_payment(
     payment.status = PaymentStatus.FAILED
     payment.description = f"Rejected: {reason}"
     db.add(payment)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Payment rejected successfully"}
 
 @router.post("/{payment_id}/refund")
 async def refund_payment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     payment_id: int,
     reason: str,
     current_user: User = Depends(get_current_active_superuser)
@@ -271,7 +300,7 @@ async def refund_payment(
     Refund payment.
     Only accessible by admin.
     """
-    payment = db.get(Payment, payment_id)
+    payment = await db.get(Payment, payment_id)
     if not payment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -301,16 +330,14 @@ async def refund_payment(
     
     db.add(refund)
     db.add(payment)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Payment refunded successfully"}
 
-from ..deps import get_current_active_superuser
-
 @router.get("/stats")
 async def get_payment_stats(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_superuser),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None
@@ -327,7 +354,7 @@ async def get_payment_stats(
     if end_date:
         query = query.where(Payment.created_at <= end_date)
     
-    payments = db.exec(query).all()
+    payments = (await db.exec(query)).all()
     
     # Calculate statistics
     total_revenue = sum(p.final_amount for p in payments if p.status == PaymentStatus.COMPLETED)
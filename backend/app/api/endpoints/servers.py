@@ -1,7 +1,8 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...db.session import get_session, cache
 from ...db.models.server import (
@@ -11,18 +12,52 @@ from ...db.models.server import (
     ServerRead,
     ServerWithStats,
     ServerStatus,
-    ServerLocation
+    ServerLocation,
+    PanelInfo,
+    InboundConfig,
+    SystemStatus,
+    TrafficStats,
+    PanelSettings
 )
+from ...db.models.subscription import Subscription
 from ...db.models.user import User, UserRole
 from ..deps import get_current_active_staff, get_current_active_superuser, get_current_active_user
+from ...services.xui_service import XUIService
+from ...core.server_connector.coalescer import panel_reads
+from ...core.monitoring.uptime import uptime_engine
 
 router = APIRouter()
 
+async def _active_subscription_totals(
+    db: AsyncSession,
+    server_ids: Optional[List[int]] = None
+) -> Dict[int, Tuple[int, float]]:
+    """Active subscription count and used traffic (GB) per server, summed in SQL"""
+    query = (
+        select(
+            Subscription.server_id,
+            func.count(Subscription.id),
+            func.coalesce(func.sum(Subscription.used_traffic), 0)
+        )
+        .where(Subscription.status == "active")
+        .group_by(Subscription.server_id)
+    )
+    if server_ids is not None:
+        query = query.where(Subscription.server_id.in_(server_ids))
+    rows = (await db.exec(query)).all()
+    return {server_id: (count, float(used)) for server_id, count, used in rows}
+
+def _apply_subscription_totals(server: Server, totals: Optional[Tuple[int, float]]) -> None:
+    count, used = totals or (0, 0.0)
+    server.total_bandwidth_used = used
+    server.average_user_bandwidth = used / count if count else 0
+    server.subscription_count = count
+
 @router.get("/", response_model=List[ServerRead])
 @cache(ttl_seconds=300)  # Cache for 5 minutes
 async def list_servers(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user),
     skip: int = 0,
     limit: int = 100,
@@ -47,53 +82,48 @@ async def list_servers(
         )
     
     # Apply pagination
-    servers = db.exec(query.offset(skip).limit(limit)).all()
+    servers = (await db.exec(query.offset(skip).limit(limit))).all()
     return servers
 
 @router.get("/stats", response_model=List[ServerWithStats])
 @cache(ttl_seconds=300)  # Cache for 5 minutes
 async def get_server_stats(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """
     Get detailed server statistics.
     Only accessible by admin and support staff.
     """
-    servers = db.exec(
+    servers = (await db.exec(
         select(Server).where(Server.is_deleted == False)
-    ).all()
+    )).all()
+    await uptime_engine.load(server.id for server in servers)
+    
+    # One grouped query for every server instead of loading subscriptions
+    totals = await _active_subscription_totals(db)
     
     # Calculate additional statistics for each server
     for server in servers:
-        # Get subscriptions for the last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        subscriptions = server.subscriptions
-        active_subs = [s for s in subscriptions if s.status == "active"]
+        _apply_subscription_totals(server, totals.get(server.id))
         
-        server.total_bandwidth_used = sum(s.data_used for s in active_subs)
-        server.average_user_bandwidth = (
-            server.total_bandwidth_used / len(active_subs) if active_subs else 0
-        )
-        server.subscription_count = len(active_subs)
-        
-        # Calculate uptime (placeholder - should be implemented with actual monitoring)
-        server.uptime_percentage = 99.9
+        # Rolling 30 day availability from liveness probes
+        server.uptime_percentage = uptime_engine.uptime_percentage(server.id)
     
     return servers
 
 @router.get("/{server_id}", response_model=ServerWithStats)
 async def get_server(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Get server by ID with detailed statistics.
     """
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -101,20 +131,17 @@ async def get_server(
         )
     
     # Calculate statistics
-    active_subs = [s for s in server.subscriptions if s.status == "active"]
-    server.total_bandwidth_used = sum(s.data_used for s in active_subs)
-    server.average_user_bandwidth = (
-        server.total_bandwidth_used / len(active_subs) if active_subs else 0
-    )
-    server.subscription_count = len(active_subs)
-    server.uptime_percentage = 99.9  # Placeholder
+    totals = await _active_subscription_totals(db, [server.id])
+    _apply_subscription_totals(server, totals.get(server.id))
+    await uptime_engine.load([server.id])
+    server.uptime_percentage = uptime_engine.uptime_percentage(server.id)
     
     return server
 
 @router.post("/", response_model=ServerRead)
 async def create_server(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_in: ServerCreate,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -124,14 +151,14 @@ async def create_server(
     """
     server = Server(**server_in.dict())
     db.add(server)
-    db.commit()
-    db.refresh(server)
+    await db.commit()
+    await db.refresh(server)
     return server
 
 @router.put("/{server_id}", response_model=ServerRead)
 async def update_server(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     server_in: ServerUpdate,
     current_user: User = Depends(get_current_active_superuser)
@@ -140,7 +167,7 @@ async def update_server(
     Update server.
     Only accessible by admin.
     """
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -153,14 +180,14 @@ async def update_server(
         setattr(server, field, value)
     
     db.add(server)
-    db.commit()
-    db.refresh(server)
+    await db.commit()
+    await db.refresh(server)
     return server
 
 @router.delete("/{server_id}")
 async def delete_server(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -168,7 +195,7 @@ async def delete_server(
     Delete server.
     Only accessible by admin.
     """
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -176,8 +203,8 @@ async def delete_server(
         )
     
     # Check if server has active subscriptions
-    active_subs = [s for s in server.subscriptions if s.status == "active"]
-    if active_subs:
+    totals = await _active_subscription_totals(db, [server.id])
+    if server.id in totals:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete server with active subscriptions"
@@ -187,14 +214,14 @@ async def delete_server(
     server.is_deleted = True
     server.status = ServerStatus.OFFLINE
     db.add(server)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Server successfully deleted"}
 
 @router.post("/{server_id}/status")
 async def update_server_status(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     new_status: ServerStatus,
     current_user: User = Depends(get_current_active_staff)
@@ -203,7 +230,7 @@ async def update_server_status(
     Update server status.
     Accessible by admin and support staff.
     """
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -212,19 +239,19 @@ async def update_server_status(
     
     server.status = new_status
     db.add(server)
-    db.commit()
-    db.refresh(server)
+    await db.commit()
+    await db.refresh(server)
     return server
 
 @router.get("/{server_id}/panel-info", response_model=PanelInfo)
 async def get_panel_info(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """Get panel information for a server"""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -233,7 +260,10 @@ async def get_panel_info(
     
     try:
         xui = XUIService(server)
-        return await xui.get_panel_info()
+        return await panel_reads.do(
+            (server.id, "panel-info"),
+            xui.get_panel_info
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -243,12 +273,12 @@ async def get_panel_info(
 @router.get("/{server_id}/system-status", response_model=SystemStatus)
 async def get_system_status(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """Get detailed system status for a server"""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -257,7 +287,10 @@ async def get_system_status(
     
     try:
         xui = XUIService(server)
-        return await xui.get_system_status()
+        return await panel_reads.do(
+            (server.id, "system-status"),
+            xui.get_system_status
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -267,12 +300,12 @@ async def get_system_status(
 @router.get("/{server_id}/inbounds", response_model=List[InboundConfig])
 async def list_inbounds(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """List all inbound configurations for a server"""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -281,7 +314,10 @@ async def list_inbounds(
     
     try:
         xui = XUIService(server)
-        return await xui.list_inbounds()
+        return await panel_reads.do(
+            (server.id, "inbounds"),
+            xui.list_inbounds
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -291,13 +327,13 @@ async def list_inbounds(
 @router.get("/{server_id}/inbounds/{inbound_id}/traffic", response_model=TrafficStats)
 async def get_inbound_traffic(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     inbound_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """Get traffic statistics for a specific inbound"""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -316,12 +352,12 @@ async def get_inbound_traffic(
 @router.post("/{server_id}/backup")
 async def backup_server_config(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """Backup server configuration. Only accessible by admin."""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -341,13 +377,13 @@ async def backup_server_config(
 @router.post("/{server_id}/restore")
 async def restore_server_config(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     backup_data: Dict,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """Restore server configuration. Only accessible by admin."""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -357,6 +393,7 @@ async def restore_server_config(
     try:
         xui = XUIService(server)
         success = await xui.restore_config(backup_data)
+        panel_reads.forget((server.id, "inbounds"))
         if success:
             return {"msg": "Server configuration restored successfully"}
         raise HTTPException(
@@ -372,13 +409,13 @@ async def restore_server_config(
 @router.put("/{server_id}/settings")
 async def update_panel_settings(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     settings: PanelSettings,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """Update panel settings. Only accessible by admin."""
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -388,6 +425,7 @@ async def update_panel_settings(
     try:
         xui = XUIService(server)
         success = await xui.update_panel_settings(settings)
+        panel_reads.forget((server.id, "panel-info"))
         if success:
             return {"msg": "Panel settings updated successfully"}
         raise HTTPException(
@@ -403,7 +441,7 @@ async def update_panel_settings(
 @router.post("/{server_id}/sync")
 async def sync_server_stats(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     server_id: int,
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
@@ -411,7 +449,7 @@ async def sync_server_stats(
     Synchronize server statistics with 3x-ui panel.
     Accessible by admin and support staff.
     """
-    server = db.get(Server, server_id)
+    server = await db.get(Server, server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,6 +1,8 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
 
 from ...db.session import get_session
@@ -14,42 +16,62 @@ from ...db.models.subscription import (
 from ...db.models.user import User, UserRole
 from ...db.models.server import Server, ServerStatus
 from ...db.models.payment import Payment, PaymentStatus, PaymentType
-from ..deps import get_current_active_user, get_current_active_staff
+from ..deps import get_current_active_user, get_current_active_staff, get_current_active_superuser
+from ..pagination import paginate, ndjson_export
 
 router = APIRouter()
 
+def _subscriptions_query(
+    user_id: Optional[int] = None,
+    status: Optional[SubscriptionStatus] = None
+):
+    query = select(Subscription)
+    if user_id is not None:
+        query = query.where(Subscription.user_id == user_id)
+    if status:
+        query = query.where(Subscription.status == status)
+    return query
+
 @router.get("/", response_model=List[SubscriptionRead])
 async def list_subscriptions(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
+    response: Response,
     current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[SubscriptionStatus] = None
 ) -> Any:
     """
-    Retrieve subscriptions.
+    Retrieve subscriptions, newest first.
+    The X-Next-Cursor response header is the cursor of the next page.
     Regular users can only see their own subscriptions.
     Staff can see all subscriptions.
     """
-    query = select(Subscription)
-    
     # Regular users can only see their own subscriptions
-    if current_user.role not in [UserRole.ADMIN, UserRole.SUPPORT]:
-        query = query.where(Subscription.user_id == current_user.id)
-    
-    # Apply filters
-    if status:
-        query = query.where(Subscription.status == status)
-    
-    # Apply pagination
-    subscriptions = db.exec(query.offset(skip).limit(limit)).all()
-    return subscriptions
+    is_staff = current_user.role in [UserRole.ADMIN, UserRole.SUPPORT]
+    query = _subscriptions_query(None if is_staff else current_user.id, status)
+    return await paginate(db, response, query, Subscription, cursor=cursor, skip=skip, limit=limit)
+
+@router.get("/export")
+async def export_subscriptions(
+    *,
+    current_user: User = Depends(get_current_active_superuser),
+    user_id: Optional[int] = None,
+    status: Optional[SubscriptionStatus] = None
+) -> StreamingResponse:
+    """
+    Stream all matching subscriptions as NDJSON.
+    Only accessible by admin.
+    """
+    query = _subscriptions_query(user_id, status)
+    return ndjson_export(query, Subscription, SubscriptionRead, "subscriptions")
 
 @router.post("/", response_model=SubscriptionRead)
 async def create_subscription(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_in: SubscriptionCreate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -57,7 +79,7 @@ async def create_subscription(
     Create new subscription.
     """
     # Verify server exists and is available
-    server = db.get(Server, subscription_in.server_id)
+    server = await db.get(Server, subscription_in.server_id)
     if not server or server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,15 +117,15 @@ async def create_subscription(
     
     db.add(subscription)
     db.add(payment)
-    db.commit()
-    db.refresh(subscription)
+    await db.commit()
+    await db.refresh(subscription)
     
     return subscription
 
 @router.get("/{subscription_id}", response_model=SubscriptionRead)
 async def get_subscription(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -111,7 +133,7 @@ async def get_subscription(
     Get subscription by ID.
     Regular users can only access their own subscriptions.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -131,7 +153,7 @@ async def get_subscription(
 @router.put("/{subscription_id}", response_model=SubscriptionRead)
 async def update_subscription(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     subscription_in: SubscriptionUpdate,
     current_user: User = Depends(get_current_active_staff)
@@ -140,7 +162,7 @@ async def update_subscription(
     Update subscription.
     Only accessible by admin and support staff.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -153,14 +175,14 @@ async def update_subscription(
         setattr(subscription, field, value)
     
     db.add(subscription)
-    db.commit()
-    db.refresh(subscription)
+    await db.commit()
+    await db.refresh(subscription)
     return subscription
 
 @router.post("/{subscription_id}/renew")
 async def renew_subscription(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     duration_months: int,
     current_user: User = Depends(get_current_active_user)
@@ -168,7 +190,7 @@ async def renew_subscription(
     """
     Renew subscription.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -198,21 +220,21 @@ async def renew_subscription(
     )
     
     db.add(payment)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Renewal payment created", "payment_id": payment.id}
 
 @router.post("/{subscription_id}/cancel")
 async def cancel_subscription(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Cancel subscription auto-renewal.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -229,14 +251,14 @@ async def cancel_subscription(
     
     subscription.auto_renew = False
     db.add(subscription)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Auto-renewal cancelled successfully"}
 
 @router.post("/{subscription_id}/change-server")
 async def change_subscription_server(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     new_server_id: int,
     current_user: User = Depends(get_current_active_user)
@@ -244,7 +266,7 @@ async def change_subscription_server(
     """
     Change subscription server.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -260,7 +282,7 @@ async def change_subscription_server(
         )
     
     # Verify new server exists and is available
-    new_server = db.get(Server, new_server_id)
+    new_server = await db.get(Server, new_server_id)
     if not new_server or new_server.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -275,8 +297,8 @@ async def change_subscription_server(
     # Update server
     subscription.server_id = new_server_id
     db.add(subscription)
-    db.commit()
-    db.refresh(subscription)
+    await db.commit()
+    await db.refresh(subscription)
     
     # TODO: Update VPN configuration in 3x-ui panel
     
@@ -285,14 +307,14 @@ async def change_subscription_server(
 @router.get("/{subscription_id}/usage")
 async def get_subscription_usage(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     subscription_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Get subscription usage statistics.
     """
-    subscription = db.get(Subscription, subscription_id)
+    subscription = await db.get(Subscription, subscription_id)
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
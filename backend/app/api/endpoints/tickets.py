@@ -1,6 +1,9 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
 from ...db.session import get_session
@@ -16,48 +19,79 @@ from ...db.models.ticket import (
     TicketCategory
 )
 from ...db.models.user import User, UserRole
-from ..deps import get_current_active_user, get_current_active_staff
+from ..deps import get_current_active_user, get_current_active_staff, get_current_active_superuser
+from ..pagination import paginate, ndjson_export
 
 router = APIRouter()
 
+# Relationships serialized by TicketRead; an async session can't lazy-load them
+TICKET_READ_OPTIONS = [
+    selectinload(Ticket.messages).selectinload(TicketMessage.user),
+    selectinload(Ticket.user),
+    selectinload(Ticket.assigned_staff)
+]
+
+def _tickets_query(
+    user_id: Optional[int] = None,
+    status: Optional[TicketStatus] = None,
+    priority: Optional[TicketPriority] = None,
+    category: Optional[TicketCategory] = None
+):
+    query = select(Ticket).options(*TICKET_READ_OPTIONS)
+    if user_id is not None:
+        query = query.where(Ticket.user_id == user_id)
+    if status:
+        query = query.where(Ticket.status == status)
+    if priority:
+        query = query.where(Ticket.priority == priority)
+    if category:
+        query = query.where(Ticket.category == category)
+    return query
+
 @router.get("/", response_model=List[TicketRead])
 async def list_tickets(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
+    response: Response,
     current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[TicketStatus] = None,
     priority: Optional[TicketPriority] = None,
     category: Optional[TicketCategory] = None
 ) -> Any:
     """
-    Retrieve tickets.
+    Retrieve tickets, newest first.
+    The X-Next-Cursor response header is the cursor of the next page.
     Regular users can only see their own tickets.
     Staff can see all tickets.
     """
-    query = select(Ticket)
-    
     # Regular users can only see their own tickets
-    if current_user.role not in [UserRole.ADMIN, UserRole.SUPPORT]:
-        query = query.where(Ticket.user_id == current_user.id)
-    
-    # Apply filters
-    if status:
-        query = query.where(Ticket.status == status)
-    if priority:
-        query = query.where(Ticket.priority == priority)
-    if category:
-        query = query.where(Ticket.category == category)
-    
-    # Apply pagination
-    tickets = db.exec(query.offset(skip).limit(limit)).all()
-    return tickets
+    is_staff = current_user.role in [UserRole.ADMIN, UserRole.SUPPORT]
+    query = _tickets_query(None if is_staff else current_user.id, status, priority, category)
+    return await paginate(db, response, query, Ticket, cursor=cursor, skip=skip, limit=limit)
+
+@router.get("/export")
+async def export_tickets(
+    *,
+    current_user: User = Depends(get_current_active_superuser),
+    user_id: Optional[int] = None,
+    status: Optional[TicketStatus] = None,
+    priority: Optional[TicketPriority] = None,
+    category: Optional[TicketCategory] = None
+) -> StreamingResponse:
+    """
+    Stream all matching tickets as NDJSON.
+    Only accessible by admin.
+    """
+    query = _tickets_query(user_id, status, priority, category)
+    return ndjson_export(query, Ticket, TicketRead, "tickets")
 
 @router.post("/", response_model=TicketRead)
 async def create_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_in: TicketCreate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -73,8 +107,8 @@ async def create_ticket(
         subscription_id=ticket_in.subscription_id
     )
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
     # Create initial message
     message = TicketMessage(
@@ -83,14 +117,14 @@ async def create_ticket(
         content=ticket_in.content
     )
     db.add(message)
-    db.commit()
+    await db.commit()
     
-    return ticket
+    return await db.get(Ticket, ticket.id, options=TICKET_READ_OPTIONS, populate_existing=True)
 
 @router.get("/{ticket_id}", response_model=TicketRead)
 async def get_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -98,7 +132,7 @@ async def get_ticket(
     Get ticket by ID.
     Regular users can only access their own tickets.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id, options=TICKET_READ_OPTIONS)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -118,7 +152,7 @@ async def get_ticket(
 @router.post("/{ticket_id}/messages")
 async def add_ticket_message(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     message_in: TicketMessageCreate,
     current_user: User = Depends(get_current_active_user)
@@ -126,7 +160,7 @@ async def add_ticket_message(
     """
     Add message to ticket.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -158,14 +192,14 @@ async def add_ticket_message(
     
     db.add(message)
     db.add(ticket)
-    db.commit()
+    await db.commit()
     
     return {"msg": "Message added successfully"}
 
 @router.post("/{ticket_id}/attachment")
 async def upload_ticket_attachment(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user)
@@ -173,7 +207,7 @@ async def upload_ticket_attachment(
     """
     Upload attachment for ticket message.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -202,7 +236,7 @@ async def upload_ticket_attachment(
 @router.post("/{ticket_id}/assign")
 async def assign_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     staff_id: int,
     current_user: User = Depends(get_current_active_staff)
@@ -211,7 +245,7 @@ async def assign_ticket(
     Assign ticket to staff member.
     Only accessible by admin and support staff.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -219,7 +253,7 @@ async def assign_ticket(
         )
     
     # Verify staff member exists
-    staff = db.get(User, staff_id)
+    staff = await db.get(User, staff_id)
     if not staff or staff.role not in [UserRole.ADMIN, UserRole.SUPPORT]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -228,15 +262,15 @@ async def assign_ticket(
     
     ticket.assign_to_staff(staff_id)
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
     return ticket
 
 @router.post("/{ticket_id}/close")
 async def close_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     resolution: str,
     current_user: User = Depends(get_current_active_staff)
@@ -245,7 +279,7 @@ async def close_ticket(
     Close ticket with resolution.
     Only accessible by admin and support staff.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -254,22 +288,22 @@ async def close_ticket(
     
     ticket.close_ticket(resolution)
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
     return ticket
 
 @router.post("/{ticket_id}/reopen")
 async def reopen_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     ticket_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Reopen closed ticket.
     """
-    ticket = db.get(Ticket, ticket_id)
+    ticket = await db.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -292,22 +326,22 @@ async def reopen_ticket(
     
     ticket.status = TicketStatus.IN_PROGRESS
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
     return ticket
 
 @router.get("/stats")
 async def get_ticket_stats(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff)
 ) -> Any:
     """
     Get ticket statistics.
     Only accessible by admin and support staff.
     """
-    tickets = db.exec(select(Ticket)).all()
+    tickets = (await db.exec(select(Ticket))).all()
     
     # Calculate statistics
     total_tickets = len(tickets)
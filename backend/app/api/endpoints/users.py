@@ -1,9 +1,13 @@
 from typing import Any, List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
-from sqlmodel import Session, select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
 
 from ...db.session import get_session
+from ...db.crud.user import user as user_crud
 from ...services.activity_logger import ActivityLogger
 from ...db.models.user import (
     User,
@@ -14,6 +18,7 @@ from ...db.models.user import (
     UserStatus
 )
 from ...core.security import get_password_hash
+from ..pagination import paginate, ndjson_export
 from ..deps import (
     get_current_active_superuser,
     get_current_active_user,
@@ -22,21 +27,11 @@ from ..deps import (
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserRead])
-async def list_users(
-    *,
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_active_staff),
-    skip: int = 0,
-    limit: int = 100,
+def _users_query(
     role: Optional[UserRole] = None,
     status: Optional[UserStatus] = None,
     search: Optional[str] = None
-) -> Any:
-    """
-    Retrieve users with filtering and pagination.
-    Only accessible by admin and support staff.
-    """
+):
     query = select(User)
     
     # Apply filters
@@ -49,15 +44,47 @@ async def list_users(
             (User.phone.contains(search)) |
             (User.full_name.contains(search))
         )
-    
-    # Apply pagination
-    users = db.exec(query.offset(skip).limit(limit)).all()
-    return users
+    return query
+
+@router.get("/", response_model=List[UserRead])
+async def list_users(
+    *,
+    db: AsyncSession = Depends(get_session),
+    response: Response,
+    current_user: User = Depends(get_current_active_staff),
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    role: Optional[UserRole] = None,
+    status: Optional[UserStatus] = None,
+    search: Optional[str] = None
+) -> Any:
+    """
+    Retrieve users with filtering and pagination, newest first.
+    The X-Next-Cursor response header is the cursor of the next page.
+    Only accessible by admin and support staff.
+    """
+    query = _users_query(role, status, search)
+    return await paginate(db, response, query, User, cursor=cursor, skip=skip, limit=limit)
+
+@router.get("/export")
+async def export_users(
+    *,
+    current_user: User = Depends(get_current_active_superuser),
+    role: Optional[UserRole] = None,
+    status: Optional[UserStatus] = None,
+    search: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Stream all matching users as NDJSON.
+    Only accessible by admin.
+    """
+    return ndjson_export(_users_query(role, status, search), User, UserRead, "users")
 
 @router.get("/analytics")
 async def get_user_analytics(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff),
     days: Optional[int] = Query(30, ge=1, le=365)
 ) -> Dict[str, Any]:
@@ -68,11 +95,13 @@ async def get_user_analytics(
     now = datetime.utcnow()
     period_start = now - timedelta(days=days)
     
-    # Basic stats
-    total_users = db.exec(select(User)).count()
-    active_users = db.exec(select(User).where(User.status == UserStatus.ACTIVE)).count()
-    vip_users = db.exec(select(User).where(User.role == UserRole.VIP)).count()
-    new_users = db.exec(select(User).where(User.created_at >= period_start)).count()
+    # Basic stats, counted in SQL
+    total_users = await user_crud.count(db, approximate=True)
+    active_users = await user_crud.count(db, filters={"status": UserStatus.ACTIVE})
+    vip_users = await user_crud.count(db, filters={"role": UserRole.VIP})
+    new_users = (await db.exec(
+        select(func.count(User.id)).where(User.created_at >= period_start)
+    )).one()
     
     # User growth over time
     growth_query = select(
@@ -86,7 +115,7 @@ async def get_user_analytics(
         func.date_trunc('day', User.created_at)
     )
     
-    growth_data = db.exec(growth_query).all()
+    growth_data = (await db.exec(growth_query)).all()
     daily_growth = [{"date": row.date, "new_users": row.count} for row in growth_data]
     
     # Status distribution
@@ -95,7 +124,7 @@ async def get_user_analytics(
         func.count(User.id).label('count')
     ).group_by(User.status)
     
-    status_data = db.exec(status_query).all()
+    status_data = (await db.exec(status_query)).all()
     status_distribution = {str(row.status): row.count for row in status_data}
     
     # Role distribution
@@ -104,7 +133,7 @@ async def get_user_analytics(
         func.count(User.id).label('count')
     ).group_by(User.role)
     
-    role_data = db.exec(role_query).all()
+    role_data = (await db.exec(role_query)).all()
     role_distribution = {str(row.role): row.count for row in role_data}
     
     # Get activity stats
@@ -132,7 +161,7 @@ async def get_user_analytics(
 @router.get("/{user_id}", response_model=UserWithSubscriptions, response_model_exclude_none=True)
 async def get_user(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -146,7 +175,7 @@ async def get_user(
             detail="Not enough permissions"
         )
     
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id, options=[selectinload(User.subscriptions)])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -164,7 +193,7 @@ async def get_user(
 @router.put("/{user_id}", response_model=UserRead)
 async def update_user(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     user_in: UserUpdate,
     current_user: User = Depends(get_current_active_user)
@@ -174,7 +203,7 @@ async def update_user(
     Regular users can only update their own profile.
     Admins can update any user.
     """
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,8 +228,8 @@ async def update_user(
         setattr(user, field, value)
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Log activity
     await ActivityLogger.log_activity(
@@ -216,7 +245,7 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
@@ -224,7 +253,7 @@ async def delete_user(
     Delete user.
     Only accessible by admin.
     """
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -236,7 +265,7 @@ async def delete_user(
     user.is_active = False
     user.status = UserStatus.BLOCKED
     db.add(user)
-    db.commit()
+    await db.commit()
     
     # Log activity
     await ActivityLogger.log_activity(
@@ -249,7 +278,7 @@ async def delete_user(
 @router.post("/{user_id}/change-role")
 async def change_user_role(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     new_role: UserRole,
     current_user: User = Depends(get_current_active_superuser)
@@ -258,7 +287,7 @@ async def change_user_role(
     Change user role.
     Only accessible by admin.
     """
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -268,8 +297,8 @@ async def change_user_role(
     old_role = user.role
     user.role = new_role
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Log activity
     await ActivityLogger.log_activity(
@@ -286,7 +315,7 @@ async def change_user_role(
 @router.post("/{user_id}/change-status")
 async def change_user_status(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     new_status: UserStatus,
     current_user: User = Depends(get_current_active_staff)
@@ -295,7 +324,7 @@ async def change_user_status(
     Change user status.
     Accessible by admin and support staff.
     """
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -310,8 +339,8 @@ async def change_user_status(
         user.is_active = True
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Log activity
     await ActivityLogger.log_activity(
@@ -328,7 +357,7 @@ async def change_user_status(
 @router.post("/{user_id}/change-password")
 async def change_password(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user_id: int,
     new_password: str,
     current_user: User = Depends(get_current_active_user)
@@ -344,7 +373,7 @@ async def change_password(
             detail="Not enough permissions"
         )
     
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -353,7 +382,7 @@ async def change_password(
     
     user.hashed_password = get_password_hash(new_password)
     db.add(user)
-    db.commit()
+    await db.commit()
     
     # Log activity
     await ActivityLogger.log_activity(
@@ -366,7 +395,7 @@ async def change_password(
 @router.get("/search/")
 async def search_users(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_staff),
     query: str = Query(..., min_length=1),
     skip: int = 0,
@@ -376,7 +405,7 @@ async def search_users(
     Search users by phone number or full name.
     Only accessible by admin and support staff.
     """
-    users = db.exec(
+    users = (await db.exec(
         select(User)
         .where(
             (User.phone.contains(query)) |
@@ -384,7 +413,7 @@ async def search_users(
         )
         .offset(skip)
         .limit(limit)
-    ).all()
+    )).all()
     
     # Log activity
     await ActivityLogger.log_activity(
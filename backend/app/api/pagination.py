@@ -0,0 +1,44 @@
+from typing import Any, List, Optional, Type
+from fastapi import HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..db.pagination import fetch_page, stream_ndjson
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+async def paginate(
+    db: AsyncSession,
+    response: Response,
+    query,
+    model,
+    *,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Any]:
+    """
+    One page of a list endpoint, newest first. Passing the returned
+    X-Next-Cursor back as cursor costs the same on every page; skip is
+    still honoured for existing clients but gets slower the deeper it goes.
+    """
+    try:
+        rows, next_cursor = await fetch_page(db, query, model, cursor, limit, offset=skip)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+def ndjson_export(query, model, schema: Type[BaseModel], filename: str) -> StreamingResponse:
+    """Stream every row of the query as an NDJSON download"""
+    return StreamingResponse(
+        stream_ndjson(query, model, schema),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+    )
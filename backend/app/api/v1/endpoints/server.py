@@ -11,6 +11,7 @@ from ...deps import get_current_active_superuser, get_current_active_user
 from ....models.user import User
 from ....core.monitoring.server_health import monitor
 from ....core.balancer.load_balancer import balancer
+from ....core.balancer.scoring import WeightProfile, scoring_engine
 from ....core.backup.backup_manager import backup_manager
 from ....core.failover.failover_manager import failover_manager
 
@@ -262,13 +263,14 @@ async def get_best_server(
     *,
     db: AsyncSession = Depends(get_db),
     required_traffic: Optional[int] = Query(None, description="Required traffic in bytes"),
+    location: Optional[str] = Query(None, description="Weight profile to score with"),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Get the best server for new user based on current load.
     Only superusers can access this endpoint.
     """
-    server = await balancer.get_best_server(db, required_traffic)
+    server = await balancer.get_best_server(db, required_traffic, location)
     if not server:
         raise HTTPException(
             status_code=404,
@@ -276,17 +278,77 @@ async def get_best_server(
         )
     return server
 
+@router.get("/top", response_model=List[Dict[str, Any]])
+async def get_top_servers(
+    *,
+    db: AsyncSession = Depends(get_db),
+    k: int = Query(5, ge=1, le=100),
+    required_traffic: Optional[int] = Query(None, description="Required traffic in bytes"),
+    location: Optional[str] = Query(None, description="Weight profile to score with"),
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Get the k best servers with their placement scores.
+    Only superusers can access this endpoint.
+    """
+    ranked = await balancer.get_top_servers(db, k, required_traffic, location)
+    return [
+        {"server_id": server.id, "name": server.name, "score": score}
+        for server, score in ranked
+    ]
+
+@router.get("/balancer/weights", response_model=Dict[str, WeightProfile])
+async def get_weight_profiles(
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Get balancer weight profiles by location.
+    Only superusers can access this endpoint.
+    """
+    return await scoring_engine.load_profiles(force=True)
+
+@router.put("/balancer/weights/{name}", response_model=WeightProfile)
+async def set_weight_profile(
+    *,
+    name: str,
+    profile: WeightProfile,
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Set the weight profile for a location ("default" applies to all others).
+    Only superusers can access this endpoint.
+    """
+    await scoring_engine.set_profile(name, profile)
+    return profile
+
+@router.delete("/balancer/weights/{name}")
+async def delete_weight_profile(
+    *,
+    name: str,
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Remove a location weight profile.
+    Only superusers can access this endpoint.
+    """
+    try:
+        await scoring_engine.delete_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "Weight profile deleted"}
+
 @router.get("/rebalance", response_model=List[Dict[str, Any]])
 async def get_rebalance_suggestions(
     *,
     db: AsyncSession = Depends(get_db),
+    move_budget: Optional[int] = Query(None, ge=1, description="Max moves to plan"),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Get suggestions for rebalancing users across servers.
     Only superusers can access this endpoint.
     """
-    moves = await balancer.rebalance_if_needed(db)
+    moves = await balancer.rebalance_if_needed(db, move_budget)
     return moves
 
 @router.post("/{server_id}/backup", response_model=Dict[str, Any])
@@ -5,8 +5,9 @@ Admin command handlers for the Telegram bot
 from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes, filters
 from ...core.config import settings
-from ...db.crud import user as user_crud
-from ...db.crud import server as server_crud
+from ...db.crud.user import user as user_crud
+from ...db.crud.server import server as server_crud
+from ...db.session import async_session
 from ..utils import admin_required, format_message
 
 async def start_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -34,7 +35,8 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
     
     message = " ".join(context.args)
-    users = await user_crud.get_all_users()
+    async with async_session() as db:
+        users = await user_crud.get_multi(db, limit=None)
     success = 0
     failed = 0
     
@@ -54,10 +56,11 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 @admin_required
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show system statistics"""
-    total_users = await user_crud.count_users()
-    active_users = await user_crud.count_active_users()
-    total_servers = await server_crud.count_servers()
-    active_servers = await server_crud.count_active_servers()
+    async with async_session() as db:
+        total_users = await user_crud.count(db)
+        active_users = await user_crud.count_active_users(db)
+        total_servers = await server_crud.count(db)
+        active_servers = await server_crud.count(db, filters={"is_active": True})
     
     message = format_message(
         "📊 آمار سیستم\n\n"
@@ -5,13 +5,15 @@ Server management handlers for the Telegram bot
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackQueryHandler, ContextTypes, filters
 from ...core.config import settings
-from ...db.crud import server as server_crud
+from ...db.crud.server import server as server_crud
+from ...db.session import async_session
 from ..utils import admin_required, format_message
 
 @admin_required
 async def list_servers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List all servers"""
-    servers = await server_crud.get_all_servers()
+    async with async_session() as db:
+        servers = await server_crud.get_multi(db, limit=None)
     
     if not servers:
         await update.message.reply_text("❌ هیچ سروری ثبت نشده است.")
@@ -46,13 +48,15 @@ async def server_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
         
     server_name = context.args[0]
-    server = await server_crud.get_server_by_name(server_name)
+    async with async_session() as db:
+        servers = await server_crud.get_multi(db, limit=1, filters={"name": server_name})
+        server = servers[0] if servers else None
     
-    if not server:
-        await update.message.reply_text("❌ سرور مورد نظر یافت نشد.")
-        return
+        if not server:
+            await update.message.reply_text("❌ سرور مورد نظر یافت نشد.")
+            return
         
-    stats = await server_crud.get_server_stats(server.id)
+        stats = await server_crud.get_server_stats(db, server.id)
     
     message = format_message(
         f"📊 آمار سرور {server.name}\n\n"
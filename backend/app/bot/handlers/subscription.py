@@ -6,13 +6,15 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackQueryHandler, ContextTypes, filters
 from ...core.config import settings
 from ...db.crud import subscription as sub_crud
-from ...db.crud import user as user_crud
+from ...db.crud.user import user as user_crud
+from ...db.session import async_session
 from ..utils import user_required, admin_required, format_message
 
 @user_required
 async def list_plans(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List available subscription plans"""
-    plans = await sub_crud.get_available_plans()
+    async with async_session() as db:
+        plans = await sub_crud.get_available_plans(db)
     
     if not plans:
         await update.message.reply_text("❌ در حال حاضر هیچ پلنی موجود نیست.")
@@ -47,29 +49,32 @@ async def buy_plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await query.answer()
     
     plan_id = int(query.data.split("_")[-1])
-    user = await user_crud.get_user_by_telegram_id(update.effective_user.id)
-    plan = await sub_crud.get_plan(plan_id)
+    async with async_session() as db:
+        user = await user_crud.get_by_telegram_id(db, update.effective_user.id)
+        plan = await sub_crud.get_plan(db, plan_id)
     
-    if not plan:
-        await query.message.reply_text("❌ پلن مورد نظر یافت نشد.")
-        return
+        if not plan:
+            await query.message.reply_text("❌ پلن مورد نظر یافت نشد.")
+            return
         
-    if user.credit < plan.price:
-        await query.message.reply_text(
-            "❌ اعتبار شما برای خرید این پلن کافی نیست.\n"
-            "لطفا ابتدا حساب خود را شارژ کنید."
-        )
-        return
+        if user.credit < plan.price:
+            await query.message.reply_text(
+                "❌ اعتبار شما برای خرید این پلن کافی نیست.\n"
+                "لطفا ابتدا حساب خود را شارژ کنید."
+            )
+            return
         
-    subscription = await sub_crud.create_subscription(
-        user_id=user.id,
-        plan_id=plan.id
-    )
+        subscription = await sub_crud.create_subscription(
+            db,
+            user_id=user.id,
+            plan_id=plan.id
+        )
     
-    await user_crud.update_credit(
-        user_id=user.id,
-        amount=-plan.price
-    )
+        await user_crud.update_credit(
+            db,
+            user_id=user.id,
+            amount=-plan.price
+        )
     
     message = format_message(
         "✅ خرید با موفقیت انجام شد\n\n"
@@ -5,8 +5,10 @@ User command handlers for the Telegram bot
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackQueryHandler, ContextTypes, filters
 from ...core.config import settings
-from ...db.crud import user as user_crud
+from ...db.crud.user import user as user_crud
 from ...db.crud import subscription as sub_crud
+from ...db.models.user import UserCreate
+from ...db.session import async_session
 from ..utils import user_required, format_message
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -14,14 +16,15 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.effective_user:
         return
         
-    user = await user_crud.get_user_by_telegram_id(update.effective_user.id)
-    if not user:
-        user = await user_crud.create_user(
-            telegram_id=update.effective_user.id,
-            username=update.effective_user.username,
-            first_name=update.effective_user.first_name,
-            last_name=update.effective_user.last_name
-        )
+    async with async_session() as db:
+        user = await user_crud.get_by_telegram_id(db, update.effective_user.id)
+        if not user:
+            user = await user_crud.create(db, obj_in=UserCreate(
+                telegram_id=update.effective_user.id,
+                username=update.effective_user.username,
+                first_name=update.effective_user.first_name,
+                last_name=update.effective_user.last_name
+            ))
     
     keyboard = [
         [
@@ -52,8 +55,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 @user_required
 async def my_services(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user's active services"""
-    user = await user_crud.get_user_by_telegram_id(update.effective_user.id)
-    subs = await sub_crud.get_user_subscriptions(user.id)
+    async with async_session() as db:
+        user = await user_crud.get_by_telegram_id(db, update.effective_user.id)
+        subs = await sub_crud.get_user_subscriptions(db, user.id)
     
     if not subs:
         await update.message.reply_text("❌ شما هیچ سرویس فعالی ندارید.")
@@ -73,8 +77,9 @@ async def my_services(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 @user_required
 async def usage_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user's usage statistics"""
-    user = await user_crud.get_user_by_telegram_id(update.effective_user.id)
-    stats = await user_crud.get_user_stats(user.id)
+    async with async_session() as db:
+        user = await user_crud.get_by_telegram_id(db, update.effective_user.id)
+        stats = await user_crud.get_user_stats(db, user.id)
     
     message = format_message(
         "📊 آمار مصرف شما\n\n"
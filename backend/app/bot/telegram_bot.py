@@ -7,6 +7,7 @@ import asyncio
 from telegram import Update, Bot
 from telegram.ext import Application, CommandHandler, ContextTypes
 from ..core.config import settings
+from ..core.monitoring.prometheus import TELEGRAM_MESSAGES, TELEGRAM_SEND_SECONDS
 from .handlers import register_all_handlers
 
 # Configure logging
@@ -45,9 +46,12 @@ async def send_message(chat_id: int, text: str) -> None:
         text: The message text to send
     """
     try:
-        await bot.send_message(chat_id=chat_id, text=text)
+        with TELEGRAM_SEND_SECONDS.labels(sender="bot").time():
+            await bot.send_message(chat_id=chat_id, text=text)
+        TELEGRAM_MESSAGES.labels(sender="bot", result="sent").inc()
         logger.info(f"✅ Message sent to {chat_id}")
     except Exception as e:
+        TELEGRAM_MESSAGES.labels(sender="bot", result="failed").inc()
         logger.error(f"❌ Failed to send message to {chat_id}: {str(e)}")
         raise
 
@@ -98,11 +102,13 @@ async def broadcast_message(message: str, user_ids: list[int] = None) -> dict:
     Returns:
         dict: Statistics about the broadcast operation
     """
-    from ..db.crud import user as user_crud
+    from ..db.crud.user import user as user_crud
+    from ..db.session import async_session
     
     try:
         if user_ids is None:
-            users = await user_crud.get_all_users()
+            async with async_session() as db:
+                users = await user_crud.get_multi(db, limit=None)
             user_ids = [user.telegram_id for user in users]
         
         success = 0
@@ -7,7 +7,8 @@ from typing import Callable, Any
 from telegram import Update
 from telegram.ext import ContextTypes
 from ..core.config import settings
-from ..db.crud import user as user_crud
+from ..db.crud.user import user as user_crud
+from ..db.session import async_session
 
 def admin_required(func: Callable) -> Callable:
     """Decorator to check if user is admin"""
@@ -26,7 +27,8 @@ def user_required(func: Callable) -> Callable:
         if not update.effective_user:
             return
             
-        user = await user_crud.get_user_by_telegram_id(update.effective_user.id)
+        async with async_session() as db:
+            user = await user_crud.get_by_telegram_id(db, update.effective_user.id)
         if not user:
             await update.message.reply_text(
                 "❌ شما هنوز ثبت نام نکرده‌اید.\n"
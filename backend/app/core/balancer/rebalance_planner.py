@@ -0,0 +1,171 @@
+"""
+Bin-packing rebalance planner
+"""
+import bisect
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pydantic import BaseModel
+from ..config import settings
+from ..monitoring.metrics_snapshot import MetricsSnapshot
+from ...models.server import Server
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 * 1024 * 1024
+
+class RebalancePlan(BaseModel):
+    """Planned moves plus the load they are projected to produce"""
+    moves: List[Dict[str, Any]] = []
+    projected_loads: Dict[int, float] = {}
+    unresolved: List[int] = []  # sources still above target after the plan
+    budget_exhausted: bool = False
+
+class _Bin:
+    """Projected state of one server while planning"""
+
+    def __init__(self, server: Server, snapshot: MetricsSnapshot, load: float):
+        self.server = server
+        self.load = load
+        self.clients = snapshot.total_clients
+        self.traffic_gb = snapshot.traffic_gb
+        self.max_users = max(server.max_users, 1)
+
+class RebalancePlanner:
+    """
+    Plan client moves off overloaded servers with best-fit decreasing.
+    Each client's share of its server's load is estimated from its traffic,
+    and every move updates the projected load of both servers.
+    """
+
+    def __init__(
+        self,
+        target_utilization: float = settings.REBALANCE_TARGET_UTILIZATION,
+        move_budget: int = settings.REBALANCE_MOVE_BUDGET,
+        traffic_limit_gb: float = 1000  # matches LoadBalancer's 1TB limit
+    ):
+        self.target_utilization = target_utilization
+        self.move_budget = move_budget
+        self.traffic_limit_gb = traffic_limit_gb
+
+    def plan(
+        self,
+        servers: Sequence[Server],
+        snapshots: Sequence[Optional[MetricsSnapshot]],
+        loads: Sequence[float],
+        clients: Dict[int, List[Dict[str, Any]]],
+        overload_threshold: float,
+        move_budget: Optional[int] = None
+    ) -> RebalancePlan:
+        """Build a move plan; clients maps source server id to its client list"""
+        budget = self.move_budget if move_budget is None else move_budget
+        target = min(self.target_utilization, overload_threshold)
+        bins = {
+            server.id: _Bin(server, snapshot, float(load))
+            for server, snapshot, load in zip(servers, snapshots, loads)
+            if snapshot is not None and snapshot.is_online
+        }
+        sources = sorted(
+            (b for b in bins.values() if b.load > overload_threshold),
+            key=lambda b: b.load,
+            reverse=True
+        )
+        source_ids = {b.server.id for b in sources}
+
+        # Targets kept sorted by headroom (least first) for best fit
+        headroom: List[Tuple[float, int]] = sorted(
+            (target - b.load, server_id)
+            for server_id, b in bins.items()
+            if server_id not in source_ids and b.load < target
+        )
+
+        plan = RebalancePlan()
+        for source in sources:
+            if len(plan.moves) >= budget:
+                plan.budget_exhausted = True
+                break
+
+            for client, units in self._client_units(source, clients.get(source.server.id, [])):
+                if source.load <= target:
+                    break
+                if len(plan.moves) >= budget:
+                    plan.budget_exhausted = True
+                    break
+
+                placed = self._best_fit(
+                    headroom, bins, client, units,
+                    self.traffic_limit_gb * overload_threshold
+                )
+                if placed is None:
+                    continue
+
+                dest = bins[placed]
+                source.load -= units / source.max_users
+                source.clients -= 1
+                plan.moves.append({
+                    "client_email": client.get("email"),
+                    "from_server": source.server.id,
+                    "to_server": placed,
+                    "reason": "Load balancing",
+                    "projected_from_load": round(source.load, 4),
+                    "projected_to_load": round(dest.load, 4)
+                })
+
+        plan.projected_loads = {server_id: round(b.load, 4) for server_id, b in bins.items()}
+        plan.unresolved = [b.server.id for b in sources if b.load > target]
+        return plan
+
+    def _client_units(
+        self,
+        source: _Bin,
+        clients: List[Dict[str, Any]]
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Split the source's load across its clients by traffic share, in
+        load-units (load x max_users) so they transfer between servers of
+        different size. Largest first: fewer moves reach the target.
+        """
+        if not clients:
+            return []
+        traffic = [client.get("up", 0) + client.get("down", 0) for client in clients]
+        total = sum(traffic)
+        units_total = source.load * source.max_users
+        if total > 0:
+            shares = [t / total for t in traffic]
+        else:
+            shares = [1 / len(clients)] * len(clients)
+        pairs = [(client, share * units_total) for client, share in zip(clients, shares)]
+        pairs.sort(key=lambda pair: pair[1], reverse=True)
+        return pairs
+
+    def _best_fit(
+        self,
+        headroom: List[Tuple[float, int]],
+        bins: Dict[int, _Bin],
+        client: Dict[str, Any],
+        units: float,
+        traffic_cap_gb: float
+    ) -> Optional[int]:
+        """Place the client on the fullest target it still fits, updating headroom"""
+        client_traffic_gb = (client.get("up", 0) + client.get("down", 0)) / GB
+
+        # Scanning from the least headroom, the first target that fits is the best fit
+        for i, (room, server_id) in enumerate(headroom):
+            dest = bins[server_id]
+            delta = units / dest.max_users
+            if (
+                delta > room or
+                dest.clients + 1 > dest.max_users or
+                dest.traffic_gb + client_traffic_gb >= traffic_cap_gb
+            ):
+                continue
+
+            del headroom[i]
+            dest.load += delta
+            dest.clients += 1
+            dest.traffic_gb += client_traffic_gb
+            bisect.insort(headroom, (room - delta, server_id))
+            return server_id
+        return None
+
+# Create planner instance
+rebalance_planner = RebalancePlanner()
@@ -0,0 +1,212 @@
+"""
+Vectorized server scoring engine
+"""
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from pydantic import BaseModel
+from ..config import settings
+from ..monitoring.anomaly import anomaly_detector
+from ..monitoring.metrics_snapshot import MetricsSnapshot
+from ..monitoring.server_health import monitor
+from ..monitoring.uptime import uptime_engine
+from ..server_connector.circuit_breaker import panel_breakers
+from ...db.session import async_redis_client
+from ...models.server import Server
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+
+class WeightProfile(BaseModel):
+    """Objective weights used to score servers (lower score is better)"""
+    cpu: float = 0.3
+    memory: float = 0.3
+    load: float = 0.2
+    traffic: float = 0.1
+    health: float = 0.1
+
+    def as_vector(self) -> np.ndarray:
+        return np.array(
+            [self.cpu, self.memory, self.load, self.traffic, self.health],
+            dtype=np.float64
+        )
+
+class ScoringEngine:
+    """Score a whole fleet in one pass over packed metric arrays"""
+
+    def __init__(
+        self,
+        load_threshold: float = 0.8,
+        memory_threshold: float = 0.85,
+        profiles_refresh_interval: float = settings.BALANCER_PROFILES_REFRESH_INTERVAL,
+        key: str = "balancer_weight_profiles"
+    ):
+        self.load_threshold = load_threshold
+        self.memory_threshold = memory_threshold
+        self.profiles_refresh_interval = profiles_refresh_interval
+        self.key = key
+        self._profiles: Dict[str, WeightProfile] = {DEFAULT_PROFILE: WeightProfile()}
+        self._profiles_loaded_at = 0.0
+
+    async def load_profiles(self, force: bool = False) -> Dict[str, WeightProfile]:
+        """Pull weight profiles from Redis so they can be tuned at runtime"""
+        if not force and time.monotonic() - self._profiles_loaded_at < self.profiles_refresh_interval:
+            return self._profiles
+
+        try:
+            raw = await async_redis_client.hgetall(self.key)
+            profiles = {DEFAULT_PROFILE: WeightProfile()}
+            for name, payload in raw.items():
+                profiles[name] = WeightProfile(**json.loads(payload))
+            self._profiles = profiles
+        except Exception as e:
+            logger.debug(f"Weight profile store unavailable, keeping current profiles: {str(e)}")
+        self._profiles_loaded_at = time.monotonic()
+        return self._profiles
+
+    async def set_profile(self, name: str, profile: WeightProfile) -> None:
+        """Store a profile for a location (or the default) for every worker"""
+        self._profiles[name] = profile
+        await async_redis_client.hset(self.key, name, profile.json())
+
+    async def delete_profile(self, name: str) -> None:
+        """Fall back to the default profile for a location"""
+        if name == DEFAULT_PROFILE:
+            raise ValueError("The default profile cannot be deleted")
+        self._profiles.pop(name, None)
+        await async_redis_client.hdel(self.key, name)
+
+    def get_profile(self, name: Optional[str]) -> WeightProfile:
+        if name and name in self._profiles:
+            return self._profiles[name]
+        return self._profiles[DEFAULT_PROFILE]
+
+    def score(
+        self,
+        servers: Sequence[Server],
+        snapshots: Sequence[Optional[MetricsSnapshot]],
+        required_traffic: Optional[int] = None,
+        location: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Score every server at once. Servers that are unknown, offline,
+        anomalous or full get +inf. Each server is weighted by its
+        location's profile unless a location is given explicitly. Callers
+        load anomaly_detector and uptime_engine state first.
+        """
+        n = len(servers)
+        if n == 0:
+            return np.empty(0)
+
+        known = np.array([s is not None for s in snapshots], dtype=bool)
+        # Pack metrics column-wise; unknown servers are masked out below
+        metrics = np.array([
+            (
+                s.cpu_usage, s.memory_usage, s.disk_usage, s.load,
+                s.network_in + s.network_out, s.total_clients, s.is_online
+            ) if s is not None else (0, 0, 0, 0, 0, 0, False)
+            for s in snapshots
+        ], dtype=np.float64)
+        cpu, memory, disk, load, traffic, clients, online = metrics.T
+        max_users = np.array([server.max_users for server in servers], dtype=np.float64)
+        breaker_ok = np.array(
+            [panel_breakers.is_available(str(server.url)) for server in servers],
+            dtype=bool
+        )
+        # Servers burning their error budget fast are penalised before they fail
+        burning = np.array(
+            [uptime_engine.is_fast_burning(server.id) for server in servers],
+            dtype=bool
+        )
+        # The detector's hysteresis replaces raw thresholds once it tracks a server
+        anomaly_states = [anomaly_detector.get(server.id) for server in servers]
+        tracked = np.array([state is not None for state in anomaly_states], dtype=bool)
+        anomalous = np.array(
+            [state is not None and state.anomalous for state in anomaly_states],
+            dtype=bool
+        )
+
+        thresholds = monitor.alert_thresholds
+        over_thresholds = (
+            (cpu >= thresholds["cpu"]) |
+            (memory >= thresholds["memory"]) |
+            (load >= thresholds["load"]) |
+            (disk >= thresholds["disk"])
+        )
+        unhealthy = np.where(tracked, anomalous, over_thresholds) | ~breaker_ok | burning
+
+        features = np.column_stack([
+            cpu / 100,
+            memory / 100,
+            load / 10,
+            traffic / (1024 ** 3) / 100 if required_traffic else np.zeros(n),
+            unhealthy.astype(np.float64)
+        ])
+        weights = self._weight_matrix(servers, location)
+        scores = np.einsum("ij,ij->i", features, weights)
+
+        near_capacity = (cpu > self.load_threshold * 100) | (memory / 100 > self.memory_threshold)
+        excluded = (
+            ~known |
+            (online == 0) |
+            np.where(tracked, anomalous, near_capacity) |
+            (clients >= max_users)
+        )
+        scores[excluded] = np.inf
+        return scores
+
+    def top_k(
+        self,
+        servers: Sequence[Server],
+        snapshots: Sequence[Optional[MetricsSnapshot]],
+        k: int = 1,
+        required_traffic: Optional[int] = None,
+        location: Optional[str] = None
+    ) -> List[Tuple[Server, float]]:
+        """Best k eligible servers with their scores, best first"""
+        scores = self.score(servers, snapshots, required_traffic, location)
+        eligible = np.flatnonzero(np.isfinite(scores))
+        if eligible.size == 0 or k <= 0:
+            return []
+
+        k = min(k, eligible.size)
+        # argpartition is O(n); only the k winners get sorted
+        candidates = eligible[np.argpartition(scores[eligible], k - 1)[:k]]
+        ordered = candidates[np.argsort(scores[candidates], kind="stable")]
+        return [(servers[i], float(scores[i])) for i in ordered]
+
+    @staticmethod
+    def loads(snapshots: Sequence[Optional[MetricsSnapshot]]) -> np.ndarray:
+        """Normalized load per server; unknown or offline servers count as full"""
+        if not snapshots:
+            return np.empty(0)
+        metrics = np.array([
+            (s.cpu_usage / 100, s.memory_usage / 100, s.load / 10)
+            if s is not None and s.is_online else (1.0, 1.0, 1.0)
+            for s in snapshots
+        ], dtype=np.float64)
+        return metrics.mean(axis=1)
+
+    def _weight_matrix(
+        self,
+        servers: Sequence[Server],
+        location: Optional[str]
+    ) -> np.ndarray:
+        """One weight row per server, picked by location profile"""
+        if location:
+            return np.broadcast_to(self.get_profile(location).as_vector(), (len(servers), 5))
+
+        vectors: Dict[Optional[str], np.ndarray] = {}
+        rows = []
+        for server in servers:
+            server_location = getattr(server, "location", None)
+            if server_location not in vectors:
+                vectors[server_location] = self.get_profile(server_location).as_vector()
+            rows.append(vectors[server_location])
+        return np.vstack(rows)
+
+# Create scoring engine instance
+scoring_engine = ScoringEngine()
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "V2Ray Management System"
     API_V1_STR: str = "/api/v1"
     VERSION: str = "7.0.0"
+    DEBUG: bool = False
     
     # Security
     SECRET_KEY: str
@@ -38,6 +39,15 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     MAX_CONNECTIONS_COUNT: int = 10
     MIN_CONNECTIONS_COUNT: int = 5
+    APPROXIMATE_COUNT_MIN_ROWS: int = 100000  # smaller tables are always counted exactly
+    CRUD_BULK_BATCH_SIZE: int = 500  # rows per multi-row statement
+
+    # Query Profiling
+    QUERY_PROFILING_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SIZE: int = 1000  # entries kept in the rolling log
+    N_PLUS_ONE_THRESHOLD: int = 10  # runs of one SELECT within a request or task
+    QUERY_PROFILE_TOP_N: int = 5  # slowest statements kept per request or task
     
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: str
@@ -45,8 +55,74 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_ENABLED: bool = True
     
     # Server Metrics
-    METRICS_RETENTION_DAYS: int = 30
+    METRICS_RETENTION_DAYS: int = 30  # 1h rollups
+    METRICS_RAW_RETENTION_DAYS: int = 2
+    METRICS_1M_RETENTION_DAYS: int = 7
+    METRICS_1D_RETENTION_DAYS: int = 365
+    METRICS_ROLLUP_INTERVAL: int = 300  # seconds
+    METRICS_HISTORY_MAX_POINTS: int = 500
+    METRICS_BUFFER_MAX_SIZE: int = 10000  # samples held before producers block
+    METRICS_FLUSH_BATCH_SIZE: int = 500
+    METRICS_FLUSH_INTERVAL: float = 5.0  # seconds
+    METRICS_SUBMIT_TIMEOUT: float = 2.0  # seconds a producer waits for room
     ENABLE_PROMETHEUS: bool = True
+
+    # Panel HTTP Client
+    PANEL_HTTP_LIMIT_PER_HOST: int = 10
+    PANEL_HTTP_DNS_CACHE_TTL: int = 300  # 5 minutes
+    PANEL_HTTP_KEEPALIVE_TIMEOUT: int = 60  # seconds
+    PANEL_HTTP_TIMEOUT: int = 30  # seconds
+    PANEL_REQUEST_RETRIES: int = 3
+    PANEL_RETRY_BASE_DELAY: float = 0.5  # seconds, doubled per retry with jitter
+    PANEL_TIMEOUT_MIN: float = 2.0  # floor for latency-derived timeouts
+    
+    # Panel Circuit Breaker
+    PANEL_BREAKER_FAILURE_THRESHOLD: int = 5
+    PANEL_BREAKER_RESET_TIMEOUT: int = 30  # seconds, doubled on each re-trip
+    PANEL_BREAKER_MAX_RESET_TIMEOUT: int = 600  # 10 minutes
+    
+    # Panel Sessions
+    PANEL_SESSION_TTL: int = 86400  # 24 hours
+    PANEL_SESSION_REFRESH_MARGIN: int = 3600  # Refresh 1 hour before expiry
+    PANEL_LOGIN_LOCK_TIMEOUT: int = 30  # seconds
+    INBOUND_SNAPSHOT_TTL: int = 15  # seconds
+    PANEL_READ_COALESCE_TTL: float = 2.0  # seconds a coalesced read is reused
+    PORT_RESERVATION_TTL: int = 300  # seconds
+    PORT_INDEX_RESEED_INTERVAL: int = 300  # seconds
+    
+    # Server Sync
+    SERVER_SYNC_INTERVAL: int = 60  # seconds
+    SERVER_SYNC_CONCURRENCY: int = 10
+    SERVER_SYNC_TIMEOUT: int = 20  # per-server deadline in seconds
+    METRICS_SNAPSHOT_MAX_AGE: int = 180  # seconds before a snapshot counts as unknown
+    METRICS_SNAPSHOT_REFRESH_INTERVAL: float = 5.0  # seconds between Redis pulls
+    BALANCER_PROFILES_REFRESH_INTERVAL: float = 30.0  # seconds between weight profile reloads
+    REBALANCE_TARGET_UTILIZATION: float = 0.7  # plans drain sources down to this load
+    REBALANCE_MOVE_BUDGET: int = 50  # max client moves per rebalance run
+    
+    # Liveness Probes
+    PROBE_INTERVAL: int = 10  # seconds
+    PROBE_TIMEOUT: float = 3.0  # per probe step in seconds
+    PROBE_CONCURRENCY: int = 50
+    
+    # Anomaly Detection
+    ANOMALY_FAST_ALPHA: float = 0.3  # smoothing of the current level
+    ANOMALY_SLOW_ALPHA: float = 0.02  # how fast the baseline learns
+    ANOMALY_Z_ENTER: float = 3.0
+    ANOMALY_Z_EXIT: float = 1.5
+    ANOMALY_ENTER_SAMPLES: int = 3  # consecutive samples before raising
+    ANOMALY_EXIT_SAMPLES: int = 3  # consecutive samples before clearing
+    ANOMALY_WARMUP_SAMPLES: int = 20
+    
+    # Uptime / SLO
+    UPTIME_SLO_TARGET: float = 0.999  # availability objective over 30 days
+    UPTIME_REFRESH_INTERVAL: float = 10.0  # seconds readers reuse a report
+    
+    # Failover
+    FAILOVER_PROBE_CONCURRENCY: int = 10
+    FAILOVER_PROBE_TIMEOUT: int = 10  # per-probe deadline in seconds
+    FAILOVER_MIGRATION_BATCH_SIZE: int = 100  # clients per panel write
+    FAILOVER_MIGRATION_CONCURRENCY: int = 4  # target panels provisioned in parallel
     
     # API Documentation
     DOCS_URL: Optional[str] = "/api/docs"
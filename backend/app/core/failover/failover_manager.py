@@ -1,14 +1,26 @@
 """
 Server failover management system
 """
-from typing import Dict, List, Optional, Set
+from typing import Dict, Optional, Set
 from datetime import datetime, timedelta
 import asyncio
+import logging
+import random
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
 from ...db.crud.server import server as server_crud
+from ...db.session import async_session
 from ...models.server import Server
 from ..monitoring.server_health import monitor
-from ..balancer.load_balancer import balancer
+from ..monitoring.anomaly import anomaly_detector
+from ..monitoring.metrics_snapshot import metrics_snapshots
+from ..monitoring.probes import prober
+from ..monitoring.uptime import uptime_engine
+from ..server_connector.circuit_breaker import panel_breakers
+from ...services.notification import NotificationService
+from .migration_executor import MigrationReport, migration_executor
+
+logger = logging.getLogger(__name__)
 
 class FailoverManager:
     """Manage server failover and recovery"""
@@ -23,20 +35,42 @@ class FailoverManager:
         self._is_running = False
         self._last_notification: Dict[int, datetime] = {}
         self.notification_cooldown = 300  # 5 minutes
+        self.probe_concurrency = settings.FAILOVER_PROBE_CONCURRENCY
+        self.probe_timeout = settings.FAILOVER_PROBE_TIMEOUT  # per-probe deadline in seconds
+        self.probe_jitter = 0.2  # +/- fraction of the interval between probes
+        self._probe_tasks: Dict[int, asyncio.Task] = {}
+        self._migration_progress: Dict[int, Dict[str, any]] = {}
+        self._probe_semaphore: Optional[asyncio.Semaphore] = None
+        self._db_lock: Optional[asyncio.Lock] = None
 
     async def start_monitoring(self, db: AsyncSession):
-        """Start failover monitoring"""
+        """
+        Start failover monitoring. Every server gets its own jittered probe
+        task; this loop only reconciles the task set with the server list.
+        """
         if self._is_running:
             return
             
         self._is_running = True
-        while self._is_running:
-            await self._check_all_servers(db)
-            await asyncio.sleep(self.health_check_interval)
+        self._probe_semaphore = asyncio.Semaphore(self.probe_concurrency)
+        # Probes run concurrently but share one session, so DB work is serialized
+        self._db_lock = asyncio.Lock()
+        try:
+            while self._is_running:
+                async with self._db_lock:
+                    await self._check_all_servers(db)
+                await asyncio.sleep(self.health_check_interval)
+        finally:
+            for task in self._probe_tasks.values():
+                task.cancel()
+            self._probe_tasks.clear()
 
     async def stop_monitoring(self):
         """Stop failover monitoring"""
         self._is_running = False
+        for task in self._probe_tasks.values():
+            task.cancel()
+        self._probe_tasks.clear()
 
     async def get_failover_status(
         self,
@@ -47,33 +81,102 @@ class FailoverManager:
         server = await server_crud.get(db=db, id=server_id)
         if not server:
             return {"status": "error", "message": "Server not found"}
-            
+        
+        await uptime_engine.load([server_id])
+        uptime = uptime_engine.get(server_id)
         return {
             "server_id": server_id,
             "is_failed": server_id in self._failed_servers,
             "failed_checks": self._failed_checks.get(server_id, 0),
             "recovery_checks": self._recovery_checks.get(server_id, 0),
+            "migration": self._migration_progress.get(server_id),
+            "uptime": uptime.dict() if uptime else None,
             "status": "failed" if server_id in self._failed_servers else "healthy"
         }
 
     async def _check_all_servers(self, db: AsyncSession):
-        """Check health of all active servers"""
+        """Start probe tasks for new servers and stop those for removed ones"""
         servers = await server_crud.get_active_servers(db)
+        watched = {server.id: server for server in servers}
         
-        for server in servers:
-            await self._check_server(db, server)
+        # Failed servers are deactivated but still need recovery probes
+        for server_id in self._failed_servers - watched.keys():
+            server = await server_crud.get(db=db, id=server_id)
+            if server:
+                watched[server_id] = server
+        
+        for server_id in list(self._probe_tasks):
+            if server_id not in watched:
+                self._probe_tasks.pop(server_id).cancel()
+        
+        for server_id, server in watched.items():
+            task = self._probe_tasks.get(server_id)
+            if task is None or task.done():
+                self._probe_tasks[server_id] = asyncio.create_task(
+                    self._probe_loop(db, server)
+                )
+
+    async def _probe_loop(self, db: AsyncSession, server: Server):
+        """Probe one server forever on its own jittered schedule"""
+        # Spread first probes over the interval instead of a thundering herd
+        await asyncio.sleep(random.uniform(0, self.health_check_interval))
+        while self._is_running:
+            try:
+                await self._check_server(db, server)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failover probe for server {server.id} failed: {str(e)}")
+            await asyncio.sleep(self.health_check_interval * random.uniform(
+                1 - self.probe_jitter,
+                1 + self.probe_jitter
+            ))
 
     async def _check_server(self, db: AsyncSession, server: Server):
         """Check individual server health and handle failover"""
-        health = await monitor.check_server_health(db, server.id)
+        async with self._probe_semaphore:
+            try:
+                healthy = await asyncio.wait_for(
+                    self._probe(server),
+                    timeout=self.probe_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Health probe for server {server.id} exceeded {self.probe_timeout}s")
+                healthy = False
+        
+        failed_over = False
+        async with self._db_lock:
+            if not healthy:
+                failed_over = await self._handle_unhealthy_server(db, server)
+            else:
+                await self._handle_healthy_server(db, server)
+        
+        # Migration talks to many panels; other servers' state changes
+        # must not queue behind it
+        if failed_over:
+            await self._migrate_clients(server)
+
+    async def _probe(self, server: Server) -> bool:
+        """Healthy if the panel is alive and its metrics are within thresholds"""
+        url = str(server.url)
+        if not panel_breakers.is_available(url):
+            return False
+        
+        # Liveness from a cheap TCP/TLS/ping probe, never a full stats call
+        probe = await prober.probe(server.id, url)
+        if not probe.alive:
+            return False
         
-        if health.get("status") != "healthy":
-            await self._handle_unhealthy_server(db, server)
-        else:
-            await self._handle_healthy_server(db, server)
+        # Resource health from the sync engine's snapshot, when there is one
+        await metrics_snapshots.load()
+        await anomaly_detector.load()
+        snapshot = metrics_snapshots.get(server.id)
+        if snapshot is None:
+            return True
+        return monitor.snapshot_health(snapshot, url) == "healthy"
 
-    async def _handle_unhealthy_server(self, db: AsyncSession, server: Server):
-        """Handle unhealthy server status"""
+    async def _handle_unhealthy_server(self, db: AsyncSession, server: Server) -> bool:
+        """Handle unhealthy server status; True if failover was initiated"""
         self._failed_checks[server.id] = self._failed_checks.get(server.id, 0) + 1
         self._recovery_checks[server.id] = 0
         
@@ -81,6 +184,8 @@ class FailoverManager:
         if (self._failed_checks[server.id] >= self.failover_threshold and
             server.id not in self._failed_servers):
             await self._initiate_failover(db, server)
+            return True
+        return False
 
     async def _handle_healthy_server(self, db: AsyncSession, server: Server):
         """Handle healthy server status"""
@@ -96,41 +201,32 @@ class FailoverManager:
                 await self._handle_server_recovery(db, server)
 
     async def _initiate_failover(self, db: AsyncSession, server: Server):
-        """Initiate failover process for failed server"""
+        """Mark the server failed; called under _db_lock"""
         self._failed_servers.add(server.id)
         
-        # Get server stats before failover
-        stats = await server_crud.get_server_stats(db=db, server_id=server.id)
-        if not stats or "error" in stats:
-            return
-            
-        # Find alternative servers for each client
-        moves = []
-        for inbound in stats.get("inbounds", []):
-            for client in inbound.get("clients", []):
-                # Find best alternative server
-                alt_server = await balancer.get_best_server(
-                    db,
-                    required_traffic=client.get("up", 0) + client.get("down", 0)
-                )
-                
-                if alt_server:
-                    moves.append({
-                        "client_email": client["email"],
-                        "from_server": server.id,
-                        "to_server": alt_server.id,
-                        "reason": "Server failover"
-                    })
-                    
-        # Update server status
+        # Deactivate first so nothing new is placed on it meanwhile
         await server_crud.update(
             db=db,
             db_obj=server,
             obj_in={"is_active": False}
         )
+
+    async def _migrate_clients(self, server: Server):
+        """
+        Move a failed server's clients. Runs outside _db_lock on a session
+        of its own, since the probes' shared session can't be used
+        concurrently.
+        """
+        async with async_session() as migration_db:
+            # Place every displaced client in one pass and provision in batches
+            report = await migration_executor.migrate(
+                migration_db,
+                server,
+                progress=lambda event: self._migration_progress.__setitem__(server.id, event)
+            )
         
         # Notify about failover
-        await self._send_failover_notification(server.id, moves)
+        await self._send_failover_notification(server.id, report)
 
     async def _handle_server_recovery(self, db: AsyncSession, server: Server):
         """Handle server recovery process"""
@@ -147,33 +243,41 @@ class FailoverManager:
         # Notify about recovery
         await self._send_recovery_notification(server.id)
 
-    async def _send_failover_notification(
-        self,
-        server_id: int,
-        moves: List[Dict]
-    ):
-        """Send failover notification"""
+    async def _send_failover_notification(self, server_id: int, report: MigrationReport):
+        """Log the migration outcome and alert admins"""
+        logger.warning(
+            f"Server {server_id} failed over: {report.migrated}/{report.total} clients migrated, "
+            f"{report.failed} failed, {report.unplaced} unplaced in {report.duration:.1f}s"
+        )
         if not self._should_notify(server_id):
             return
-            
-        # TODO: Implement notification system
-        # This could be integrated with your existing notification system
-        # (e.g., Telegram bot, email, etc.)
-        print(f"Server {server_id} has failed. Failover initiated.")
-        print(f"Moving {len(moves)} clients to alternative servers.")
         
+        await self._send_alert("server_failover", {
+            "server_id": server_id,
+            "total_clients": report.total,
+            "migrated": report.migrated,
+            "failed": report.failed,
+            "unplaced": report.unplaced,
+            "duration": round(report.duration, 1)
+        })
         self._last_notification[server_id] = datetime.utcnow()
 
     async def _send_recovery_notification(self, server_id: int):
-        """Send recovery notification"""
+        """Log the recovery and alert admins"""
+        logger.info(f"Server {server_id} has recovered and is back online")
         if not self._should_notify(server_id):
             return
-            
-        # TODO: Implement notification system
-        print(f"Server {server_id} has recovered and is back online.")
         
+        await self._send_alert("server_recovered", {"server_id": server_id})
         self._last_notification[server_id] = datetime.utcnow()
 
+    async def _send_alert(self, alert_type: str, details: Dict):
+        """A failed alert must never break the failover loop"""
+        try:
+            await NotificationService().send_system_alert(alert_type, details)
+        except Exception as e:
+            logger.error(f"Failed to send {alert_type} alert: {str(e)}")
+
     def _should_notify(self, server_id: int) -> bool:
         """Check if we should send a notification"""
         last_time = self._last_notification.get(server_id)
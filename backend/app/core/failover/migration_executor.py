@@ -0,0 +1,317 @@
+"""
+Batched client migration for server failover
+"""
+import asyncio
+import heapq
+import inspect
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..balancer.scoring import scoring_engine
+from ..monitoring.anomaly import anomaly_detector
+from ..monitoring.metrics_snapshot import metrics_snapshots
+from ..monitoring.uptime import uptime_engine
+from ..server_connector.base import ClientChange
+from ..server_connector.inbound_cache import inbound_cache
+from ...db.crud.server import server as server_crud
+from ...db.models.subscription import Subscription
+from ...models.server import Server
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 * 1024 * 1024
+
+ProgressCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+class MigrationReport(BaseModel):
+    """Outcome of migrating a failed server's clients"""
+    server_id: int
+    total: int = 0
+    migrated: int = 0
+    failed: int = 0
+    unplaced: int = 0  # no target had room
+    moves: List[Dict[str, Any]] = []
+    duration: float = 0.0
+
+class MigrationExecutor:
+    """
+    Move every client off a failed server: one placement pass over the
+    fleet, batched client creation per target panel, and one bulk
+    Subscription.server_id update per target.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.FAILOVER_MIGRATION_BATCH_SIZE,
+        concurrency: int = settings.FAILOVER_MIGRATION_CONCURRENCY,
+        source_timeout: float = settings.FAILOVER_PROBE_TIMEOUT
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency  # target panels provisioned in parallel
+        self.source_timeout = source_timeout  # the failed panel gets one short chance
+
+    async def migrate(
+        self,
+        db: AsyncSession,
+        failed_server: Server,
+        progress: Optional[ProgressCallback] = None
+    ) -> MigrationReport:
+        """Migrate all clients of failed_server and report per-client moves"""
+        started = time.monotonic()
+        report = MigrationReport(server_id=failed_server.id)
+
+        clients = await self._displaced_clients(db, failed_server)
+        report.total = len(clients)
+        if not clients:
+            report.duration = time.monotonic() - started
+            return report
+
+        targets = [
+            server for server in await server_crud.get_active_servers(db, limit=10000)
+            if server.id != failed_server.id
+        ]
+        assignments, unplaced = await self._place(targets, clients)
+        report.unplaced = len(unplaced)
+        for client in unplaced:
+            report.moves.append(self._move(client, failed_server.id, None, "No target with free capacity"))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes = await asyncio.gather(*(
+            self._provision(semaphore, target, batch, report, progress)
+            for target, batch in assignments.values()
+        ))
+
+        # One UPDATE per target instead of one per subscription
+        for (target, assigned), succeeded in zip(assignments.values(), outcomes):
+            subscription_ids = [c["subscription_id"] for c in succeeded if c.get("subscription_id")]
+            if subscription_ids:
+                await db.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(subscription_ids))
+                    .values(server_id=target.id)
+                )
+            done = {client["email"] for client in succeeded}
+            for client in assigned:
+                if client["email"] in done:
+                    report.moves.append(self._move(client, failed_server.id, target.id))
+                else:
+                    report.moves.append(self._move(
+                        client, failed_server.id, target.id, "Provisioning on target failed"
+                    ))
+        await db.commit()
+
+        report.failed = report.total - report.migrated - report.unplaced
+        report.duration = time.monotonic() - started
+        logger.info(
+            f"Migrated {report.migrated}/{report.total} clients off server {failed_server.id} "
+            f"in {report.duration:.1f}s ({report.failed} failed, {report.unplaced} unplaced)"
+        )
+        return report
+
+    async def _displaced_clients(
+        self,
+        db: AsyncSession,
+        server: Server
+    ) -> List[Dict[str, Any]]:
+        """
+        Clients to move, from active subscriptions on the server merged with
+        whatever the failed panel (or its last cached snapshot) still reports.
+        """
+        result = await db.execute(
+            select(Subscription).where(
+                Subscription.server_id == server.id,
+                Subscription.status == "active"
+            )
+        )
+        clients: Dict[str, Dict[str, Any]] = {}
+        for subscription in result.scalars().all():
+            email = f"user_{subscription.user_id}@vpn.local"
+            clients[email] = {
+                "email": email,
+                "uuid": None,
+                "total_gb": subscription.total_traffic * GB,
+                "expiry_time": int(subscription.expire_date.timestamp() * 1000),
+                "traffic": subscription.upload + subscription.download,
+                "subscription_id": subscription.id
+            }
+
+        for panel_client in await self._panel_clients(server):
+            email = panel_client.get("email")
+            if not email:
+                continue
+            client = clients.setdefault(email, {"email": email, "subscription_id": None})
+            # Keep the panel's UUID so existing client configs keep working
+            client["uuid"] = panel_client.get("id")
+            client["total_gb"] = panel_client.get("totalGB", client.get("total_gb", 0))
+            client["expiry_time"] = panel_client.get("expiryTime", client.get("expiry_time", 0))
+            client["traffic"] = panel_client.get("up", 0) + panel_client.get("down", 0) or client.get("traffic", 0)
+
+        for client in clients.values():
+            client["uuid"] = client.get("uuid") or str(uuid.uuid4())
+        return list(clients.values())
+
+    async def _panel_clients(self, server: Server) -> List[Dict[str, Any]]:
+        """Client list from the failed panel, falling back to its last snapshot"""
+        connector = server_crud._get_connector(server)
+        try:
+            async def fetch():
+                if not await connector.login(server.username, server.password):
+                    raise Exception("Failed to login to server panel")
+                return await connector.get_inbound_snapshot()
+            snapshot = await asyncio.wait_for(fetch(), timeout=self.source_timeout)
+        except Exception as e:
+            logger.info(f"Panel of failed server {server.id} unreachable, using cached clients: {str(e)}")
+            snapshot = inbound_cache.peek(connector.snapshot_key)
+        return snapshot.all_clients() if snapshot else []
+
+    async def _place(
+        self,
+        targets: List[Server],
+        clients: List[Dict[str, Any]]
+    ) -> Tuple[Dict[int, Tuple[Server, List[Dict[str, Any]]]], List[Dict[str, Any]]]:
+        """
+        Assign all clients in one pass: heaviest first, each to the target
+        with the lowest projected score. A target's score rises with every
+        client it takes, so load spreads instead of piling onto the best one.
+        """
+        await metrics_snapshots.load()
+        await scoring_engine.load_profiles()
+        await anomaly_detector.load()
+        await uptime_engine.load(server.id for server in targets)
+        snapshots = metrics_snapshots.get_many(server.id for server in targets)
+        scores = scoring_engine.score(targets, snapshots)
+
+        heap = []
+        for index, (server, snapshot, score) in enumerate(zip(targets, snapshots, scores)):
+            if snapshot is None or score == float("inf"):
+                continue
+            capacity = server.max_users - snapshot.total_clients
+            if capacity > 0:
+                heap.append((float(score), index, capacity))
+        heapq.heapify(heap)
+
+        assignments: Dict[int, Tuple[Server, List[Dict[str, Any]]]] = {}
+        unplaced = []
+        for client in sorted(clients, key=lambda c: c.get("traffic", 0), reverse=True):
+            if not heap:
+                unplaced.append(client)
+                continue
+            score, index, capacity = heapq.heappop(heap)
+            server = targets[index]
+            assignments.setdefault(server.id, (server, []))[1].append(client)
+            if capacity > 1:
+                # Each client takes 1/max_users of the target's capacity
+                heapq.heappush(heap, (score + 1 / max(server.max_users, 1), index, capacity - 1))
+        return assignments, unplaced
+
+    async def _provision(
+        self,
+        semaphore: asyncio.Semaphore,
+        target: Server,
+        clients: List[Dict[str, Any]],
+        report: MigrationReport,
+        progress: Optional[ProgressCallback]
+    ) -> List[Dict[str, Any]]:
+        """Create the clients on one target panel in batches; return the successes"""
+        succeeded = []
+        async with semaphore:
+            connector = server_crud._get_connector(target)
+            try:
+                if not await connector.login(target.username, target.password):
+                    raise Exception("Failed to login to server panel")
+                inbound_id = await self._pick_inbound(connector)
+            except Exception as e:
+                logger.error(f"Cannot provision clients on server {target.id}: {str(e)}")
+                await self._report_progress(progress, report, target.id, 0, len(clients))
+                return succeeded
+
+            for start in range(0, len(clients), self.batch_size):
+                batch = clients[start:start + self.batch_size]
+                changes = [
+                    ClientChange(
+                        inbound_id=inbound_id,
+                        email=client["email"],
+                        uuid=client["uuid"],
+                        enable=True,
+                        total_gb=client.get("total_gb") or 0,
+                        expiry_time=client.get("expiry_time") or 0
+                    )
+                    for client in batch
+                ]
+                try:
+                    results = await connector.add_clients(changes)
+                    ok = {result.email for result in results if result.success}
+                except Exception as e:
+                    logger.error(f"Batch provisioning on server {target.id} failed: {str(e)}")
+                    ok = set()
+
+                batch_ok = [client for client in batch if client["email"] in ok]
+                succeeded.extend(batch_ok)
+                report.migrated += len(batch_ok)
+                await self._report_progress(
+                    progress, report, target.id, len(batch_ok), len(batch) - len(batch_ok)
+                )
+        return succeeded
+
+    async def _pick_inbound(self, connector) -> int:
+        """Enabled inbound with the fewest clients on the target panel"""
+        snapshot = await connector.get_inbound_snapshot()
+        candidates = [inbound for inbound in snapshot.inbounds if inbound.get("enable", True)]
+        if not candidates:
+            raise Exception("No enabled inbound on target panel")
+        best = min(candidates, key=lambda inbound: len(snapshot.clients.get(inbound.get("id"), [])))
+        return best["id"]
+
+    async def _report_progress(
+        self,
+        progress: Optional[ProgressCallback],
+        report: MigrationReport,
+        target_id: int,
+        provisioned: int,
+        failed: int
+    ) -> None:
+        """Emit a progress event after each batch"""
+        event = {
+            "server_id": report.server_id,
+            "target_server": target_id,
+            "batch_provisioned": provisioned,
+            "batch_failed": failed,
+            "migrated": report.migrated,
+            "total": report.total
+        }
+        logger.info(
+            f"Failover of server {report.server_id}: {report.migrated}/{report.total} "
+            f"migrated (last batch to server {target_id}: {provisioned} ok, {failed} failed)"
+        )
+        if progress:
+            try:
+                result = progress(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Migration progress callback failed: {str(e)}")
+
+    @staticmethod
+    def _move(
+        client: Dict[str, Any],
+        from_server: int,
+        to_server: Optional[int],
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        move = {
+            "client_email": client["email"],
+            "from_server": from_server,
+            "to_server": to_server,
+            "reason": "Server failover"
+        }
+        if error:
+            move["error"] = error
+        return move
+
+# Create migration executor instance
+migration_executor = MigrationExecutor()
@@ -0,0 +1,237 @@
+"""
+Streaming anomaly detection on server metrics
+"""
+import json
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+from ..config import settings
+from .metrics_snapshot import MetricsSnapshot
+from ...db.session import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Levels that count as too high no matter what is normal for the server
+ALERT_THRESHOLDS = {
+    "cpu": 80.0,  # CPU usage threshold (%)
+    "memory": 85.0,  # Memory usage threshold (%)
+    "load": 5.0,  # Load average threshold
+    "disk": 90.0,  # Disk usage threshold (%)
+}
+
+# Snapshot field -> (alert threshold key or None, smallest deviation unit).
+# The floor keeps near-constant series from turning noise into huge z-scores.
+DETECTED_METRICS: Dict[str, Tuple[Optional[str], float]] = {
+    "cpu_usage": ("cpu", 2.0),
+    "memory_usage": ("memory", 2.0),
+    "load": ("load", 0.25),
+    "disk_usage": ("disk", 1.0),
+    "response_time": (None, 20.0),  # milliseconds; deviation only
+}
+
+class MetricState(BaseModel):
+    """EWMA state and hysteresis for one metric of one server"""
+    level: float = 0.0  # fast EWMA: the smoothed current value
+    baseline: float = 0.0  # slow EWMA: what is normal for this server
+    variance: float = 0.0  # slow exponentially weighted variance around baseline
+    zscore: float = 0.0  # deviation of level from baseline
+    samples: int = 0
+    anomalous: bool = False
+    streak: int = 0  # consecutive samples pointing at the other state
+    since: Optional[float] = None  # unix timestamp the anomaly started
+    reason: Optional[str] = None  # "threshold" or "deviation"
+
+class ServerAnomalies(BaseModel):
+    """Detector state for every metric of one server"""
+    server_id: int
+    metrics: Dict[str, MetricState] = {}
+    updated_at: float = 0.0
+
+    @property
+    def anomalous(self) -> bool:
+        return any(state.anomalous for state in self.metrics.values())
+
+    def active(self) -> Dict[str, MetricState]:
+        return {metric: state for metric, state in self.metrics.items() if state.anomalous}
+
+class AnomalyTransition(BaseModel):
+    """A metric entering or leaving the anomalous state"""
+    server_id: int
+    metric: str
+    anomalous: bool
+    value: float
+    level: float
+    baseline: float
+    zscore: float
+    reason: Optional[str] = None
+
+class AnomalyDetector:
+    """
+    Per server and metric, a fast EWMA smooths out spikes and a slow EWMA
+    with variance learns the normal level. A metric turns anomalous after
+    several consecutive samples above its threshold or far above its
+    baseline, and only clears after several calm samples, so single spikes
+    don't flap and slow drifts still show. Each sample is O(1).
+    """
+
+    def __init__(
+        self,
+        fast_alpha: float = settings.ANOMALY_FAST_ALPHA,
+        slow_alpha: float = settings.ANOMALY_SLOW_ALPHA,
+        z_enter: float = settings.ANOMALY_Z_ENTER,
+        z_exit: float = settings.ANOMALY_Z_EXIT,
+        enter_samples: int = settings.ANOMALY_ENTER_SAMPLES,
+        exit_samples: int = settings.ANOMALY_EXIT_SAMPLES,
+        warmup_samples: int = settings.ANOMALY_WARMUP_SAMPLES,
+        clear_ratio: float = 0.9,  # level must drop this far below the threshold to clear
+        refresh_interval: float = settings.METRICS_SNAPSHOT_REFRESH_INTERVAL,
+        key: str = "server_anomalies"
+    ):
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.z_enter = z_enter
+        self.z_exit = z_exit
+        self.enter_samples = enter_samples
+        self.exit_samples = exit_samples
+        self.warmup_samples = warmup_samples  # deviation is ignored until the baseline settles
+        self.clear_ratio = clear_ratio
+        self.refresh_interval = refresh_interval
+        self.key = key
+        self.thresholds = dict(ALERT_THRESHOLDS)
+        self._servers: Dict[int, ServerAnomalies] = {}
+        self._loaded_at = 0.0
+
+    async def observe_many(self, snapshots: Iterable[MetricsSnapshot]) -> List[AnomalyTransition]:
+        """Feed one sync round of snapshots; return the state changes"""
+        snapshots = [s for s in snapshots if s.is_online]
+        if not snapshots:
+            return []
+
+        # Continue from the state the previous sync (maybe another worker) left
+        await self.load(force=True)
+        transitions = []
+        for snapshot in snapshots:
+            server = self._servers.setdefault(
+                snapshot.server_id, ServerAnomalies(server_id=snapshot.server_id)
+            )
+            for metric, (threshold_key, min_deviation) in DETECTED_METRICS.items():
+                value = getattr(snapshot, metric)
+                if value is None:
+                    continue
+                state = server.metrics.setdefault(metric, MetricState())
+                threshold = self.thresholds.get(threshold_key) if threshold_key else None
+                changed = self.update(state, float(value), threshold, min_deviation, snapshot.updated_at)
+                if changed:
+                    transitions.append(AnomalyTransition(
+                        server_id=snapshot.server_id,
+                        metric=metric,
+                        anomalous=state.anomalous,
+                        value=float(value),
+                        level=state.level,
+                        baseline=state.baseline,
+                        zscore=state.zscore,
+                        reason=state.reason
+                    ))
+            server.updated_at = time.time()
+
+        try:
+            await async_redis_client.hset(
+                self.key,
+                mapping={str(s.server_id): self._servers[s.server_id].json() for s in snapshots}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish anomaly state: {str(e)}")
+
+        for transition in transitions:
+            logger.info(
+                f"Server {transition.server_id} {transition.metric} "
+                f"{'anomalous' if transition.anomalous else 'back to normal'}: "
+                f"level {transition.level:.2f}, baseline {transition.baseline:.2f}, "
+                f"z {transition.zscore:.1f}"
+            )
+        return transitions
+
+    def update(
+        self,
+        state: MetricState,
+        value: float,
+        threshold: Optional[float],
+        min_deviation: float,
+        now: Optional[float] = None
+    ) -> bool:
+        """Advance one metric by one sample; True if its anomalous flag flipped"""
+        if state.samples == 0:
+            state.level = state.baseline = value
+            state.variance = 0.0
+        else:
+            state.level += self.fast_alpha * (value - state.level)
+            # Learn much slower while anomalous so the anomaly doesn't become normal
+            alpha = self.slow_alpha * (0.1 if state.anomalous else 1.0)
+            diff = value - state.baseline
+            state.baseline += alpha * diff
+            state.variance = (1 - alpha) * (state.variance + alpha * diff * diff)
+        state.samples += 1
+        state.zscore = (state.level - state.baseline) / max(math.sqrt(state.variance), min_deviation)
+
+        warmed_up = state.samples >= self.warmup_samples
+        if not state.anomalous:
+            over_threshold = threshold is not None and state.level >= threshold
+            deviating = warmed_up and state.zscore >= self.z_enter
+            state.streak = state.streak + 1 if over_threshold or deviating else 0
+            if state.streak >= self.enter_samples:
+                state.anomalous = True
+                state.streak = 0
+                state.since = now or time.time()
+                state.reason = "threshold" if over_threshold else "deviation"
+                return True
+            return False
+
+        calm = (
+            (threshold is None or state.level < threshold * self.clear_ratio) and
+            (not warmed_up or state.zscore < self.z_exit)
+        )
+        state.streak = state.streak + 1 if calm else 0
+        if state.streak >= self.exit_samples:
+            state.anomalous = False
+            state.streak = 0
+            state.since = None
+            state.reason = None
+            return True
+        return False
+
+    async def load(self, force: bool = False) -> Dict[int, ServerAnomalies]:
+        """Pull detector state from Redis at most once per refresh interval"""
+        if not force and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return self._servers
+
+        try:
+            raw = await async_redis_client.hgetall(self.key)
+            for server_id, payload in raw.items():
+                state = ServerAnomalies(**json.loads(payload))
+                current = self._servers.get(int(server_id))
+                if not current or current.updated_at <= state.updated_at:
+                    self._servers[int(server_id)] = state
+        except Exception as e:
+            logger.debug(f"Anomaly state store unavailable, using local copy: {str(e)}")
+        self._loaded_at = time.monotonic()
+        return self._servers
+
+    def get(self, server_id: int) -> Optional[ServerAnomalies]:
+        return self._servers.get(server_id)
+
+    def is_anomalous(self, server_id: int) -> bool:
+        server = self._servers.get(server_id)
+        return bool(server and server.anomalous)
+
+    async def remove(self, server_id: int) -> None:
+        """Forget a deleted server's state"""
+        self._servers.pop(server_id, None)
+        try:
+            await async_redis_client.hdel(self.key, str(server_id))
+        except Exception as e:
+            logger.debug(f"Failed to remove anomaly state: {str(e)}")
+
+# Create anomaly detector instance
+anomaly_detector = AnomalyDetector()
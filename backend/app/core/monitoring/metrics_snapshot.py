@@ -0,0 +1,107 @@
+"""
+Latest-metrics snapshot store for placement decisions
+"""
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+from pydantic import BaseModel
+from ..config import settings
+from ...db.session import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+class MetricsSnapshot(BaseModel):
+    """Latest known metrics of one server"""
+    server_id: int
+    cpu_usage: float = 0.0  # percent
+    memory_usage: float = 0.0  # percent
+    disk_usage: float = 0.0  # percent
+    load: float = 0.0  # 1 minute load average
+    network_in: int = 0  # bytes
+    network_out: int = 0  # bytes
+    total_clients: int = 0
+    active_users: int = 0
+    response_time: Optional[float] = None  # milliseconds
+    is_online: bool = True
+    updated_at: float = 0.0  # unix timestamp
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+    @property
+    def traffic_gb(self) -> float:
+        return (self.network_in + self.network_out) / (1024 * 1024 * 1024)
+
+class MetricsSnapshotStore:
+    """Keep the latest metrics per server in memory, shared across workers via Redis"""
+
+    def __init__(
+        self,
+        max_age: float = settings.METRICS_SNAPSHOT_MAX_AGE,
+        refresh_interval: float = settings.METRICS_SNAPSHOT_REFRESH_INTERVAL,
+        key: str = "server_metrics_snapshot"
+    ):
+        self.max_age = max_age  # older snapshots are treated as unknown
+        self.refresh_interval = refresh_interval  # how often readers pull from Redis
+        self.key = key
+        self._snapshots: Dict[int, MetricsSnapshot] = {}
+        self._loaded_at = 0.0
+
+    async def update_many(self, snapshots: Iterable[MetricsSnapshot]) -> None:
+        """Publish fresh snapshots (called by the sync engine)"""
+        snapshots = list(snapshots)
+        if not snapshots:
+            return
+        for snapshot in snapshots:
+            self._snapshots[snapshot.server_id] = snapshot
+
+        try:
+            await async_redis_client.hset(
+                self.key,
+                mapping={str(s.server_id): s.json() for s in snapshots}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish metrics snapshots: {str(e)}")
+
+    async def update(self, snapshot: MetricsSnapshot) -> None:
+        await self.update_many([snapshot])
+
+    async def load(self, force: bool = False) -> Dict[int, MetricsSnapshot]:
+        """Pull all snapshots from Redis at most once per refresh interval"""
+        if not force and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return self._snapshots
+
+        try:
+            raw = await async_redis_client.hgetall(self.key)
+            for server_id, payload in raw.items():
+                snapshot = MetricsSnapshot(**json.loads(payload))
+                current = self._snapshots.get(int(server_id))
+                if not current or current.updated_at <= snapshot.updated_at:
+                    self._snapshots[int(server_id)] = snapshot
+        except Exception as e:
+            logger.debug(f"Metrics snapshot store unavailable, using local copy: {str(e)}")
+        self._loaded_at = time.monotonic()
+        return self._snapshots
+
+    def get(self, server_id: int) -> Optional[MetricsSnapshot]:
+        """Fresh snapshot for the server, or None if unknown or stale"""
+        snapshot = self._snapshots.get(server_id)
+        if snapshot and snapshot.age <= self.max_age:
+            return snapshot
+        return None
+
+    def get_many(self, server_ids: Iterable[int]) -> List[Optional[MetricsSnapshot]]:
+        return [self.get(server_id) for server_id in server_ids]
+
+    async def remove(self, server_id: int) -> None:
+        """Forget a deleted server"""
+        self._snapshots.pop(server_id, None)
+        try:
+            await async_redis_client.hdel(self.key, str(server_id))
+        except Exception as e:
+            logger.debug(f"Failed to remove metrics snapshot: {str(e)}")
+
+# Create snapshot store instance
+metrics_snapshots = MetricsSnapshotStore()
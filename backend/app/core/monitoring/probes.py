@@ -0,0 +1,167 @@
+"""
+Lightweight active probes for server liveness
+"""
+import asyncio
+import json
+import logging
+import ssl
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import aiohttp
+from pydantic import BaseModel
+from ..config import settings
+from ..server_connector.http_client import panel_http
+from .uptime import uptime_engine
+from ...db.session import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+class ProbeResult(BaseModel):
+    """Outcome of one liveness probe (latencies in milliseconds)"""
+    server_id: int
+    tcp_ok: bool = False
+    tcp_latency: Optional[float] = None
+    tls_ok: Optional[bool] = None  # None for plain-HTTP panels
+    tls_latency: Optional[float] = None
+    ping_ok: bool = False
+    ping_latency: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0  # unix timestamp
+
+    @property
+    def alive(self) -> bool:
+        return self.tcp_ok and self.tls_ok is not False and self.ping_ok
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.checked_at
+
+class ActiveProber:
+    """
+    Probe panels with TCP connect, TLS handshake and an unauthenticated
+    HTTP ping. Results are stored apart from full stats snapshots.
+    """
+
+    def __init__(
+        self,
+        timeout: float = settings.PROBE_TIMEOUT,
+        concurrency: int = settings.PROBE_CONCURRENCY,
+        max_age: float = settings.PROBE_INTERVAL * 3,
+        key: str = "server_probe_results"
+    ):
+        self.timeout = timeout  # per step, in seconds
+        self.concurrency = concurrency
+        self.max_age = max_age  # older results are treated as unknown
+        self.key = key
+        self._results: Dict[int, ProbeResult] = {}
+        # Panels commonly use self-signed certificates; we only time the handshake
+        self._ssl_context = ssl.create_default_context()
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+
+    async def probe(self, server_id: int, base_url: str, store: bool = True) -> ProbeResult:
+        """Probe one panel; each step only runs if the previous one passed"""
+        parts = urlsplit(str(base_url))
+        host = parts.hostname
+        secure = parts.scheme == "https"
+        port = parts.port or (443 if secure else 80)
+        result = ProbeResult(server_id=server_id, checked_at=time.time())
+
+        try:
+            result.tcp_latency = await self._timed(self._tcp_connect(host, port))
+            result.tcp_ok = True
+
+            if secure:
+                result.tls_latency = await self._timed(self._tls_handshake(host, port))
+                result.tls_ok = True
+
+            result.ping_latency = await self._timed(self._panel_ping(base_url))
+            result.ping_ok = True
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+            if secure and result.tcp_ok and result.tls_ok is None:
+                result.tls_ok = False
+
+        if store:
+            await self._store([result])
+        return result
+
+    async def probe_many(self, servers: Iterable[Tuple[int, str]]) -> List[ProbeResult]:
+        """Probe (server_id, base_url) pairs with bounded concurrency"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(server_id: int, base_url: str) -> ProbeResult:
+            async with semaphore:
+                return await self.probe(server_id, base_url, store=False)
+
+        results = await asyncio.gather(*(bounded(sid, url) for sid, url in servers))
+        await self._store(results)
+        return results
+
+    async def load(self) -> Dict[int, ProbeResult]:
+        """Pull results written by other workers"""
+        try:
+            raw = await async_redis_client.hgetall(self.key)
+            for server_id, payload in raw.items():
+                result = ProbeResult(**json.loads(payload))
+                current = self._results.get(int(server_id))
+                if not current or current.checked_at <= result.checked_at:
+                    self._results[int(server_id)] = result
+        except Exception as e:
+            logger.debug(f"Probe result store unavailable, using local copy: {str(e)}")
+        return self._results
+
+    def latest(self, server_id: int) -> Optional[ProbeResult]:
+        """Fresh probe result for the server, or None"""
+        result = self._results.get(server_id)
+        if result and result.age <= self.max_age:
+            return result
+        return None
+
+    async def _store(self, results: List[ProbeResult]) -> None:
+        if not results:
+            return
+        for result in results:
+            self._results[result.server_id] = result
+        await uptime_engine.record_many((r.server_id, r.alive) for r in results)
+        try:
+            await async_redis_client.hset(
+                self.key,
+                mapping={str(r.server_id): r.json() for r in results}
+            )
+        except Exception as e:
+            logger.debug(f"Failed to publish probe results: {str(e)}")
+
+    async def _timed(self, step) -> float:
+        """Run a probe step under the timeout and return its latency"""
+        started = time.monotonic()
+        await asyncio.wait_for(step, timeout=self.timeout)
+        return (time.monotonic() - started) * 1000
+
+    async def _tcp_connect(self, host: str, port: int) -> None:
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+        await writer.wait_closed()
+
+    async def _tls_handshake(self, host: str, port: int) -> None:
+        _, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl_context, server_hostname=host
+        )
+        writer.close()
+        await writer.wait_closed()
+
+    async def _panel_ping(self, base_url: str) -> None:
+        """Unauthenticated GET of the panel root; anything below 500 is alive"""
+        session = await panel_http.get_session(base_url)
+        async with session.get(
+            str(base_url),
+            allow_redirects=False,
+            ssl=False,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status >= 500:
+                raise Exception(f"Panel answered HTTP {response.status}")
+
+# Create prober instance
+prober = ActiveProber()
@@ -0,0 +1,126 @@
+"""
+Prometheus metrics for the fleet and application hot paths
+"""
+import logging
+import os
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# With several uvicorn workers every process writes its samples to
+# PROMETHEUS_MULTIPROC_DIR and /metrics merges them at scrape time. The
+# directory has to be emptied by whatever starts the workers.
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+PANEL_REQUEST_SECONDS = Histogram(
+    "vpn_panel_request_seconds",
+    "Latency of 3x-ui panel requests",
+    ["panel", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+# prometheus-client 0.11 has no livemax; a worker that exits keeps its
+# last breaker state in the merge until the directory is emptied
+PANEL_CIRCUIT_STATE = Gauge(
+    "vpn_panel_circuit_state",
+    "Panel circuit breaker state (0 closed, 1 half-open, 2 open), worst across workers",
+    ["panel"],
+    multiprocess_mode="max"
+)
+FLEET_SYNC_SECONDS = Histogram(
+    "vpn_fleet_sync_seconds",
+    "Duration of a full fleet sync",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120)
+)
+FLEET_SYNC_SERVERS = Counter(
+    "vpn_fleet_sync_servers_total",
+    "Servers processed by fleet sync",
+    ["result"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "vpn_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge(
+    "vpn_db_pool_size",
+    "Configured database pool size",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "vpn_cache_requests_total",
+    "Cache lookups by result (hit, shared in-flight, miss)",
+    ["cache", "result"]
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "vpn_rate_limit_rejections_total",
+    "Requests rejected by a rate limiter",
+    ["limiter"]
+)
+TELEGRAM_MESSAGES = Counter(
+    "vpn_telegram_messages_total",
+    "Telegram messages sent, by result",
+    ["sender", "result"]
+)
+TELEGRAM_SEND_SECONDS = Histogram(
+    "vpn_telegram_send_seconds",
+    "Latency of Telegram send_message calls",
+    ["sender"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+DB_SLOW_QUERIES = Counter(
+    "vpn_db_slow_queries_total",
+    "Statements over the slow-query threshold, by what ran them",
+    ["kind"]
+)
+DB_N_PLUS_ONE = Counter(
+    "vpn_db_n_plus_one_total",
+    "Requests and tasks that repeated one SELECT past the N+1 threshold",
+    ["kind"]
+)
+
+def observe_breaker_state(panel: str, state: str) -> None:
+    """Export a circuit breaker transition"""
+    PANEL_CIRCUIT_STATE.labels(panel=panel).set(BREAKER_STATE_VALUES.get(state, 0))
+
+def instrument_pool(engine, name: str) -> None:
+    """Track checked-out connections of a (sync or async) engine's pool"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    size = getattr(sync_engine.pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.labels(pool=name).set(size())
+
+    checked_out = DB_POOL_CHECKED_OUT.labels(pool=name)
+    event.listen(sync_engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(sync_engine, "checkin", lambda *args: checked_out.dec())
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition payload for /metrics, merged across workers if needed"""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the shared directory on shutdown"""
+    if MULTIPROCESS_DIR:
+        try:
+            multiprocess.mark_process_dead(os.getpid())
+        except Exception as e:
+            logger.debug(f"Failed to mark metrics worker dead: {str(e)}")
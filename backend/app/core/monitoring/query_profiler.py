@@ -0,0 +1,223 @@
+"""
+Per-request and per-task SQL profiling with a rolling slow-query log
+"""
+import heapq
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from ..config import settings
+from .prometheus import DB_N_PLUS_ONE, DB_SLOW_QUERIES
+from ...db.session import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+# Normalization turns statements that differ only in literals, bound
+# parameters or IN-list / VALUES length into one fingerprint
+COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDERS = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+|\?")
+NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+REPEATED_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Statement with every literal and parameter replaced by ?"""
+    text = COMMENTS.sub(" ", statement)
+    text = STRING_LITERALS.sub("?", text)
+    text = PLACEHOLDERS.sub("?", text)
+    text = NUMBERS.sub("?", text)
+    text = VALUE_LISTS.sub("(...)", text)
+    text = REPEATED_ROWS.sub("(...)", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+class QueryProfile:
+    """Statements run by one request or task"""
+
+    def __init__(self, kind: str, name: str, top_n: int):
+        self.kind = kind  # "request" or "task"
+        self.name = name
+        self.top_n = top_n
+        self.count = 0
+        self.total_time = 0.0  # seconds
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, fingerprint)
+        self.selects: Counter = Counter()  # fingerprint -> executions
+        self.slow: List[Tuple[float, str]] = []  # statements over the slow threshold
+
+    def record(self, statement: str, duration: float, slow_threshold: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        statement_fingerprint = fingerprint(statement)
+        if statement_fingerprint[:6].upper() == "SELECT":
+            self.selects[statement_fingerprint] += 1
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, (duration, statement_fingerprint))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement_fingerprint))
+        if duration >= slow_threshold:
+            self.slow.append((duration, statement_fingerprint))
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """SELECTs run at least threshold times: the shape of an N+1"""
+        return [(sql, count) for sql, count in self.selects.most_common() if count >= threshold]
+
+    def summary(self, n_plus_one_threshold: int) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 2),
+            "slowest": [
+                {"fingerprint": sql, "duration_ms": round(duration * 1000, 2)}
+                for duration, sql in sorted(self.slowest, reverse=True)
+            ],
+            "n_plus_one": [
+                {"fingerprint": sql, "count": count}
+                for sql, count in self.repeated(n_plus_one_threshold)
+            ]
+        }
+
+class QueryProfiler:
+    """
+    Cursor-level engine hooks time every statement and charge it to the
+    QueryProfile of the request or task running it, found through a
+    context variable so concurrent requests on one loop stay apart. When a
+    profile ends, slow statements and repeated SELECTs are logged, counted
+    in Prometheus and pushed to a capped Redis list shared by all workers.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.QUERY_PROFILING_ENABLED,
+        slow_query_ms: float = settings.SLOW_QUERY_THRESHOLD_MS,
+        n_plus_one_threshold: int = settings.N_PLUS_ONE_THRESHOLD,
+        top_n: int = settings.QUERY_PROFILE_TOP_N,
+        log_size: int = settings.SLOW_QUERY_LOG_SIZE,
+        key: str = "slow_queries"
+    ):
+        self.enabled = enabled
+        self.slow_threshold = slow_query_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.top_n = top_n
+        self.log_size = log_size
+        self.key = key
+        self._current: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+        self._instrumented = set()
+
+    def instrument(self, engine) -> None:
+        """Attach the timing hooks to a (sync or async) engine once"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if not self.enabled or id(sync_engine) in self._instrumented:
+            return
+        self._instrumented.add(id(sync_engine))
+        event.listen(sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+        event.listen(sync_engine, "handle_error", self._on_error)
+
+    def start(self, kind: str, name: str):
+        """Begin profiling the current context; pass the token to finish"""
+        profile = QueryProfile(kind, name, self.top_n)
+        return profile, self._current.set(profile)
+
+    def finish(self, profile: QueryProfile, token) -> List[str]:
+        """Stop profiling and report; returns the entries for the rolling log"""
+        self._current.reset(token)
+        now = time.time()
+        entries = []
+        for duration, sql in profile.slow:
+            DB_SLOW_QUERIES.labels(kind=profile.kind).inc()
+            logger.warning(f"Slow query ({duration * 1000:.1f}ms) in {profile.name}: {sql}")
+            entries.append(json.dumps({
+                "type": "slow",
+                "fingerprint": sql,
+                "duration_ms": round(duration * 1000, 2),
+                "scope": profile.name,
+                "at": now
+            }))
+        for sql, count in profile.repeated(self.n_plus_one_threshold):
+            DB_N_PLUS_ONE.labels(kind=profile.kind).inc()
+            logger.warning(f"Possible N+1 in {profile.name}: {count}x {sql}")
+            entries.append(json.dumps({
+                "type": "n_plus_one",
+                "fingerprint": sql,
+                "count": count,
+                "scope": profile.name,
+                "at": now
+            }))
+        return entries
+
+    async def publish(self, entries: List[str]) -> None:
+        if not entries:
+            return
+        try:
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.lpush(self.key, *entries)
+            pipe.ltrim(self.key, 0, self.log_size - 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish slow queries: {str(e)}")
+
+    def publish_sync(self, entries: List[str]) -> None:
+        """publish for callers outside an event loop, e.g. Celery signals"""
+        if not entries:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.lpush(self.key, *entries)
+            pipe.ltrim(self.key, 0, self.log_size - 1)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish slow queries: {str(e)}")
+
+    async def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest entries of the rolling log"""
+        raw = await async_redis_client.lrange(self.key, 0, limit - 1)
+        return [json.loads(entry) for entry in raw]
+
+    async def report(self) -> List[Dict[str, Any]]:
+        """The rolling log grouped by fingerprint, worst total time first"""
+        groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for entry in await self.recent(self.log_size):
+            group = groups.setdefault((entry["type"], entry["fingerprint"]), {
+                "type": entry["type"],
+                "fingerprint": entry["fingerprint"],
+                "occurrences": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "max_count": 0,
+                "scopes": [],
+                "last_seen": entry["at"]
+            })
+            group["occurrences"] += 1
+            group["total_ms"] = round(group["total_ms"] + entry.get("duration_ms", 0.0), 2)
+            group["max_ms"] = max(group["max_ms"], entry.get("duration_ms", 0.0))
+            group["max_count"] = max(group["max_count"], entry.get("count", 0))
+            if entry["scope"] not in group["scopes"]:
+                group["scopes"].append(entry["scope"])
+        return sorted(groups.values(), key=lambda g: (g["total_ms"], g["max_count"]), reverse=True)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current.get() is not None:
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self._current.get()
+        starts = conn.info.get("query_start_time")
+        if profile is None or not starts:
+            return
+        profile.record(statement, time.perf_counter() - starts.pop(), self.slow_threshold)
+
+    def _on_error(self, exception_context):
+        starts = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+# Create query profiler instance
+query_profiler = QueryProfiler()
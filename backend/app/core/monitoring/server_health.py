@@ -6,17 +6,16 @@ from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...db.crud.server import server as server_crud
 from ...models.server import Server
+from ..server_connector.circuit_breaker import panel_breakers
+from .anomaly import ALERT_THRESHOLDS, anomaly_detector
+from .metrics_snapshot import MetricsSnapshot
+from .probes import ProbeResult, prober
 
 class ServerHealthMonitor:
     """Monitor server health and manage alerts"""
     
     def __init__(self):
-        self.alert_thresholds = {
-            "cpu": 80.0,  # CPU usage threshold (%)
-            "memory": 85.0,  # Memory usage threshold (%)
-            "load": 5.0,  # Load average threshold
-            "disk": 90.0,  # Disk usage threshold (%)
-        }
+        self.alert_thresholds = dict(ALERT_THRESHOLDS)
         self.check_interval = 300  # 5 minutes
         self._last_check: Dict[int, datetime] = {}
         self._alerts: Dict[int, List[str]] = {}
@@ -30,12 +29,29 @@ class ServerHealthMonitor:
         server = await server_crud.get(db=db, id=server_id)
         if not server:
             return {"status": "error", "message": "Server not found"}
+        
+        # Shares breaker state with the panel clients: an open circuit means
+        # every caller is already failing fast, so don't poll the panel either
+        breaker = panel_breakers.get(server.url)
+        if breaker.is_open:
+            return self._unreachable_health(
+                server, breaker.last_error or "circuit open", panel=breaker.to_dict()
+            )
+        
+        # Liveness comes from the cheap probe; the heavy status call below
+        # only runs every check_interval and only for live servers
+        probe = await self.get_probe(server)
+        if not probe.alive:
+            return self._unreachable_health(
+                server, probe.error or "probe failed", probe=probe.dict()
+            )
             
         # Check if we need to update stats
         if self._should_update_stats(server_id):
             await server_crud.update_server_load(db=db, server_id=server_id)
             self._last_check[server_id] = datetime.utcnow()
-            
+        
+        await anomaly_detector.load()
         return self._analyze_server_health(server)
 
     async def get_system_alerts(
@@ -56,33 +72,101 @@ class ServerHealthMonitor:
         last_check = self._last_check[server_id]
         return (datetime.utcnow() - last_check).total_seconds() >= self.check_interval
 
+    def snapshot_health(
+        self,
+        snapshot: Optional[MetricsSnapshot],
+        panel_url: Optional[str] = None
+    ) -> str:
+        """
+        Classify health from a cached metrics snapshot, without any I/O.
+        Uses the anomaly detector's smoothed view when it has one, so a
+        single spike doesn't count; raw thresholds are the fallback.
+        """
+        if snapshot is None or not snapshot.is_online:
+            return "critical"
+        if panel_url and not panel_breakers.is_available(panel_url):
+            return "critical"
+        anomalies = anomaly_detector.get(snapshot.server_id)
+        if anomalies is not None:
+            return "warning" if anomalies.anomalous else "healthy"
+        if (
+            snapshot.cpu_usage >= self.alert_thresholds["cpu"] or
+            snapshot.memory_usage >= self.alert_thresholds["memory"] or
+            snapshot.load >= self.alert_thresholds["load"] or
+            snapshot.disk_usage >= self.alert_thresholds["disk"]
+        ):
+            return "warning"
+        return "healthy"
+
+    def get_panel_states(self) -> Dict[str, Dict[str, any]]:
+        """Circuit breaker state of every panel seen by this process"""
+        return panel_breakers.snapshot()
+
+    async def get_probe(self, server: Server) -> ProbeResult:
+        """Latest liveness probe, probing now if none is fresh"""
+        probe = prober.latest(server.id)
+        if probe is None:
+            await prober.load()
+            probe = prober.latest(server.id)
+        if probe is None:
+            probe = await prober.probe(server.id, str(server.url))
+        return probe
+
+    def _unreachable_health(
+        self,
+        server: Server,
+        error: str,
+        **details: Dict[str, any]
+    ) -> Dict[str, any]:
+        """Health report for a server that is not answering"""
+        alerts = [f"Panel unreachable: {error}"]
+        self._alerts[server.id] = alerts
+        return {
+            "status": "critical",
+            "alerts": alerts,
+            **details,
+            "metrics": None
+        }
+
     def _analyze_server_health(self, server: Server) -> Dict[str, any]:
         """Analyze server health metrics"""
         alerts = []
         status = "healthy"
-        
-        # Check CPU usage
-        if server.cpu_usage >= self.alert_thresholds["cpu"]:
-            alerts.append(f"High CPU usage: {server.cpu_usage}%")
-            status = "warning"
-            
-        # Check memory usage
         memory_usage = (server.memory_used / server.memory_total) * 100
-        if memory_usage >= self.alert_thresholds["memory"]:
-            alerts.append(f"High memory usage: {memory_usage:.1f}%")
-            status = "warning"
-            
-        # Check load average
-        if server.load >= self.alert_thresholds["load"]:
-            alerts.append(f"High system load: {server.load}")
-            status = "warning"
+        anomalies = anomaly_detector.get(server.id)
+        
+        if anomalies is not None:
+            # Alerts follow the detector's hysteresis instead of raw samples
+            for metric, state in anomalies.active().items():
+                alerts.append(
+                    f"Anomalous {metric.replace('_', ' ')}: {state.level:.1f} "
+                    f"(baseline {state.baseline:.1f}, {state.reason})"
+                )
+                status = "warning"
+        else:
+            # Check CPU usage
+            if server.cpu_usage >= self.alert_thresholds["cpu"]:
+                alerts.append(f"High CPU usage: {server.cpu_usage}%")
+                status = "warning"
+                
+            # Check memory usage
+            if memory_usage >= self.alert_thresholds["memory"]:
+                alerts.append(f"High memory usage: {memory_usage:.1f}%")
+                status = "warning"
+                
+            # Check load average
+            if server.load >= self.alert_thresholds["load"]:
+                alerts.append(f"High system load: {server.load}")
+                status = "warning"
             
+
         # Store alerts
         self._alerts[server.id] = alerts
         
         return {
             "status": status,
             "alerts": alerts,
+            "panel": panel_breakers.get(server.url).to_dict(),
             "metrics": {
                 "cpu_usage": server.cpu_usage,
                 "memory_usage": memory_usage,
@@ -0,0 +1,218 @@
+"""
+Rolling-window uptime and SLO error-budget tracking
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+from ..config import settings
+from ...db.session import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# (name, window seconds, bucket seconds); a window is accurate to one bucket
+UPTIME_WINDOWS: List[Tuple[str, int, int]] = [
+    ("5m", 300, 10),
+    ("30m", 1800, 60),
+    ("1h", 3600, 60),
+    ("6h", 21600, 600),
+    ("24h", 86400, 1800),
+    ("7d", 604800, 10800),
+    ("30d", 2592000, 43200),
+]
+
+# Multi-window burn-rate alerts: (long window, short window, threshold).
+# 14.4x spends 2% of a 30 day budget in an hour, 6x spends 5% in six hours.
+FAST_BURN = ("1h", "5m", 14.4)
+SLOW_BURN = ("6h", "30m", 6.0)
+
+# Per window the hash holds running totals ("<w>:up", "<w>:total"), one
+# counter pair per bucket and the oldest live bucket ("<w>:head"). Recording
+# adds to the current bucket and the totals, and buckets that slid out of
+# the window are subtracted, so totals always cover exactly the window.
+# Running it with up = total = 0 only slides the windows (used for reads).
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local up = tonumber(ARGV[2])
+local total = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local result = {}
+for i = 5, #ARGV, 3 do
+    local name = ARGV[i]
+    local size = tonumber(ARGV[i + 2])
+    local buckets = math.floor(tonumber(ARGV[i + 1]) / size)
+    local current = math.floor(now / size)
+    local oldest = current - buckets + 1
+    local head = tonumber(redis.call('HGET', KEYS[1], name .. ':head') or oldest)
+    -- Buckets only ever exist in [head, head + buckets)
+    for b = head, math.min(oldest - 1, head + buckets - 1) do
+        local prefix = name .. ':' .. b
+        local bucket_up = tonumber(redis.call('HGET', KEYS[1], prefix .. ':up') or 0)
+        local bucket_total = tonumber(redis.call('HGET', KEYS[1], prefix .. ':total') or 0)
+        if bucket_total > 0 then
+            redis.call('HINCRBY', KEYS[1], name .. ':up', -bucket_up)
+            redis.call('HINCRBY', KEYS[1], name .. ':total', -bucket_total)
+            redis.call('HDEL', KEYS[1], prefix .. ':up', prefix .. ':total')
+        end
+    end
+    redis.call('HSET', KEYS[1], name .. ':head', math.max(head, oldest))
+    if total > 0 then
+        redis.call('HINCRBY', KEYS[1], name .. ':' .. current .. ':up', up)
+        redis.call('HINCRBY', KEYS[1], name .. ':' .. current .. ':total', total)
+        redis.call('HINCRBY', KEYS[1], name .. ':up', up)
+        redis.call('HINCRBY', KEYS[1], name .. ':total', total)
+    end
+    result[#result + 1] = tonumber(redis.call('HGET', KEYS[1], name .. ':up') or 0)
+    result[#result + 1] = tonumber(redis.call('HGET', KEYS[1], name .. ':total') or 0)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return result
+"""
+
+class UptimeReport(BaseModel):
+    """Availability and error-budget burn per rolling window"""
+    server_id: int
+    availability: Dict[str, Optional[float]] = {}  # None: no samples in the window
+    burn_rates: Dict[str, Optional[float]] = {}
+    budget_remaining: Optional[float] = None  # share of the 30d error budget left
+    budget_status: str = "unknown"  # ok, slow_burn, fast_burn or unknown
+    updated_at: float = 0.0
+
+    def uptime_percentage(self, window: str = "30d") -> Optional[float]:
+        value = self.availability.get(window)
+        return None if value is None else round(value * 100, 3)
+
+class UptimeEngine:
+    """
+    Per-server availability from liveness samples. Counters live in Redis
+    and are updated incrementally, so every window is answered in O(1)
+    without rescanning history, and all workers see the same numbers.
+    """
+
+    def __init__(
+        self,
+        slo_target: float = settings.UPTIME_SLO_TARGET,
+        refresh_interval: float = settings.UPTIME_REFRESH_INTERVAL,
+        key_prefix: str = "server_uptime"
+    ):
+        self.slo_target = slo_target
+        self.refresh_interval = refresh_interval  # how often readers refresh reports
+        self.key_prefix = key_prefix
+        self.ttl = max(window for _, window, _ in UPTIME_WINDOWS) * 2
+        self._reports: Dict[int, UptimeReport] = {}
+        self._script = async_redis_client.register_script(RECORD_SCRIPT)
+
+    async def record(self, server_id: int, online: bool, at: Optional[float] = None) -> None:
+        await self.record_many([(server_id, online)], at)
+
+    async def record_many(
+        self,
+        samples: Iterable[Tuple[int, bool]],
+        at: Optional[float] = None
+    ) -> None:
+        """Count one liveness sample per (server_id, online) pair"""
+        now = at or time.time()
+        try:
+            pipe = async_redis_client.pipeline(transaction=False)
+            server_ids = []
+            for server_id, online in samples:
+                server_ids.append(server_id)
+                await self._script(
+                    keys=[self._key(server_id)],
+                    args=self._args(now, 1 if online else 0, 1),
+                    client=pipe
+                )
+            if not server_ids:
+                return
+            results = await pipe.execute()
+            for server_id, counters in zip(server_ids, results):
+                self._reports[server_id] = self._report(server_id, counters, now)
+        except Exception as e:
+            logger.warning(f"Failed to record uptime samples: {str(e)}")
+
+    async def load(self, server_ids: Iterable[int], force: bool = False) -> Dict[int, UptimeReport]:
+        """Refresh reports for the servers, at most once per refresh interval each"""
+        now = time.time()
+        stale = [
+            server_id for server_id in server_ids
+            if force or server_id not in self._reports or
+            now - self._reports[server_id].updated_at >= self.refresh_interval
+        ]
+        if stale:
+            try:
+                pipe = async_redis_client.pipeline(transaction=False)
+                for server_id in stale:
+                    await self._script(
+                        keys=[self._key(server_id)],
+                        args=self._args(now, 0, 0),
+                        client=pipe
+                    )
+                for server_id, counters in zip(stale, await pipe.execute()):
+                    self._reports[server_id] = self._report(server_id, counters, now)
+            except Exception as e:
+                logger.debug(f"Uptime store unavailable, using cached reports: {str(e)}")
+        return self._reports
+
+    def get(self, server_id: int) -> Optional[UptimeReport]:
+        return self._reports.get(server_id)
+
+    def uptime_percentage(self, server_id: int, window: str = "30d") -> Optional[float]:
+        report = self._reports.get(server_id)
+        return report.uptime_percentage(window) if report else None
+
+    def burn_rate(self, server_id: int, window: str) -> Optional[float]:
+        report = self._reports.get(server_id)
+        return report.burn_rates.get(window) if report else None
+
+    def is_fast_burning(self, server_id: int) -> bool:
+        """True while the server is spending its error budget at page-worthy speed"""
+        report = self._reports.get(server_id)
+        return bool(report and report.budget_status == "fast_burn")
+
+    async def reset(self, server_id: int) -> None:
+        """Forget a server's history, e.g. after it was removed"""
+        self._reports.pop(server_id, None)
+        await async_redis_client.delete(self._key(server_id))
+
+    def _report(self, server_id: int, counters: List[int], now: float) -> UptimeReport:
+        budget = 1 - self.slo_target
+        report = UptimeReport(server_id=server_id, updated_at=now)
+        for index, (name, _, _) in enumerate(UPTIME_WINDOWS):
+            up, total = int(counters[2 * index]), int(counters[2 * index + 1])
+            availability = up / total if total > 0 else None
+            report.availability[name] = availability
+            report.burn_rates[name] = (
+                (1 - availability) / budget if availability is not None and budget > 0 else None
+            )
+
+        monthly = report.burn_rates.get("30d")
+        if monthly is not None:
+            report.budget_remaining = round(1 - monthly, 4)
+            report.budget_status = "ok"
+            if self._burning(report, *SLOW_BURN):
+                report.budget_status = "slow_burn"
+            if self._burning(report, *FAST_BURN):
+                report.budget_status = "fast_burn"
+        return report
+
+    @staticmethod
+    def _burning(report: UptimeReport, long_window: str, short_window: str, threshold: float) -> bool:
+        """Both windows must burn: the long one proves it matters, the short one that it is ongoing"""
+        long_rate = report.burn_rates.get(long_window)
+        short_rate = report.burn_rates.get(short_window)
+        return (
+            long_rate is not None and short_rate is not None and
+            long_rate >= threshold and short_rate >= threshold
+        )
+
+    def _args(self, now: float, up: int, total: int) -> List:
+        args = [now, up, total, self.ttl]
+        for name, window, bucket in UPTIME_WINDOWS:
+            args.extend([name, window, bucket])
+        return args
+
+    def _key(self, server_id: int) -> str:
+        return f"{self.key_prefix}:{server_id}"
+
+# Create uptime engine instance
+uptime_engine = UptimeEngine()
@@ -26,6 +26,23 @@ class InboundInfo(BaseModel):
     up: int
     down: int
     expiry_time: Optional[int] = None
+    clients: List[Dict] = []
+
+class ClientChange(BaseModel):
+    """Single client change within a batch operation"""
+    inbound_id: int
+    email: str
+    uuid: Optional[str] = None
+    enable: Optional[bool] = None
+    total_gb: Optional[int] = None
+    expiry_time: Optional[int] = None
+
+class ClientOperationResult(BaseModel):
+    """Per-client outcome of a batch operation"""
+    inbound_id: int
+    email: str
+    success: bool
+    error: Optional[str] = None
 
 class BaseServerConnector(ABC):
     """Base class for server panel connectors"""
@@ -84,4 +101,54 @@ class BaseServerConnector(ABC):
     @abstractmethod
     async def get_client_stats(self, email: str) -> Dict:
         """Get client statistics"""
-        pass 
\ No newline at end of file
+        pass
+    
+    async def add_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Add several clients; connectors may override with a batched version"""
+        results = []
+        for change in changes:
+            success = await self.add_client(
+                change.inbound_id,
+                change.email,
+                change.uuid,
+                enable=change.enable if change.enable is not None else True,
+                total_gb=change.total_gb,
+                expiry_time=change.expiry_time
+            )
+            results.append(ClientOperationResult(
+                inbound_id=change.inbound_id,
+                email=change.email,
+                success=success
+            ))
+        return results
+    
+    async def remove_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Remove several clients; connectors may override with a batched version"""
+        results = []
+        for change in changes:
+            success = await self.remove_client(change.inbound_id, change.email)
+            results.append(ClientOperationResult(
+                inbound_id=change.inbound_id,
+                email=change.email,
+                success=success
+            ))
+        return results
+    
+    async def update_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Update several clients; connectors may override with a batched version"""
+        results = []
+        for change in changes:
+            success = await self.update_client(
+                change.inbound_id,
+                change.email,
+                uuid=change.uuid,
+                enable=change.enable,
+                total_gb=change.total_gb,
+                expiry_time=change.expiry_time
+            )
+            results.append(ClientOperationResult(
+                inbound_id=change.inbound_id,
+                email=change.email,
+                success=success
+            ))
+        return results 
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Per-panel circuit breaker with adaptive timeouts
+"""
+import logging
+import random
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, Optional
+from ..config import settings
+from ..monitoring.prometheus import PANEL_REQUEST_SECONDS, observe_breaker_state
+from .http_client import PanelHTTPClientRegistry
+
+logger = logging.getLogger(__name__)
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a panel whose breaker is open"""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"Panel {host} is unavailable, retry in {retry_in:.0f}s")
+
+class PanelCircuitBreaker:
+    """Track failures and latency for one panel host"""
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = settings.PANEL_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = settings.PANEL_BREAKER_RESET_TIMEOUT,
+        max_reset_timeout: float = settings.PANEL_BREAKER_MAX_RESET_TIMEOUT,
+        min_timeout: float = settings.PANEL_TIMEOUT_MIN,
+        max_timeout: float = settings.PANEL_HTTP_TIMEOUT,
+        latency_window: int = 100
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = 3.0  # headroom over observed p95
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0  # consecutive trips, drives the exponential backoff
+        self.opened_at: Optional[float] = None
+        self.open_until = 0.0
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+
+    def before_request(self) -> bool:
+        """
+        Raise CircuitOpenError if the panel should not be called right now.
+        Returns True if this call took the half-open probe slot; the caller
+        must then hand it back with abandon_probe if it ends without an
+        outcome (e.g. cancelled).
+        """
+        if self.state == BreakerState.CLOSED:
+            return False
+
+        now = time.monotonic()
+        if self.state == BreakerState.OPEN:
+            if now < self.open_until:
+                raise CircuitOpenError(self.host, self.open_until - now)
+            # Cool-down over: let a single probe through
+            self._set_state(BreakerState.HALF_OPEN)
+            self._probe_in_flight = False
+            logger.info(f"Circuit for {self.host} half-open, probing")
+
+        # A probe that never reported back is given up after one request timeout
+        if self._probe_in_flight and now - self._probe_started < self.max_timeout:
+            raise CircuitOpenError(self.host, self._probe_started + self.max_timeout - now)
+        self._probe_in_flight = True
+        self._probe_started = now
+        return True
+
+    def abandon_probe(self) -> None:
+        """Free the half-open probe slot of a call that recorded no outcome"""
+        if self.state == BreakerState.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self, latency: float) -> None:
+        """Panel answered; close the breaker and learn from the latency"""
+        PANEL_REQUEST_SECONDS.labels(panel=self.host, outcome="success").observe(latency)
+        self._latencies.append(latency)
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != BreakerState.CLOSED:
+            logger.info(f"Circuit for {self.host} closed after successful probe")
+            self._set_state(BreakerState.CLOSED)
+            self.open_count = 0
+            self.opened_at = None
+            self.last_error = None
+
+    def record_failure(self, error: Optional[str] = None, latency: Optional[float] = None) -> None:
+        """Transport failure or timeout; trip after threshold or a failed probe"""
+        if latency is not None:
+            PANEL_REQUEST_SECONDS.labels(panel=self.host, outcome="failure").observe(latency)
+        self.consecutive_failures += 1
+        self.last_error = error
+        self._probe_in_flight = False
+        if (
+            self.state == BreakerState.HALF_OPEN or
+            self.consecutive_failures >= self.failure_threshold
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        """Open the breaker with jittered exponential cool-down"""
+        self.open_count += 1
+        cool_down = min(
+            self.max_reset_timeout,
+            self.reset_timeout * (2 ** (self.open_count - 1))
+        )
+        cool_down = random.uniform(cool_down / 2, cool_down)
+        now = time.monotonic()
+        self._set_state(BreakerState.OPEN)
+        self.opened_at = now
+        self.open_until = now + cool_down
+        logger.warning(
+            f"Circuit for {self.host} opened for {cool_down:.1f}s "
+            f"after {self.consecutive_failures} failures: {self.last_error}"
+        )
+
+    def _set_state(self, state: BreakerState) -> None:
+        self.state = state
+        observe_breaker_state(self.host, state.value)
+
+    def timeout(self, default: Optional[float] = None) -> float:
+        """Request timeout derived from the p95 of recent latencies"""
+        ceiling = min(default, self.max_timeout) if default else self.max_timeout
+        if len(self._latencies) < 10:
+            return ceiling
+        return max(self.min_timeout, min(ceiling, self.percentile(0.95) * self.timeout_multiplier))
+
+    def percentile(self, q: float) -> float:
+        """Latency percentile over the sliding window"""
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @staticmethod
+    def backoff(attempt: int, base: float = settings.PANEL_RETRY_BASE_DELAY, cap: float = 10.0) -> float:
+        """Full-jitter exponential delay before retry number attempt + 1"""
+        return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == BreakerState.OPEN and time.monotonic() < self.open_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Breaker state for health reporting"""
+        return {
+            "host": self.host,
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in": max(0.0, self.open_until - time.monotonic()) if self.is_open else 0.0,
+            "p95_latency": self.percentile(0.95),
+            "timeout": self.timeout(),
+            "last_error": self.last_error
+        }
+
+class CircuitBreakerRegistry:
+    """One breaker per panel host, shared by every caller in the process"""
+
+    def __init__(self):
+        self._breakers: Dict[str, PanelCircuitBreaker] = {}
+
+    def get(self, base_url: str) -> PanelCircuitBreaker:
+        """Get breaker for the panel host, creating it on first use"""
+        host = PanelHTTPClientRegistry.host_key(base_url)
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = PanelCircuitBreaker(host)
+            observe_breaker_state(host, breaker.state.value)
+            self._breakers[host] = breaker
+        return breaker
+
+    def is_available(self, base_url: str) -> bool:
+        """False while the panel's breaker is open"""
+        return not self.get(base_url).is_open
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """State of every known breaker"""
+        return {host: breaker.to_dict() for host, breaker in self._breakers.items()}
+
+# Create breaker registry instance
+panel_breakers = CircuitBreakerRegistry()
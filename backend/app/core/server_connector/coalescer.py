@@ -0,0 +1,73 @@
+"""
+Single-flight coalescing for identical panel reads
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from ..config import settings
+from ..monitoring.prometheus import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+class RequestCoalescer:
+    """Share one in-flight call (and its fresh result) among concurrent callers"""
+
+    def __init__(self, result_ttl: float = settings.PANEL_READ_COALESCE_TTL):
+        self.result_ttl = result_ttl  # seconds a finished result is reused
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run fn once per key; callers arriving meanwhile await the same result"""
+        cached = self._results.get(key)
+        if cached and time.monotonic() - cached[0] < self.result_ttl:
+            CACHE_REQUESTS.labels(cache="panel_reads", result="hit").inc()
+            return cached[1]
+
+        future = self._inflight.get(key)
+        if future:
+            CACHE_REQUESTS.labels(cache="panel_reads", result="shared").inc()
+            return await asyncio.shield(future)
+
+        CACHE_REQUESTS.labels(cache="panel_reads", result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+            if self.result_ttl > 0:
+                self._results[key] = (time.monotonic(), result)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            # Errors are shared with waiting callers but never cached
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Leader was cancelled; waiters must not hang
+                future.cancel()
+            self._inflight.pop(key, None)
+            self._prune()
+
+    def forget(self, key: Hashable) -> None:
+        """Drop a cached result, e.g. after a write to the panel"""
+        self._results.pop(key, None)
+
+    def _prune(self) -> None:
+        """Drop expired results so the map stays bounded by active keys"""
+        now = time.monotonic()
+        expired = [
+            key for key, (stored_at, _) in self._results.items()
+            if now - stored_at >= self.result_ttl
+        ]
+        for key in expired:
+            del self._results[key]
+
+# Create coalescer instance
+panel_reads = RequestCoalescer()
@@ -0,0 +1,130 @@
+"""
+Shared HTTP client registry for server panels
+"""
+import asyncio
+import logging
+import weakref
+from typing import Dict
+from urllib.parse import urlsplit
+import aiohttp
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class PanelHTTPClientRegistry:
+    """Keep one keep-alive aiohttp session per panel host"""
+
+    def __init__(
+        self,
+        limit_per_host: int = settings.PANEL_HTTP_LIMIT_PER_HOST,
+        dns_cache_ttl: int = settings.PANEL_HTTP_DNS_CACHE_TTL,
+        keepalive_timeout: int = settings.PANEL_HTTP_KEEPALIVE_TIMEOUT,
+        request_timeout: int = settings.PANEL_HTTP_TIMEOUT
+    ):
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @staticmethod
+    def host_key(base_url: str) -> str:
+        """Normalize panel URL to scheme://host:port"""
+        parts = urlsplit(str(base_url))
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        return f"{scheme}://{parts.hostname}:{port}"
+
+    async def get_session(self, base_url: str) -> aiohttp.ClientSession:
+        """Get pooled session for the panel host, creating it on first use"""
+        key = self.host_key(base_url)
+        loop = asyncio.get_running_loop()
+
+        session = self._sessions.get(key)
+        if session and not session.closed and self._loops.get(key) is loop:
+            return session
+
+        async with self._get_lock():
+            session = self._sessions.get(key)
+            if session and not session.closed and self._loops.get(key) is loop:
+                return session
+
+            # Sessions are bound to the loop that created them; Celery tasks
+            # run each job in a fresh loop, so close and drop stale ones
+            if session and not session.closed and self._loops.get(key) is not loop:
+                self._sessions.pop(key, None)
+                self._discard(key, session, self._loops.pop(key, None))
+
+            session = self._create_session()
+            self._sessions[key] = session
+            self._loops[key] = loop
+            logger.debug(f"Created pooled panel session for {key}")
+            return session
+
+    async def close(self) -> None:
+        """Close all pooled sessions"""
+        loop = asyncio.get_running_loop()
+        sessions = list(self._sessions.items())
+        self._sessions.clear()
+
+        for key, session in sessions:
+            if session.closed:
+                continue
+            if self._loops.get(key) is not loop:
+                self._discard(key, session, self._loops.get(key))
+                continue
+            try:
+                await session.close()
+            except Exception as e:
+                logger.error(f"Error closing panel session {key}: {str(e)}")
+
+        self._loops.clear()
+        # Give the SSL transports a moment to shut down cleanly
+        await asyncio.sleep(0.25)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create session with a dedicated keep-alive connector"""
+        connector = aiohttp.TCPConnector(
+            limit=self.limit_per_host,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            # Cookies are passed per request so panels sharing a host
+            # never see each other's sessions
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+
+    @staticmethod
+    def _discard(key: str, session: aiohttp.ClientSession, loop) -> None:
+        """Close a session that belongs to another event loop"""
+        try:
+            if loop is not None and not loop.is_closed():
+                # Its loop may still run (another thread); close it there
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+            elif session.connector is not None:
+                # The loop is gone, so nothing can await the close; shutting
+                # the connector down closes its transports synchronously
+                session.connector.close()
+        except Exception as e:
+            logger.debug(f"Error closing stale panel session {key}: {str(e)}")
+
+    def _get_lock(self) -> asyncio.Lock:
+        """One lock per event loop, created lazily inside it"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+# Create registry instance
+panel_http = PanelHTTPClientRegistry()
@@ -0,0 +1,138 @@
+"""
+Short-lived per-panel inbound list snapshots
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from ..config import settings
+from ..monitoring.prometheus import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+FetchCallable = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+class InboundSnapshot:
+    """Inbound list fetched once, with client lists and ports pre-parsed"""
+
+    def __init__(self, inbounds: List[Dict[str, Any]], fetched_at: Optional[float] = None):
+        self.inbounds = inbounds
+        self.fetched_at = fetched_at or time.time()
+        self.clients: Dict[int, List[Dict[str, Any]]] = {}
+        self.ports: Set[int] = set()
+
+        for inbound in inbounds:
+            if inbound.get("port"):
+                self.ports.add(int(inbound["port"]))
+            self.clients[inbound.get("id")] = self._parse_clients(inbound.get("settings"))
+
+    @staticmethod
+    def _parse_clients(raw_settings: Any) -> List[Dict[str, Any]]:
+        """Panels return settings either as a JSON string or already decoded"""
+        if not raw_settings:
+            return []
+        if isinstance(raw_settings, str):
+            try:
+                raw_settings = json.loads(raw_settings)
+            except json.JSONDecodeError:
+                return []
+        return raw_settings.get("clients", []) if isinstance(raw_settings, dict) else []
+
+    @property
+    def total_clients(self) -> int:
+        """Number of clients across all inbounds"""
+        return sum(len(clients) for clients in self.clients.values())
+
+    def all_clients(self) -> List[Dict[str, Any]]:
+        """Flat client list, each tagged with its inbound id"""
+        return [
+            {**client, "inbound_id": inbound_id}
+            for inbound_id, clients in self.clients.items()
+            for client in clients
+        ]
+
+    def find_client(self, email: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Find (inbound, client) by client email"""
+        for inbound in self.inbounds:
+            for client in self.clients.get(inbound.get("id"), []):
+                if client.get("email") == email:
+                    return inbound, client
+        return None
+
+    def find_client_by_id(self, client_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Find (inbound, client) by client UUID"""
+        for inbound in self.inbounds:
+            for client in self.clients.get(inbound.get("id"), []):
+                if client.get("id") == client_id:
+                    return inbound, client
+        return None
+
+    def age(self) -> float:
+        """Seconds since the snapshot was fetched"""
+        return time.time() - self.fetched_at
+
+class InboundSnapshotCache:
+    """Cache inbound snapshots per panel with TTL and explicit invalidation"""
+
+    def __init__(self, ttl: float = settings.INBOUND_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._snapshots: Dict[str, InboundSnapshot] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation: Dict[str, int] = {}
+
+    async def get(
+        self,
+        key: str,
+        fetch: FetchCallable,
+        max_age: Optional[float] = None
+    ) -> InboundSnapshot:
+        """Return cached snapshot or fetch one; concurrent misses share one fetch"""
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshots.get(key)
+        if snapshot and snapshot.age() < max_age:
+            CACHE_REQUESTS.labels(cache="inbound_snapshot", result="hit").inc()
+            return snapshot
+
+        future = self._inflight.get(key)
+        if future:
+            CACHE_REQUESTS.labels(cache="inbound_snapshot", result="shared").inc()
+            return await asyncio.shield(future)
+
+        CACHE_REQUESTS.labels(cache="inbound_snapshot", result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation.get(key, 0)
+        try:
+            snapshot = InboundSnapshot(await fetch())
+            # Don't cache a fetch that raced with a write-side invalidation
+            if self._generation.get(key, 0) == generation:
+                self._snapshots[key] = snapshot
+            future.set_result(snapshot)
+            return snapshot
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Leader was cancelled; waiters must not hang
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    def peek(self, key: str) -> Optional[InboundSnapshot]:
+        """Return cached snapshot without fetching, even if stale"""
+        return self._snapshots.get(key)
+
+    def invalidate(self, key: str) -> None:
+        """Drop snapshot after a write to the panel"""
+        self._snapshots.pop(key, None)
+        self._generation[key] = self._generation.get(key, 0) + 1
+
+    def clear(self) -> None:
+        """Drop all snapshots"""
+        for key in list(self._snapshots):
+            self.invalidate(key)
+
+# Create cache instance
+inbound_cache = InboundSnapshotCache()
@@ -0,0 +1,167 @@
+"""
+Per-server inbound port allocation
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from ..config import settings
+from ...db.session import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+UsedPortsCallable = Callable[[], Awaitable[Set[int]]]
+
+class PortIndex:
+    """Bitmap of used ports plus a lazily pruned free list"""
+
+    def __init__(self, port_range: Tuple[int, int], used_ports: Set[int]):
+        self.start, self.end = port_range
+        self.seeded_at = time.time()
+        self._used = bytearray(self.end - self.start + 1)
+        for port in used_ports:
+            if self.start <= port <= self.end:
+                self._used[port - self.start] = 1
+
+        # Shuffled once so allocation stays unpredictable but O(1)
+        self._free = [
+            port for port in range(self.start, self.end + 1)
+            if not self._used[port - self.start]
+        ]
+        random.shuffle(self._free)
+
+    def is_used(self, port: int) -> bool:
+        return bool(self._used[port - self.start]) if self.start <= port <= self.end else True
+
+    def take(self) -> Optional[int]:
+        """Pop a free port; entries marked used since seeding are skipped"""
+        while self._free:
+            port = self._free.pop()
+            if not self._used[port - self.start]:
+                self._used[port - self.start] = 1
+                return port
+        return None
+
+    def mark_used(self, port: int) -> None:
+        if self.start <= port <= self.end:
+            self._used[port - self.start] = 1
+
+    def release(self, port: int) -> None:
+        if self.start <= port <= self.end and self._used[port - self.start]:
+            self._used[port - self.start] = 0
+            self._free.append(port)
+
+class PortAllocator:
+    """Allocate collision-free ports per server across workers"""
+
+    def __init__(
+        self,
+        reservation_ttl: int = settings.PORT_RESERVATION_TTL,
+        reseed_interval: int = settings.PORT_INDEX_RESEED_INTERVAL,
+        prefix: str = "port_reservation"
+    ):
+        self.reservation_ttl = reservation_ttl
+        self.reseed_interval = reseed_interval
+        self.prefix = prefix
+        self.max_attempts = 32  # Redis collisions tolerated per allocation
+        self._indexes: Dict[str, PortIndex] = {}
+        self._pending: Dict[str, Set[int]] = {}
+        self._seeding: Dict[str, asyncio.Future] = {}
+
+    async def allocate(
+        self,
+        key: str,
+        port_range: Tuple[int, int],
+        load_used_ports: UsedPortsCallable
+    ) -> int:
+        """Reserve a free port for the server identified by key"""
+        index = await self._get_index(key, port_range, load_used_ports)
+
+        for _ in range(self.max_attempts):
+            port = index.take()
+            if port is None:
+                raise Exception(f"No free ports left in range {port_range[0]}-{port_range[1]}")
+
+            # Claimed locally first, so coroutines in this process never collide
+            self._pending.setdefault(key, set()).add(port)
+            if await self._reserve(key, port):
+                return port
+
+            # Another worker holds it; leave it marked used and try the next one
+            self._pending[key].discard(port)
+
+        raise Exception("Could not reserve a port after repeated collisions")
+
+    async def release(self, key: str, port: int) -> None:
+        """Return a port to the pool (client deleted or creation failed)"""
+        index = self._indexes.get(key)
+        if index:
+            index.release(port)
+        self._pending.get(key, set()).discard(port)
+        try:
+            await async_redis_client.delete(self._reservation_key(key, port))
+        except Exception as e:
+            logger.debug(f"Failed to release port reservation: {str(e)}")
+
+    def confirm(self, key: str, port: int) -> None:
+        """Port is now visible on the panel; stop tracking it as pending"""
+        self._pending.get(key, set()).discard(port)
+
+    async def _get_index(
+        self,
+        key: str,
+        port_range: Tuple[int, int],
+        load_used_ports: UsedPortsCallable
+    ) -> PortIndex:
+        """Return the index, reseeding from the panel when it is stale"""
+        index = self._indexes.get(key)
+        if (
+            index and
+            (index.start, index.end) == tuple(port_range) and
+            time.time() - index.seeded_at < self.reseed_interval
+        ):
+            return index
+
+        future = self._seeding.get(key)
+        if future:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._seeding[key] = future
+        try:
+            used_ports = set(await load_used_ports())
+            # Ports handed out but not yet on the panel must stay taken
+            used_ports |= self._pending.get(key, set())
+            index = PortIndex(port_range, used_ports)
+            self._indexes[key] = index
+            future.set_result(index)
+            return index
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Leader was cancelled; waiters must not hang
+                future.cancel()
+            self._seeding.pop(key, None)
+
+    async def _reserve(self, key: str, port: int) -> bool:
+        """Claim the port cluster-wide with a short-lived Redis key"""
+        try:
+            return bool(await async_redis_client.set(
+                self._reservation_key(key, port),
+                "1",
+                nx=True,
+                ex=self.reservation_ttl
+            ))
+        except Exception as e:
+            logger.debug(f"Port reservation store unavailable: {str(e)}")
+            return True
+
+    def _reservation_key(self, key: str, port: int) -> str:
+        return f"{self.prefix}:{key}:{port}"
+
+# Create allocator instance
+port_allocator = PortAllocator()
@@ -0,0 +1,228 @@
+"""
+Shared panel session cookie store
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from ..config import settings
+from ...db.session import async_redis_client
+from .http_client import PanelHTTPClientRegistry
+
+logger = logging.getLogger(__name__)
+
+LoginCallable = Callable[[], Awaitable[Optional[str]]]
+
+# Delete the key only while it still holds the value we were given
+_COMPARE_AND_DELETE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class PanelSessionStore:
+    """Redis-backed panel cookie cache with cluster-wide single-flight login"""
+
+    def __init__(
+        self,
+        session_ttl: int = settings.PANEL_SESSION_TTL,
+        refresh_margin: int = settings.PANEL_SESSION_REFRESH_MARGIN,
+        lock_timeout: int = settings.PANEL_LOGIN_LOCK_TIMEOUT,
+        prefix: str = "panel_session"
+    ):
+        self.session_ttl = session_ttl
+        self.refresh_margin = refresh_margin
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self.poll_interval = 0.2  # seconds between checks while another worker logs in
+        self._local: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock_tokens: Dict[str, str] = {}
+
+    def session_key(self, base_url: str, username: str, password: str) -> str:
+        """Build cache key; credentials are hashed so rotated passwords miss"""
+        digest = hashlib.sha256(
+            f"{username}:{password}".encode()
+        ).hexdigest()[:16]
+        return f"{PanelHTTPClientRegistry.host_key(base_url)}:{digest}"
+
+    async def get_cookie(
+        self,
+        key: str,
+        login: LoginCallable
+    ) -> Optional[str]:
+        """
+        Return a valid cookie for the panel, logging in only if no worker
+        holds a fresh one. Concurrent callers share a single login.
+        """
+        now = time.time()
+        cookie, expires_at = self._local.get(key, (None, 0.0))
+        if cookie and expires_at - now > self.refresh_margin:
+            return cookie
+
+        cookie, expires_at = await self._read(key)
+        if cookie and expires_at - now > self.refresh_margin:
+            return cookie
+
+        if cookie and expires_at > now:
+            # Still valid but close to expiry: whoever wins the lock logs in
+            # again, everyone else keeps using the current cookie meanwhile
+            if key not in self._inflight and await self._acquire_lock(key):
+                if key in self._inflight:
+                    # A login started here while we took the lock; let it run
+                    await self._release_lock(key)
+                    return cookie
+                return await self._single_flight(key, login, lock_held=True)
+            return cookie
+
+        return await self._single_flight(key, login)
+
+    async def invalidate(self, key: str, cookie: Optional[str] = None) -> None:
+        """Drop a cookie rejected by the panel (e.g. after a 401)"""
+        local = self._local.get(key)
+        if cookie is None or (local and local[0] == cookie):
+            self._local.pop(key, None)
+
+        try:
+            if cookie is None:
+                await async_redis_client.delete(self._cookie_key(key))
+            else:
+                await async_redis_client.eval(
+                    _COMPARE_AND_DELETE, 1, self._cookie_key(key), cookie
+                )
+        except Exception as e:
+            logger.warning(f"Failed to invalidate panel session in Redis: {str(e)}")
+
+    async def _single_flight(
+        self,
+        key: str,
+        login: LoginCallable,
+        lock_held: bool = False
+    ) -> Optional[str]:
+        """Coalesce logins in-process, then across workers via a Redis lock"""
+        future = self._inflight.get(key)
+        if future:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            cookie = await self._login_once(key, login, lock_held)
+            future.set_result(cookie)
+            return cookie
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a lone caller doesn't log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Leader was cancelled; waiters must not hang
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    async def _login_once(
+        self,
+        key: str,
+        login: LoginCallable,
+        lock_held: bool
+    ) -> Optional[str]:
+        """Log in under the cluster-wide lock, or wait for the holder's cookie"""
+        deadline = time.time() + self.lock_timeout
+        while not lock_held:
+            if await self._acquire_lock(key):
+                lock_held = True
+                break
+
+            await asyncio.sleep(self.poll_interval)
+            cookie, expires_at = await self._read(key)
+            if cookie and expires_at - time.time() > self.refresh_margin:
+                return cookie
+
+            if time.time() >= deadline:
+                # Lock holder died or is stuck; take over
+                logger.warning(f"Panel login lock for {key} timed out, logging in directly")
+                break
+
+        try:
+            # Another worker may have finished between our read and the lock
+            cookie, expires_at = await self._read(key)
+            if cookie and expires_at - time.time() > self.refresh_margin:
+                return cookie
+
+            cookie = await login()
+            if cookie:
+                await self._write(key, cookie)
+            return cookie
+        finally:
+            if lock_held:
+                await self._release_lock(key)
+
+    async def _read(self, key: str) -> Tuple[Optional[str], float]:
+        """Read cookie and expiry, preferring Redis and falling back to memory"""
+        try:
+            pipe = async_redis_client.pipeline()
+            pipe.get(self._cookie_key(key))
+            pipe.pttl(self._cookie_key(key))
+            cookie, ttl_ms = await pipe.execute()
+            if cookie and ttl_ms and ttl_ms > 0:
+                expires_at = time.time() + ttl_ms / 1000
+                self._local[key] = (cookie, expires_at)
+                return cookie, expires_at
+            return None, 0.0
+        except Exception as e:
+            logger.debug(f"Panel session store unavailable, using local cache: {str(e)}")
+
+        cookie, expires_at = self._local.get(key, (None, 0.0))
+        if cookie and expires_at > time.time():
+            return cookie, expires_at
+        return None, 0.0
+
+    async def _write(self, key: str, cookie: str) -> None:
+        """Store cookie for every worker"""
+        self._local[key] = (cookie, time.time() + self.session_ttl)
+        try:
+            await async_redis_client.set(
+                self._cookie_key(key), cookie, ex=self.session_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store panel session in Redis: {str(e)}")
+
+    async def _acquire_lock(self, key: str) -> bool:
+        """Try to take the cluster-wide login lock"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await async_redis_client.set(
+                self._lock_key(key), token, nx=True, ex=self.lock_timeout
+            )
+        except Exception:
+            # Without Redis the in-process single flight is all we can do
+            acquired = True
+
+        if acquired:
+            self._lock_tokens[key] = token
+        return bool(acquired)
+
+    async def _release_lock(self, key: str) -> None:
+        """Release the login lock if we still own it"""
+        token = self._lock_tokens.pop(key, None)
+        if not token:
+            return
+        try:
+            await async_redis_client.eval(
+                _COMPARE_AND_DELETE, 1, self._lock_key(key), token
+            )
+        except Exception as e:
+            logger.debug(f"Failed to release panel login lock: {str(e)}")
+
+    def _cookie_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.prefix}_lock:{key}"
+
+# Create session store instance
+panel_sessions = PanelSessionStore()
@@ -1,47 +1,111 @@
 """
 3x-ui server panel connector implementation
 """
+import asyncio
 import json
-from typing import Dict, List, Optional
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
 import aiohttp
-from .base import BaseServerConnector, ServerStats, InboundInfo
+from .base import (
+    BaseServerConnector,
+    ClientChange,
+    ClientOperationResult,
+    InboundInfo,
+    ServerStats
+)
+from .http_client import panel_http
+from .session_store import panel_sessions
+from .inbound_cache import InboundSnapshot, inbound_cache
+from .circuit_breaker import panel_breakers
 
 class ThreeXUIConnector(BaseServerConnector):
     """3x-ui panel connector implementation"""
     
+    def __init__(self, base_url: str):
+        super().__init__(base_url)
+        self._username: Optional[str] = None
+        self._password: Optional[str] = None
+        self._session_key: Optional[str] = None
+        self.batch_concurrency = 4  # Inbounds rewritten in parallel per batch
+    
     async def _make_request(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict] = None,
-        params: Optional[Dict] = None
+        params: Optional[Dict] = None,
+        retry_auth: bool = True
     ) -> Dict:
-        """Make HTTP request to panel"""
+        """Make HTTP request to panel, failing fast while its breaker is open"""
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         headers = {"Cookie": f"session={self.session_token}"} if self.session_token else {}
         
-        async with aiohttp.ClientSession() as session:
+        breaker = panel_breakers.get(self.base_url)
+        probing = breaker.before_request()
+        started = time.monotonic()
+        try:
+            session = await panel_http.get_session(self.base_url)
             async with session.request(
                 method=method,
                 url=url,
                 json=data,
                 params=params,
                 headers=headers,
+                timeout=aiohttp.ClientTimeout(total=breaker.timeout()),
                 ssl=False  # Skip SSL verification as many panels use self-signed certs
             ) as response:
-                if response.status == 200:
+                status = response.status
+                if status == 200:
                     # Get session cookie if it's a login request
                     if endpoint == "login" and "session" in response.cookies:
                         self.session_token = response.cookies["session"].value
-                    return await response.json()
-                return {}
+                    result = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure(str(e) or type(e).__name__, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled or failed without an outcome: free the probe slot
+            if probing:
+                breaker.abandon_probe()
+            raise
+        
+        if status >= 500:
+            breaker.record_failure(f"HTTP {status}", time.monotonic() - started)
+        else:
+            breaker.record_success(time.monotonic() - started)
+        if status == 200:
+            return result
+        
+        # Cookie rejected: drop it for every worker and log in once more
+        if status == 401 and endpoint != "login" and retry_auth and self._session_key:
+            await panel_sessions.invalidate(self._session_key, self.session_token)
+            self.session_token = None
+            if await self.login(self._username, self._password):
+                return await self._make_request(
+                    method, endpoint, data=data, params=params, retry_auth=False
+                )
+        return {}
 
     async def login(self, username: str, password: str) -> bool:
-        """Login to 3x-ui panel"""
-        data = {"username": username, "password": password}
-        response = await self._make_request("POST", "login", data=data)
+        """Login to 3x-ui panel, reusing a cookie shared across workers"""
+        self._username = username
+        self._password = password
+        self._session_key = panel_sessions.session_key(self.base_url, username, password)
+        
+        self.session_token = await panel_sessions.get_cookie(
+            self._session_key,
+            lambda: self._login_request(username, password)
+        )
         return bool(self.session_token)
 
+    async def _login_request(self, username: str, password: str) -> Optional[str]:
+        """Perform the actual /login call and return the session cookie"""
+        self.session_token = None
+        data = {"username": username, "password": password}
+        await self._make_request("POST", "login", data=data)
+        return self.session_token
+
     async def get_system_status(self) -> ServerStats:
         """Get server system status"""
         response = await self._make_request("POST", "server/status")
@@ -60,10 +124,10 @@ class ThreeXUIConnector(BaseServerConnector):
 
     async def get_inbounds(self) -> List[InboundInfo]:
         """Get all inbounds"""
-        response = await self._make_request("POST", "panel/api/inbounds/list")
+        snapshot = await self.get_inbound_snapshot()
         inbounds = []
         
-        for obj in response.get("obj", []):
+        for obj in snapshot.inbounds:
             inbounds.append(InboundInfo(
                 id=obj.get("id", 0),
                 enable=obj.get("enable", False),
@@ -73,11 +137,30 @@ class ThreeXUIConnector(BaseServerConnector):
                 total=obj.get("total", 0),
                 up=obj.get("up", 0),
                 down=obj.get("down", 0),
-                expiry_time=obj.get("expiryTime", None)
+                expiry_time=obj.get("expiryTime", None),
+                clients=snapshot.clients.get(obj.get("id"), [])
             ))
             
         return inbounds
 
+    async def get_inbound_snapshot(self, max_age: Optional[float] = None) -> InboundSnapshot:
+        """Get inbound list shared by every consumer within the snapshot TTL"""
+        return await inbound_cache.get(
+            self.snapshot_key,
+            self._fetch_inbounds,
+            max_age=max_age
+        )
+
+    async def _fetch_inbounds(self) -> List[Dict]:
+        """Fetch raw inbound list from the panel"""
+        response = await self._make_request("POST", "panel/api/inbounds/list")
+        return response.get("obj") or []
+
+    @property
+    def snapshot_key(self) -> str:
+        """Inbound cache key for this panel"""
+        return f"3x-ui:{self.base_url}"
+
     async def add_client(
         self,
         inbound_id: int,
@@ -88,68 +171,23 @@ class ThreeXUIConnector(BaseServerConnector):
         expiry_time: Optional[int] = None
     ) -> bool:
         """Add a client to an inbound"""
-        # First get the inbound settings
-        response = await self._make_request(
-            "POST",
-            f"panel/api/inbounds/get/{inbound_id}"
-        )
-        
-        if not response.get("obj"):
-            return False
-            
-        inbound = response["obj"]
-        settings = json.loads(inbound.get("settings", "{}"))
-        clients = settings.get("clients", [])
-        
-        # Create new client
-        new_client = {
-            "id": uuid,
-            "email": email,
-            "enable": enable,
-            "totalGB": total_gb if total_gb is not None else 0,
-            "expiryTime": expiry_time if expiry_time is not None else 0
-        }
-        
-        clients.append(new_client)
-        settings["clients"] = clients
-        inbound["settings"] = json.dumps(settings)
-        
-        # Update inbound
-        update_response = await self._make_request(
-            "POST",
-            "panel/api/inbounds/update",
-            data=inbound
-        )
-        
-        return bool(update_response)
+        results = await self.add_clients([ClientChange(
+            inbound_id=inbound_id,
+            email=email,
+            uuid=uuid,
+            enable=enable,
+            total_gb=total_gb,
+            expiry_time=expiry_time
+        )])
+        return results[0].success
 
     async def remove_client(self, inbound_id: int, email: str) -> bool:
         """Remove a client from an inbound"""
-        # Get current inbound settings
-        response = await self._make_request(
-            "POST",
-            f"panel/api/inbounds/get/{inbound_id}"
-        )
-        
-        if not response.get("obj"):
-            return False
-            
-        inbound = response["obj"]
-        settings = json.loads(inbound.get("settings", "{}"))
-        clients = settings.get("clients", [])
-        
-        # Remove client with matching email
-        settings["clients"] = [c for c in clients if c.get("email") != email]
-        inbound["settings"] = json.dumps(settings)
-        
-        # Update inbound
-        update_response = await self._make_request(
-            "POST",
-            "panel/api/inbounds/update",
-            data=inbound
-        )
-        
-        return bool(update_response)
+        results = await self.remove_clients([ClientChange(
+            inbound_id=inbound_id,
+            email=email
+        )])
+        return results[0].success
 
     async def update_client(
         self,
@@ -161,32 +199,124 @@ class ThreeXUIConnector(BaseServerConnector):
         expiry_time: Optional[int] = None
     ) -> bool:
         """Update a client's configuration"""
-        # Get current inbound settings
+        results = await self.update_clients([ClientChange(
+            inbound_id=inbound_id,
+            email=email,
+            uuid=uuid,
+            enable=enable,
+            total_gb=total_gb,
+            expiry_time=expiry_time
+        )])
+        return results[0].success
+
+    async def add_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Add clients with one read-modify-write per inbound"""
+        def mutate(clients: List[Dict], change: ClientChange) -> Optional[str]:
+            if any(c.get("email") == change.email for c in clients):
+                return "Client already exists"
+            clients.append({
+                "id": change.uuid,
+                "email": change.email,
+                "enable": change.enable if change.enable is not None else True,
+                "totalGB": change.total_gb if change.total_gb is not None else 0,
+                "expiryTime": change.expiry_time if change.expiry_time is not None else 0
+            })
+            return None
+        
+        return await self._apply_client_changes(changes, mutate)
+
+    async def remove_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Remove clients with one read-modify-write per inbound"""
+        def mutate(clients: List[Dict], change: ClientChange) -> Optional[str]:
+            for index, client in enumerate(clients):
+                if client.get("email") == change.email:
+                    del clients[index]
+                    return None
+            return "Client not found"
+        
+        return await self._apply_client_changes(changes, mutate)
+
+    async def update_clients(self, changes: List[ClientChange]) -> List[ClientOperationResult]:
+        """Update clients with one read-modify-write per inbound"""
+        def mutate(clients: List[Dict], change: ClientChange) -> Optional[str]:
+            for client in clients:
+                if client.get("email") == change.email:
+                    if change.uuid is not None:
+                        client["id"] = change.uuid
+                    if change.enable is not None:
+                        client["enable"] = change.enable
+                    if change.total_gb is not None:
+                        client["totalGB"] = change.total_gb
+                    if change.expiry_time is not None:
+                        client["expiryTime"] = change.expiry_time
+                    return None
+            return "Client not found"
+        
+        return await self._apply_client_changes(changes, mutate)
+
+    async def _apply_client_changes(
+        self,
+        changes: List[ClientChange],
+        mutate: Callable[[List[Dict], ClientChange], Optional[str]]
+    ) -> List[ClientOperationResult]:
+        """Group changes by inbound and apply each group in a single update"""
+        by_inbound: Dict[int, List[int]] = defaultdict(list)
+        for index, change in enumerate(changes):
+            by_inbound[change.inbound_id].append(index)
+        
+        results: List[Optional[ClientOperationResult]] = [None] * len(changes)
+        
+        async def apply_inbound(inbound_id: int, indexes: List[int]) -> None:
+            group = [changes[i] for i in indexes]
+            try:
+                errors = await self._update_inbound_clients(inbound_id, group, mutate)
+            except Exception as e:
+                errors = [f"Inbound update failed: {str(e)}"] * len(group)
+            
+            for i, change, error in zip(indexes, group, errors):
+                results[i] = ClientOperationResult(
+                    inbound_id=inbound_id,
+                    email=change.email,
+                    success=error is None,
+                    error=error
+                )
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def bounded(inbound_id: int, indexes: List[int]) -> None:
+            async with semaphore:
+                await apply_inbound(inbound_id, indexes)
+        
+        await asyncio.gather(*(
+            bounded(inbound_id, indexes)
+            for inbound_id, indexes in by_inbound.items()
+        ))
+        return results
+
+    async def _update_inbound_clients(
+        self,
+        inbound_id: int,
+        group: List[ClientChange],
+        mutate: Callable[[List[Dict], ClientChange], Optional[str]]
+    ) -> List[Optional[str]]:
+        """Read one inbound, apply all its changes and write it back once"""
         response = await self._make_request(
             "POST",
             f"panel/api/inbounds/get/{inbound_id}"
         )
         
         if not response.get("obj"):
-            return False
+            return ["Inbound not found"] * len(group)
             
         inbound = response["obj"]
-        settings = json.loads(inbound.get("settings", "{}"))
+        settings = json.loads(inbound.get("settings") or "{}")
         clients = settings.get("clients", [])
         
-        # Update client with matching email
-        for client in clients:
-            if client.get("email") == email:
-                if uuid is not None:
-                    client["id"] = uuid
-                if enable is not None:
-                    client["enable"] = enable
-                if total_gb is not None:
-                    client["totalGB"] = total_gb
-                if expiry_time is not None:
-                    client["expiryTime"] = expiry_time
-                break
-                
+        errors = [mutate(clients, change) for change in group]
+        if all(error is not None for error in errors):
+            # Nothing to write
+            return errors
+        
         settings["clients"] = clients
         inbound["settings"] = json.dumps(settings)
         
@@ -196,13 +326,16 @@ class ThreeXUIConnector(BaseServerConnector):
             "panel/api/inbounds/update",
             data=inbound
         )
+        inbound_cache.invalidate(self.snapshot_key)
         
-        return bool(update_response)
+        if not update_response:
+            return [error or "Inbound update rejected by panel" for error in errors]
+        return errors
 
     async def get_client_stats(self, email: str) -> Dict:
         """Get client statistics"""
-        # Get all inbounds to find the client
-        inbounds = await self.get_inbounds()
+        # Clients are already parsed in the inbound snapshot
+        snapshot = await self.get_inbound_snapshot()
         stats = {
             "enable": False,
             "total": 0,
@@ -211,23 +344,13 @@ class ThreeXUIConnector(BaseServerConnector):
             "expiry_time": None
         }
         
-        for inbound in inbounds:
-            response = await self._make_request(
-                "POST",
-                f"panel/api/inbounds/get/{inbound.id}"
-            )
-            
-            if not response.get("obj"):
-                continue
-                
-            settings = json.loads(response["obj"].get("settings", "{}"))
-            for client in settings.get("clients", []):
-                if client.get("email") == email:
-                    stats["enable"] = client.get("enable", False)
-                    stats["total"] = client.get("totalGB", 0)
-                    stats["up"] = client.get("up", 0)
-                    stats["down"] = client.get("down", 0)
-                    stats["expiry_time"] = client.get("expiryTime", None)
-                    return stats
+        found = snapshot.find_client(email)
+        if found:
+            _, client = found
+            stats["enable"] = client.get("enable", False)
+            stats["total"] = client.get("totalGB", 0)
+            stats["up"] = client.get("up", 0)
+            stats["down"] = client.get("down", 0)
+            stats["expiry_time"] = client.get("expiryTime", None)
                     
-        return stats 
\ No newline at end of file
+        return stats
@@ -2,12 +2,13 @@
 Base CRUD operations
 """
 
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
-from fastapi.encoders import jsonable_encoder
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import case, func, insert, literal, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import SQLModel
+from ...core.config import settings
+from ..pagination import fetch_page
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -42,26 +43,43 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         Get multiple records with optional filtering
         """
-        query = select(self.model)
-        
-        if filters:
-            for field, value in filters.items():
-                if hasattr(self.model, field):
-                    query = query.where(getattr(self.model, field) == value)
-        
+        query = self._apply_filters(select(self.model), filters)
         query = query.offset(skip).limit(limit)
         result = await db.execute(query)
         return result.scalars().all()
 
-    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        filters: Optional[Dict] = None
+    ) -> Tuple[List[ModelType], Optional[str]]:
         """
-        Create a new record
+        Get one page of records, newest first, and the cursor of the next
+        page. Unlike skip, the cost doesn't grow with the page number
         """
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)
+        query = self._apply_filters(select(self.model), filters)
+        rows, next_cursor = await fetch_page(db, query, self.model, cursor, limit)
+        return rows, next_cursor
+
+    async def create(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: Union[CreateSchemaType, Dict[str, Any]],
+        refresh: bool = True
+    ) -> ModelType:
+        """
+        Create a new record. refresh=False skips re-reading the row after
+        commit when server-side defaults aren't needed
+        """
+        db_obj = self.model(**self._values(obj_in))
         db.add(db_obj)
         await db.commit()
-        await db.refresh(db_obj)
+        if refresh:
+            await db.refresh(db_obj)
         return db_obj
 
     async def update(
@@ -69,27 +87,154 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db: AsyncSession,
         *,
         db_obj: ModelType,
-        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+        refresh: bool = True
     ) -> ModelType:
         """
         Update a record
         """
-        obj_data = jsonable_encoder(db_obj)
-        
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-            
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        update_data = self._values(obj_in, exclude_unset=True)
+        for field, value in update_data.items():
+            if field in self.model.__fields__:
+                setattr(db_obj, field, value)
                 
         db.add(db_obj)
         await db.commit()
-        await db.refresh(db_obj)
+        if refresh:
+            await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        batch_size: int = settings.CRUD_BULK_BATCH_SIZE,
+        commit: bool = True
+    ) -> int:
+        """
+        Insert records with one multi-row INSERT per batch. Model defaults
+        are applied as in create; no objects are loaded back
+        """
+        rows = [self._row(self.model(**self._values(obj_in))) for obj_in in objs_in]
+        table = self.model.__table__
+        inserted = 0
+        for group in self._column_groups(rows):
+            for batch in self._batches(group, batch_size):
+                result = await db.execute(insert(table).values(batch))
+                inserted += result.rowcount
+        if commit:
+            await db.commit()
+        return inserted
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Dict[str, Any]],
+        batch_size: int = settings.CRUD_BULK_BATCH_SIZE,
+        commit: bool = True
+    ) -> int:
+        """
+        Update records by id, each dict holding "id" and the fields to set.
+        Rows setting the same fields share one UPDATE per batch, with a
+        CASE on id choosing each row's value
+        """
+        table = self.model.__table__
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for values in objs_in:
+            fields = tuple(sorted(
+                field for field in values if field != "id" and field in table.c
+            ))
+            if fields:
+                groups.setdefault(fields, []).append(values)
+
+        updated = 0
+        for fields, rows in groups.items():
+            for batch in self._batches(rows, batch_size):
+                ids = [row["id"] for row in batch]
+                statement = update(table).where(table.c.id.in_(ids)).values({
+                    field: case(
+                        {row["id"]: literal(row[field], table.c[field].type) for row in batch},
+                        value=table.c.id
+                    )
+                    for field in fields
+                })
+                result = await db.execute(statement)
+                updated += result.rowcount
+        if commit:
+            await db.commit()
+        return updated
+
+    async def upsert_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Sequence[str] = ("id",),
+        update_fields: Optional[Sequence[str]] = None,
+        batch_size: int = settings.CRUD_BULK_BATCH_SIZE,
+        commit: bool = True
+    ) -> int:
+        """
+        Insert records or, when index_elements match an existing row,
+        update it, one statement per batch. Rows repeating a key collapse
+        to the last one, since one statement may not touch a row twice.
+        update_fields defaults to every column except the key, id and
+        created_at. Returns the affected row count as the driver reports
+        it (MySQL counts an update as 2)
+        """
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            raise NotImplementedError(f"upsert_many is not supported on {dialect}")
+
+        unique: Dict[Any, Dict[str, Any]] = {}
+        for obj_in in objs_in:
+            row = self._row(self.model(**self._values(obj_in)))
+            key = tuple(row.get(field) for field in index_elements)
+            # Rows without a full key can't conflict, so all of them stay
+            unique[object() if None in key else key] = row
+        rows = list(unique.values())
+        if not rows:
+            return 0
+        if update_fields is None:
+            update_fields = [
+                column.name for column in self.model.__table__.columns
+                if column.name not in index_elements and column.name not in ("id", "created_at")
+            ]
+
+        table = self.model.__table__
+        affected = 0
+        for group in self._column_groups(rows):
+            fields = [field for field in update_fields if field in group[0]]
+            for batch in self._batches(group, batch_size):
+                statement = dialect_insert(table).values(batch)
+                if dialect == "mysql":
+                    statement = (
+                        statement.on_duplicate_key_update(
+                            {field: statement.inserted[field] for field in fields}
+                        )
+                        if fields else statement.prefix_with("IGNORE")
+                    )
+                elif fields:
+                    statement = statement.on_conflict_do_update(
+                        index_elements=list(index_elements),
+                        set_={field: statement.excluded[field] for field in fields}
+                    )
+                else:
+                    statement = statement.on_conflict_do_nothing(index_elements=list(index_elements))
+                result = await db.execute(statement)
+                affected += result.rowcount
+        if commit:
+            await db.commit()
+        return affected
+
     async def delete(self, db: AsyncSession, *, id: int) -> ModelType:
         """
         Delete a record
@@ -104,20 +249,44 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self,
         db: AsyncSession,
         *,
-        filters: Optional[Dict] = None
+        filters: Optional[Dict] = None,
+        approximate: bool = False
     ) -> int:
         """
-        Count records with optional filtering
+        Count records with optional filtering. With approximate=True an
+        unfiltered count of a large table comes from planner statistics
         """
-        query = select(self.model)
-        
-        if filters:
-            for field, value in filters.items():
-                if hasattr(self.model, field):
-                    query = query.where(getattr(self.model, field) == value)
-        
+        if approximate and not filters:
+            estimate = await self.estimate_count(db)
+            if estimate is not None and estimate >= settings.APPROXIMATE_COUNT_MIN_ROWS:
+                return estimate
+
+        query = self._apply_filters(select(func.count()).select_from(self.model), filters)
         result = await db.execute(query)
-        return len(result.scalars().all())
+        return result.scalar_one()
+
+    async def estimate_count(self, db: AsyncSession) -> Optional[int]:
+        """
+        Row estimate kept by the database's planner (as fresh as the last
+        ANALYZE), or None where no estimate is available
+        """
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            query = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+        elif dialect == "mysql":
+            query = text(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :table"
+            )
+        else:
+            return None
+
+        result = await db.execute(query, {"table": self.model.__tablename__})
+        estimate = result.scalar()
+        # Postgres reports -1 for tables that were never analyzed
+        if estimate is None or estimate < 0:
+            return None
+        return int(estimate)
 
     async def exists(
         self,
@@ -128,11 +297,54 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         Check if records exist with given filters
         """
-        query = select(self.model)
-        
-        for field, value in filters.items():
-            if hasattr(self.model, field):
-                query = query.where(getattr(self.model, field) == value)
-        
-        result = await db.execute(query)
-        return result.first() is not None 
\ No newline at end of file
+        query = self._apply_filters(select(self.model.id), filters)
+        result = await db.execute(select(query.exists()))
+        return bool(result.scalar())
+
+    @staticmethod
+    def _values(
+        obj_in: Union[BaseModel, Dict[str, Any]],
+        exclude_unset: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Field values of a schema or dict, keeping Python types
+        """
+        if isinstance(obj_in, dict):
+            return obj_in
+        return obj_in.dict(exclude_unset=exclude_unset)
+
+    def _row(self, db_obj: ModelType) -> Dict[str, Any]:
+        """
+        Column values of an unsaved object; an unset id is left to the database
+        """
+        return {
+            column.name: getattr(db_obj, column.name)
+            for column in self.model.__table__.columns
+            if not (column.primary_key and getattr(db_obj, column.name) is None)
+        }
+
+    @staticmethod
+    def _column_groups(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Split rows by the columns they set (e.g. with and without an id),
+        as a multi-row VALUES needs the same columns in every row
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+        return list(groups.values())
+
+    @staticmethod
+    def _batches(rows: List[Dict[str, Any]], size: int):
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def _apply_filters(self, query, filters: Optional[Dict] = None):
+        """
+        Add an equality condition per filter naming a model field
+        """
+        if filters:
+            for field, value in filters.items():
+                if hasattr(self.model, field):
+                    query = query.where(getattr(self.model, field) == value)
+        return query 
\ No newline at end of file
@@ -9,6 +9,7 @@ from ..models.server import Server, ServerCreate, ServerUpdate
 from .base import CRUDBase
 from ...core.server_connector.base import BaseServerConnector
 from ...core.server_connector.three_x_ui import ThreeXUIConnector
+from ...core.server_connector.circuit_breaker import panel_breakers
 
 class CRUDServer(CRUDBase[Server, ServerCreate, ServerUpdate]):
     """
@@ -38,6 +39,8 @@ class CRUDServer(CRUDBase[Server, ServerCreate, ServerUpdate]):
         server = await self.get(db=db, id=server_id)
         if not server:
             return None
+        if not panel_breakers.is_available(server.url):
+            return {"error": "Server panel unavailable (circuit open)"}
             
         connector = self._get_connector(server)
         try:
@@ -48,16 +51,15 @@ class CRUDServer(CRUDBase[Server, ServerCreate, ServerUpdate]):
             # Get system status
             stats = await connector.get_system_status()
             
-            # Get inbounds info
+            # Get inbounds info from the shared snapshot
             inbounds = await connector.get_inbounds()
+            snapshot = await connector.get_inbound_snapshot()
             
             return {
                 "system": stats.dict(),
                 "inbounds": [inbound.dict() for inbound in inbounds],
-                "total_clients": sum(
-                    len(json.loads(inbound.settings).get("clients", []))
-                    for inbound in inbounds
-                )
+                "clients": snapshot.all_clients(),
+                "total_clients": snapshot.total_clients
             }
         except Exception as e:
             return {"error": str(e)}
@@ -85,7 +87,7 @@ class CRUDServer(CRUDBase[Server, ServerCreate, ServerUpdate]):
     ) -> bool:
         """Update server load information"""
         server = await self.get(db=db, id=server_id)
-        if not server:
+        if not server or not panel_breakers.is_available(server.url):
             return False
             
         connector = self._get_connector(server)
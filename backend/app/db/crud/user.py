@@ -6,6 +6,7 @@ from typing import List, Optional, Union, Dict, Any
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.user import User, UserCreate, UserUpdate
+from ..models.subscription import Subscription
 from .base import CRUDBase
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -84,9 +85,12 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         if not user:
             return {}
             
-        active_subs = [s for s in user.subscriptions if s.is_active]
-        total_traffic = sum(s.total_traffic for s in user.subscriptions)
-        used_traffic = sum(s.used_traffic for s in user.subscriptions)
+        # Loaded explicitly: relationships can't lazy-load on an async session
+        result = await db.execute(select(Subscription).where(Subscription.user_id == user.id))
+        subscriptions = result.scalars().all()
+        active_subs = [s for s in subscriptions if s.is_active]
+        total_traffic = sum(s.total_traffic for s in subscriptions)
+        used_traffic = sum(s.used_traffic for s in subscriptions)
         
         return {
             "credit": user.credit,
@@ -94,8 +98,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             "total_traffic": total_traffic,
             "used_traffic": used_traffic,
             "remaining_traffic": total_traffic - used_traffic,
-            "download": sum(s.download for s in user.subscriptions),
-            "upload": sum(s.upload for s in user.subscriptions)
+            "download": sum(s.download for s in subscriptions),
+            "upload": sum(s.upload for s in subscriptions)
         }
 
     async def count_active_users(self, db: AsyncSession) -> int:
@@ -2,8 +2,9 @@
 Server model for V2Ray servers
 """
 
-from typing import Optional, List
+from typing import Dict, Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlmodel.ext.asyncio.session import AsyncSession
 from enum import Enum
 from .base import BaseModel, TimestampModel
 from datetime import datetime
@@ -54,7 +55,7 @@ class Server(ServerBase, TimestampModel, table=True):
 
     async def record_metrics(
         self,
-        db: Session,
+        db: AsyncSession,
         cpu_usage: float,
         memory_usage: float,
         disk_usage: float,
@@ -68,11 +69,16 @@ class Server(ServerBase, TimestampModel, table=True):
         login_success: bool = True,
         error_message: Optional[str] = None
     ) -> "ServerMetrics":
-        """Record server metrics at current timestamp"""
+        """
+        Record server metrics at current timestamp. The sample is handed to
+        the buffered metrics writer instead of being committed on db.
+        """
         from .server_metrics import ServerMetrics
+        from ...services.metrics_writer import metrics_writer
         
-        metrics = ServerMetrics(
+        sample = dict(
             server_id=self.id,
+            timestamp=datetime.utcnow(),
             cpu_usage=cpu_usage,
             memory_usage=memory_usage,
             disk_usage=disk_usage,
@@ -88,57 +94,37 @@ class Server(ServerBase, TimestampModel, table=True):
             login_success=login_success,
             error_message=error_message
         )
+        await metrics_writer.submit(sample)
         
-        db.add(metrics)
-        await db.commit()
-        await db.refresh(metrics)
-        
-        return metrics
+        return ServerMetrics(**sample)
 
     async def get_metrics_history(
         self,
-        db: Session,
+        db: AsyncSession,
         hours: int = 24
-    ) -> List["ServerMetrics"]:
-        """Get server metrics history for specified hours"""
-        from .server_metrics import ServerMetrics
+    ) -> List[Dict]:
+        """Get server metrics history for specified hours, from the fitting rollup tier"""
+        from ...services.metrics_rollup import metrics_rollup
         
-        cutoff = datetime.utcnow() - timedelta(hours=hours)
-        return await db.query(ServerMetrics).filter(
-            ServerMetrics.server_id == self.id,
-            ServerMetrics.timestamp >= cutoff
-        ).order_by(ServerMetrics.timestamp.desc()).all()
+        return await metrics_rollup.get_history(db, self.id, hours)
 
     async def get_average_metrics(
         self,
-        db: Session,
+        db: AsyncSession,
         hours: int = 24
     ) -> Dict:
         """Get average metrics for specified time period"""
-        from .server_metrics import ServerMetrics
-        
-        cutoff = datetime.utcnow() - timedelta(hours=hours)
-        metrics = await db.query(
-            sa.func.avg(ServerMetrics.cpu_usage).label('avg_cpu'),
-            sa.func.avg(ServerMetrics.memory_usage).label('avg_memory'),
-            sa.func.avg(ServerMetrics.disk_usage).label('avg_disk'),
-            sa.func.avg(ServerMetrics.bandwidth_in).label('avg_bandwidth_in'),
-            sa.func.avg(ServerMetrics.bandwidth_out).label('avg_bandwidth_out'),
-            sa.func.avg(ServerMetrics.active_connections).label('avg_connections'),
-            sa.func.avg(ServerMetrics.response_time).label('avg_response_time')
-        ).filter(
-            ServerMetrics.server_id == self.id,
-            ServerMetrics.timestamp >= cutoff
-        ).first()
+        from ...services.metrics_rollup import metrics_rollup
         
+        metrics = await metrics_rollup.get_averages(db, self.id, hours)
         return {
-            'avg_cpu': metrics.avg_cpu or 0,
-            'avg_memory': metrics.avg_memory or 0,
-            'avg_disk': metrics.avg_disk or 0,
-            'avg_bandwidth_in': metrics.avg_bandwidth_in or 0,
-            'avg_bandwidth_out': metrics.avg_bandwidth_out or 0,
-            'avg_connections': int(metrics.avg_connections or 0),
-            'avg_response_time': metrics.avg_response_time
+            'avg_cpu': metrics['cpu_usage'] or 0,
+            'avg_memory': metrics['memory_usage'] or 0,
+            'avg_disk': metrics['disk_usage'] or 0,
+            'avg_bandwidth_in': metrics['bandwidth_in'] or 0,
+            'avg_bandwidth_out': metrics['bandwidth_out'] or 0,
+            'avg_connections': int(metrics['active_connections'] or 0),
+            'avg_response_time': metrics['response_time']
         }
 
     @property
@@ -255,7 +241,7 @@ class ServerWithStats(ServerRead):
     """Schema for server data with detailed statistics"""
     total_bandwidth_used: float
     average_user_bandwidth: float
-    uptime_percentage: float
+    uptime_percentage: Optional[float] = None  # None until probes have data
     subscription_count: int
     panel_info: Optional[PanelInfo] = None
     system_status: Optional[SystemStatus] = None
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 from typing import Optional
 from sqlmodel import Field, SQLModel, Relationship
 from .base import BaseModel
@@ -36,5 +37,54 @@ class ServerMetrics(BaseModel, table=True):
     class Config:
         arbitrary_types_allowed = True
 
+class MetricsResolution(str, Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+    DAY = "1d"
+
+class ServerMetricsRollup(SQLModel, table=True):
+    """Aggregated server metrics per time bucket (min/max/avg/p95 per metric)"""
+    __tablename__ = "server_metrics_rollup"
+    
+    server_id: int = Field(foreign_key="server.id", primary_key=True)
+    resolution: str = Field(primary_key=True, max_length=2)  # MetricsResolution value
+    bucket: datetime = Field(primary_key=True)  # bucket start
+    
+    sample_count: int = Field(default=0)
+    online_count: int = Field(default=0)
+    
+    cpu_usage_min: Optional[float] = Field(default=None)
+    cpu_usage_max: Optional[float] = Field(default=None)
+    cpu_usage_avg: Optional[float] = Field(default=None)
+    cpu_usage_p95: Optional[float] = Field(default=None)
+    memory_usage_min: Optional[float] = Field(default=None)
+    memory_usage_max: Optional[float] = Field(default=None)
+    memory_usage_avg: Optional[float] = Field(default=None)
+    memory_usage_p95: Optional[float] = Field(default=None)
+    disk_usage_min: Optional[float] = Field(default=None)
+    disk_usage_max: Optional[float] = Field(default=None)
+    disk_usage_avg: Optional[float] = Field(default=None)
+    disk_usage_p95: Optional[float] = Field(default=None)
+    load_avg_1m_min: Optional[float] = Field(default=None)
+    load_avg_1m_max: Optional[float] = Field(default=None)
+    load_avg_1m_avg: Optional[float] = Field(default=None)
+    load_avg_1m_p95: Optional[float] = Field(default=None)
+    response_time_min: Optional[float] = Field(default=None)
+    response_time_max: Optional[float] = Field(default=None)
+    response_time_avg: Optional[float] = Field(default=None)
+    response_time_p95: Optional[float] = Field(default=None)
+    active_connections_min: Optional[float] = Field(default=None)
+    active_connections_max: Optional[float] = Field(default=None)
+    active_connections_avg: Optional[float] = Field(default=None)
+    active_connections_p95: Optional[float] = Field(default=None)
+    bandwidth_in_min: Optional[float] = Field(default=None)
+    bandwidth_in_max: Optional[float] = Field(default=None)
+    bandwidth_in_avg: Optional[float] = Field(default=None)
+    bandwidth_in_p95: Optional[float] = Field(default=None)
+    bandwidth_out_min: Optional[float] = Field(default=None)
+    bandwidth_out_max: Optional[float] = Field(default=None)
+    bandwidth_out_avg: Optional[float] = Field(default=None)
+    bandwidth_out_p95: Optional[float] = Field(default=None)
+
 # Prevent circular imports
 from .server import Server
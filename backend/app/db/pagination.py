@@ -0,0 +1,73 @@
+"""
+Keyset pagination and NDJSON streaming over (created_at, id)
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncGenerator, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from .session import async_session
+
+def encode_cursor(row: Any) -> str:
+    """Opaque cursor for the position right after row"""
+    raw = json.dumps([row.created_at.isoformat(), row.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Position stored in a cursor; ValueError if it wasn't made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def keyset(query, model, cursor: Optional[str] = None):
+    """
+    Order newest first and continue after the cursor. With an index on
+    (created_at, id) every page is an index range scan of its own size,
+    however deep it is.
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+async def fetch_page(
+    db: AsyncSession,
+    query,
+    model,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """One page of rows and the cursor of the next page (None on the last one)"""
+    query = keyset(query, model, cursor)
+    if offset and not cursor:
+        query = query.offset(offset)
+    rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+async def stream_ndjson(
+    query,
+    model,
+    schema: Type[BaseModel],
+    batch_size: int = 500
+) -> AsyncGenerator[str, None]:
+    """
+    Every row of the query as one JSON document per line, read page by
+    page on a session of its own so memory stays flat for any export size
+    """
+    cursor = None
+    async with async_session() as db:
+        while True:
+            rows, cursor = await fetch_page(db, query, model, cursor, batch_size)
+            if rows:
+                yield "".join(schema.from_orm(row).json() + "\n" for row in rows)
+            if not cursor:
+                break
+            # Drop the page from the identity map before loading the next one
+            db.expunge_all()
@@ -1,57 +1,111 @@
-from typing import Generator
-from sqlmodel import Session, SQLModel, create_engine
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from ..core.config import settings
+from ..core.monitoring.prometheus import CACHE_REQUESTS, instrument_pool
+
+# Sync URL prefixes and the async driver used for them
+ASYNC_DRIVERS = (
+    ("postgresql://", "postgresql+asyncpg://"),
+    ("postgres://", "postgresql+asyncpg://"),
+    ("mysql://", "mysql+aiomysql://"),
+    ("mysql+mysqldb://", "mysql+aiomysql://"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+)
+
+def async_database_url(url: str) -> str:
+    """Point a configured database URL at its async driver"""
+    for sync_prefix, async_prefix in ASYNC_DRIVERS:
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
 
 # Create database URL with proper encoding for MySQL
-DATABASE_URL = settings.DATABASE_URL
-if DATABASE_URL.startswith("mysql"):
-    DATABASE_URL = DATABASE_URL.replace("mysql://", "mysql+mysqldb://")
-    if "?" not in DATABASE_URL:
-        DATABASE_URL += "?charset=utf8mb4"
-
-# Create engine with proper configurations
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Enable connection pool pre-ping
-    pool_recycle=3600,   # Recycle connections every hour
-    echo=False           # Set to True for SQL query logging
+DATABASE_URL = async_database_url(settings.DATABASE_URL)
+if DATABASE_URL.startswith("mysql") and "?" not in DATABASE_URL:
+    DATABASE_URL += "?charset=utf8mb4"
+
+# One async engine per process, shared by the API, CRUD layer, bot and
+# background jobs. MIN_CONNECTIONS_COUNT connections stay pooled and bursts
+# may open more up to MAX_CONNECTIONS_COUNT.
+engine_options = {
+    "pool_pre_ping": True,  # Enable connection pool pre-ping
+    "echo": False           # Set to True for SQL query logging
+}
+# SQLite uses a pool without size limits; only queue pools take these
+if not DATABASE_URL.startswith("sqlite"):
+    engine_options.update(
+        pool_size=settings.MIN_CONNECTIONS_COUNT,
+        max_overflow=max(0, settings.MAX_CONNECTIONS_COUNT - settings.MIN_CONNECTIONS_COUNT),
+        pool_timeout=30,    # Wait this long for a free connection
+        pool_recycle=3600   # Recycle connections every hour
+    )
+engine = create_async_engine(DATABASE_URL, **engine_options)
+instrument_pool(engine, "main")
+
+# Objects stay usable after commit; lazy loads would need I/O in async code
+async_session = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
 )
 
-def init_db() -> None:
+# Session factory for code that opens sessions by hand (celery tasks)
+SessionLocal = async_session
+
+async def init_db() -> None:
     """Initialize database with all models"""
-    SQLModel.metadata.create_all(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+async def close_db() -> None:
+    """Close every pooled connection"""
+    await engine.dispose()
 
-def get_session() -> Generator[Session, None, None]:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
-    with Session(engine) as session:
+    async with async_session() as session:
         try:
             yield session
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise e
-        finally:
-            session.close()
+
+# Name used by the v1 endpoints
+get_db = get_session
 
 class DatabaseSession:
-    """Context manager for database sessions"""
+    """Async context manager for database sessions outside of requests"""
     def __init__(self):
-        self.session = Session(engine)
+        self.session = async_session()
 
-    def __enter__(self) -> Session:
+    async def __aenter__(self) -> AsyncSession:
         return self.session
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
         try:
             if exc_type is not None:
-                self.session.rollback()
+                await self.session.rollback()
             else:
-                self.session.commit()
+                await self.session.commit()
         finally:
-            self.session.close()
+            await self.session.close()
+
+def get_pool_status() -> dict:
+    """Connection pool usage of the shared engine"""
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow()
+    }
 
 # Redis connection setup
 from redis import Redis
-from ..core.config import settings
 
 redis_client = Redis(
     host=settings.REDIS_HOST,
@@ -61,6 +115,19 @@ redis_client = Redis(
     retry_on_timeout=True   # Retry on timeout
 )
 
+# Async Redis client for shared state used from the event loop
+from redis.asyncio import Redis as AsyncRedis
+
+async_redis_client = AsyncRedis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+    password=settings.REDIS_PASSWORD,
+    decode_responses=True,
+    socket_timeout=5,
+    retry_on_timeout=True
+)
+
 def get_redis() -> Redis:
     """Get Redis client"""
     try:
@@ -98,7 +165,9 @@ def cache(ttl_seconds: int = 300):
             with RedisSession() as redis:
                 cached_result = redis.get(cache_key)
                 if cached_result:
+                    CACHE_REQUESTS.labels(cache="redis", result="hit").inc()
                     return json.loads(cached_result)
+                CACHE_REQUESTS.labels(cache="redis", result="miss").inc()
                 
                 # Execute function and cache result
                 result = await func(*args, **kwargs)
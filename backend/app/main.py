@@ -3,7 +3,7 @@ import logging
 import asyncio
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from .middleware.rate_limit import rate_limiter
 from .api.endpoints import (
@@ -11,8 +11,13 @@ from .api.endpoints import (
     tickets, servers, admin, admin_backup
 )
 from .services.backup import backup_service
+from .services.metrics_writer import metrics_writer
+from .db.session import async_session, close_db, engine
 from .bot.telegram_bot import start_bot, stop_bot
 from .core.config import settings
+from .core.server_connector.http_client import panel_http
+from .core.monitoring.prometheus import RATE_LIMIT_REJECTIONS, mark_worker_dead, render_metrics
+from .core.monitoring.query_profiler import query_profiler
 import uuid
 import redis
 
@@ -61,7 +66,7 @@ async def rate_limit_middleware(request: Request, call_next):
     route_key = request.url.path
     
     # Skip rate limiting for certain paths
-    if route_key.startswith("/static/") or route_key.startswith("/api/health"):
+    if route_key.startswith("/static/") or route_key.startswith("/api/health") or route_key == "/metrics":
         return await call_next(request)
     
     redis_key = f"rate_limit:{client_ip}:{route_key}"
@@ -72,6 +77,7 @@ async def rate_limit_middleware(request: Request, call_next):
             await redis_client.expire(redis_key, 60)  # 1 minute window
         
         if requests > 100:  # 100 requests per minute limit
+            RATE_LIMIT_REJECTIONS.labels(limiter="redis").inc()
             return JSONResponse(
                 status_code=429,
                 content={
@@ -84,6 +90,48 @@ async def rate_limit_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Profile the SQL each request runs; in debug mode the totals, slowest
+# statement and N+1 suspects are returned in X-DB-* headers
+query_profiler.instrument(engine)
+
+@app.middleware("http")
+async def query_profiling_middleware(request: Request, call_next):
+    if not query_profiler.enabled:
+        return await call_next(request)
+    
+    profile, token = query_profiler.start("request", f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        entries = query_profiler.finish(profile, token)
+    await query_profiler.publish(entries)
+    
+    if settings.DEBUG:
+        summary = profile.summary(query_profiler.n_plus_one_threshold)
+        response.headers["X-DB-Query-Count"] = str(summary["count"])
+        response.headers["X-DB-Query-Time"] = f"{summary['total_ms']}ms"
+        if summary["slowest"]:
+            slowest = summary["slowest"][0]
+            response.headers["X-DB-Slowest-Query"] = _header_value(
+                f"{slowest['duration_ms']}ms {slowest['fingerprint']}"
+            )
+        if summary["n_plus_one"]:
+            suspect = summary["n_plus_one"][0]
+            response.headers["X-DB-N-Plus-One"] = _header_value(
+                f"{suspect['count']}x {suspect['fingerprint']}"
+            )
+    return response
+
+def _header_value(value: str, max_length: int = 512) -> str:
+    return value.encode("ascii", "replace").decode()[:max_length]
+
+# Prometheus scrape endpoint; samples are merged across uvicorn workers
+if settings.ENABLE_PROMETHEUS:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        payload, content_type = render_metrics()
+        return Response(content=payload, media_type=content_type)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -157,14 +205,15 @@ async def shutdown_event():
     # Cleanup tasks
     try:
         # Clean up old backups based on retention policy
-        backups = await backup_service.list_backups()
         retention_days = settings.BACKUP_RETENTION_DAYS
         cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
         
-        for backup in backups:
-            backup_date = datetime.strptime(backup["timestamp"], "%Y%m%d_%H%M%S")
-            if backup_date < cutoff_date:
-                await backup_service.delete_backup(backup["path"])
+        async with async_session() as db:
+            backups = await backup_service.list_backups(db)
+            for backup in backups:
+                backup_date = datetime.strptime(backup["timestamp"], "%Y%m%d_%H%M%S")
+                if backup_date < cutoff_date:
+                    await backup_service.delete_backup(backup["path"], db)
                 
         # Stop Telegram bot
         if settings.TELEGRAM_BOT_ENABLED:
@@ -172,3 +221,24 @@ async def shutdown_event():
             await stop_bot()
     except Exception as e:
         logger.error(f"Error during shutdown cleanup: {str(e)}")
+    
+    # Drop this worker's live gauges
+    mark_worker_dead()
+    
+    # Write buffered server metrics
+    try:
+        await metrics_writer.stop()
+    except Exception as e:
+        logger.error(f"Error flushing metrics buffer: {str(e)}")
+    
+    # Close pooled panel connections
+    try:
+        await panel_http.close()
+    except Exception as e:
+        logger.error(f"Error closing panel HTTP clients: {str(e)}")
+    
+    # Close pooled database connections, after the metrics flush above
+    try:
+        await close_db()
+    except Exception as e:
+        logger.error(f"Error closing database pool: {str(e)}")
@@ -4,6 +4,7 @@ from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 import asyncio
 from collections import defaultdict
+from ..core.monitoring.prometheus import RATE_LIMIT_REJECTIONS
 
 class RateLimiter:
     def __init__(self, requests_per_minute: int = 60):
@@ -52,6 +53,7 @@ class RateLimiter:
         
         # Check rate limit
         if len(self.requests[client_ip]) >= self.requests_per_minute:
+            RATE_LIMIT_REJECTIONS.labels(limiter="memory").inc()
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail={
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlmodel import Session
-from ..db.session import engine
+from sqlalchemy import func
+from sqlmodel import select
+from ..db.session import async_session
 from ..db.models.user import User
 from ..db.models.activity_log import ActivityLog
 
@@ -25,10 +26,10 @@ class ActivityLogger:
             timestamp=datetime.utcnow()
         )
         
-        with Session(engine) as session:
+        async with async_session() as session:
             session.add(log_entry)
-            session.commit()
-            session.refresh(log_entry)
+            await session.commit()
+            await session.refresh(log_entry)
             
         return log_entry
     
@@ -41,17 +42,14 @@ class ActivityLogger:
     ) -> list[ActivityLog]:
         """Get activities for a specific user"""
         
-        with Session(engine) as session:
-            query = session.query(ActivityLog).filter(ActivityLog.user_id == user_id)
-            
-            if activity_type:
-                query = query.filter(ActivityLog.activity_type == activity_type)
-                
-            activities = query.order_by(ActivityLog.timestamp.desc())\
-                             .offset(offset)\
-                             .limit(limit)\
-                             .all()
-                             
+        query = select(ActivityLog).where(ActivityLog.user_id == user_id)
+        if activity_type:
+            query = query.where(ActivityLog.activity_type == activity_type)
+        query = query.order_by(ActivityLog.timestamp.desc()).offset(offset).limit(limit)
+
+        async with async_session() as session:
+            activities = (await session.exec(query)).all()
+
         return activities
     
     @staticmethod
@@ -62,42 +60,33 @@ class ActivityLogger:
     ) -> list[ActivityLog]:
         """Get system-wide activities"""
         
-        with Session(engine) as session:
-            query = session.query(ActivityLog)
-            
-            if activity_type:
-                query = query.filter(ActivityLog.activity_type == activity_type)
-                
-            activities = query.order_by(ActivityLog.timestamp.desc())\
-                             .offset(offset)\
-                             .limit(limit)\
-                             .all()
-                             
+        query = select(ActivityLog)
+        if activity_type:
+            query = query.where(ActivityLog.activity_type == activity_type)
+        query = query.order_by(ActivityLog.timestamp.desc()).offset(offset).limit(limit)
+
+        async with async_session() as session:
+            activities = (await session.exec(query)).all()
+
         return activities
     
     @staticmethod
     async def get_activity_stats(user_id: Optional[int] = None) -> Dict[str, Any]:
         """Get activity statistics"""
         
-        with Session(engine) as session:
-            query = session.query(ActivityLog)
-            
-            if user_id:
-                query = query.filter(ActivityLog.user_id == user_id)
-                
-            total_activities = query.count()
-            activity_types = query.with_entities(ActivityLog.activity_type)\
-                                .distinct()\
-                                .all()
-            
-            # Get counts per activity type
-            type_counts = {}
-            for activity_type in activity_types:
-                count = query.filter(ActivityLog.activity_type == activity_type[0]).count()
-                type_counts[activity_type[0]] = count
-                
+        counts = select(ActivityLog.activity_type, func.count(ActivityLog.id))
+        latest = select(ActivityLog).order_by(ActivityLog.timestamp.desc()).limit(1)
+        if user_id:
+            counts = counts.where(ActivityLog.user_id == user_id)
+            latest = latest.where(ActivityLog.user_id == user_id)
+
+        async with async_session() as session:
+            # Counts per activity type in one grouped query
+            type_counts = dict((await session.exec(counts.group_by(ActivityLog.activity_type))).all())
+            last_activity = (await session.exec(latest)).first()
+
         return {
-            "total_activities": total_activities,
+            "total_activities": sum(type_counts.values()),
             "activity_types": type_counts,
-            "last_activity": query.order_by(ActivityLog.timestamp.desc()).first()
+            "last_activity": last_activity
         }
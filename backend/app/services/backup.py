@@ -5,7 +5,9 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from cryptography.fernet import Fernet
 
 from ..core.config import settings
@@ -19,7 +21,7 @@ class BackupService:
         self.backup_dir = Path(settings.BACKUP_DIR)
         self._fernet = None if not settings.BACKUP_ENCRYPTION_KEY else Fernet(settings.BACKUP_ENCRYPTION_KEY)
     
-    async def create_backup(self, db: Session, user: Optional[User] = None) -> Dict[str, Any]:
+    async def create_backup(self, db: AsyncSession, user: Optional[User] = None) -> Dict[str, Any]:
         """Create a system backup"""
         try:
             # Ensure backup directory exists
@@ -36,7 +38,7 @@ class BackupService:
             
             try:
                 # Backup database and configs
-                db_tables = await self._backup_database(temp_dir / "database")
+                db_tables = await self._backup_database(temp_dir / "database", db)
                 config_files = await self._backup_configs(temp_dir / "config")
                 
                 # Create archive
@@ -71,8 +73,8 @@ class BackupService:
                 )
                 
                 db.add(metadata)
-                db.commit()
-                db.refresh(metadata)
+                await db.commit()
+                await db.refresh(metadata)
                 
                 return metadata.to_dict()
                 
@@ -88,7 +90,7 @@ class BackupService:
                 detail=f"Backup creation failed: {str(e)}"
             )
     
-    async def restore_backup(self, backup_path: str, db: Session) -> Dict[str, Any]:
+    async def restore_backup(self, backup_path: str, db: AsyncSession) -> Dict[str, Any]:
         """Restore system from backup"""
         try:
             backup_path = Path(backup_path)
@@ -129,10 +131,12 @@ class BackupService:
                 detail=f"Restore failed: {str(e)}"
             )
     
-    async def list_backups(self, db: Session) -> List[Dict[str, Any]]:
+    async def list_backups(self, db: AsyncSession) -> List[Dict[str, Any]]:
         """List available backups"""
         try:
-            backups = db.query(BackupMetadata).order_by(BackupMetadata.timestamp.desc()).all()
+            backups = (await db.exec(
+                select(BackupMetadata).order_by(BackupMetadata.timestamp.desc())
+            )).all()
             return [backup.to_dict() for backup in backups]
         except Exception as e:
             logger.error(f"Failed to list backups: {str(e)}")
@@ -141,17 +145,19 @@ class BackupService:
                 detail=f"Failed to list backups: {str(e)}"
             )
     
-    async def delete_backup(self, backup_path: str, db: Session) -> Dict[str, Any]:
+    async def delete_backup(self, backup_path: str, db: AsyncSession) -> Dict[str, Any]:
         """Delete a backup"""
         try:
             backup_path = Path(backup_path)
             if backup_path.exists():
                 backup_path.unlink()
             
-            backup = db.query(BackupMetadata).filter_by(backup_path=str(backup_path)).first()
+            backup = (await db.exec(
+                select(BackupMetadata).where(BackupMetadata.backup_path == str(backup_path))
+            )).first()
             if backup:
-                db.delete(backup)
-                db.commit()
+                await db.delete(backup)
+                await db.commit()
             
             return {"status": "success", "message": "Backup deleted successfully"}
         
@@ -162,23 +168,24 @@ class BackupService:
                 detail=f"Failed to delete backup: {str(e)}"
             )
     
-    async def _backup_database(self, backup_path: Path) -> List[str]:
+    async def _backup_database(self, backup_path: Path, db: AsyncSession) -> List[str]:
         """Backup database tables"""
         backup_path.mkdir(parents=True, exist_ok=True)
         tables = []
         
         try:
             # Get all table names
-            result = db.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+            result = await db.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public'"))
             tables = [row[0] for row in result]
             
+            # COPY goes through the asyncpg connection behind the session
+            connection = await db.connection()
+            raw = (await connection.get_raw_connection()).driver_connection
+            
             for table in tables:
                 # Export table data to CSV
                 table_path = backup_path / f"{table}.csv"
-                with open(table_path, 'w', encoding='utf-8') as f:
-                    copy_sql = f"COPY {table} TO STDOUT WITH CSV HEADER"
-                    cur = db.connection().cursor()
-                    cur.copy_expert(copy_sql, f)
+                await raw.copy_from_table(table, output=str(table_path), format="csv", header=True)
                 
                 # Export table schema
                 schema_path = backup_path / f"{table}_schema.sql"
@@ -205,7 +212,7 @@ class BackupService:
                     WHERE table_name = '{table}'
                     GROUP BY tablename;
                     """
-                    result = db.execute(schema_sql).scalar()
+                    result = (await db.execute(text(schema_sql))).scalar()
                     f.write(result)
             
             return tables
@@ -241,11 +248,13 @@ class BackupService:
             logger.error(f"Config backup failed: {str(e)}")
             raise
     
-    async def _restore_database(self, backup_path: Path, db: Session):
+    async def _restore_database(self, backup_path: Path, db: AsyncSession):
         """Restore database from backup"""
         try:
             # Get all table files
             table_files = list(backup_path.glob("*.csv"))
+            connection = await db.connection()
+            raw = (await connection.get_raw_connection()).driver_connection
             
             for table_file in table_files:
                 table_name = table_file.stem
@@ -255,18 +264,15 @@ class BackupService:
                 if schema_file.exists():
                     with open(schema_file, 'r', encoding='utf-8') as f:
                         schema_sql = f.read()
-                        db.execute(schema_sql)
+                        await db.execute(text(schema_sql))
                 
                 # Then restore data
-                with open(table_file, 'r', encoding='utf-8') as f:
-                    copy_sql = f"COPY {table_name} FROM STDIN WITH CSV HEADER"
-                    cur = db.connection().cursor()
-                    cur.copy_expert(copy_sql, f)
+                await raw.copy_to_table(table_name, source=str(table_file), format="csv", header=True)
             
-            db.commit()
+            await db.commit()
             
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Database restore failed: {str(e)}")
             raise
     
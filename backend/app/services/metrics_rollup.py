@@ -0,0 +1,275 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.models.server_metrics import MetricsResolution, ServerMetrics, ServerMetricsRollup
+
+logger = logging.getLogger(__name__)
+
+# Raw ServerMetrics columns that get min/max/avg/p95 rollups
+ROLLUP_METRICS = [
+    "cpu_usage",
+    "memory_usage",
+    "disk_usage",
+    "load_avg_1m",
+    "response_time",
+    "active_connections",
+    "bandwidth_in",
+    "bandwidth_out",
+]
+
+RAW = "raw"
+
+class MetricsRollupService:
+    """
+    Compact raw ServerMetrics samples into 1m/1h/1d aggregates, enforce
+    tiered retention and serve history from the coarsest fitting tier.
+    The aggregation SQL is PostgreSQL only (date_trunc, percentile_cont,
+    FILTER, ON CONFLICT); on other databases raw samples are kept for
+    METRICS_RETENTION_DAYS and history is read from them directly.
+    """
+
+    def __init__(self):
+        # (resolution, date_trunc unit, bucket seconds, source tier, retention days)
+        self.tiers: List[Tuple[str, str, int, str, int]] = [
+            (MetricsResolution.MINUTE.value, "minute", 60, RAW, settings.METRICS_1M_RETENTION_DAYS),
+            (MetricsResolution.HOUR.value, "hour", 3600, MetricsResolution.MINUTE.value, settings.METRICS_RETENTION_DAYS),
+            (MetricsResolution.DAY.value, "day", 86400, MetricsResolution.HOUR.value, settings.METRICS_1D_RETENTION_DAYS),
+        ]
+        self.raw_retention_days = settings.METRICS_RAW_RETENTION_DAYS
+        self.unrolled_retention_days = settings.METRICS_RETENTION_DAYS  # raw, without rollups
+        self.raw_interval = settings.SERVER_SYNC_INTERVAL  # seconds between raw samples
+        self.max_points = settings.METRICS_HISTORY_MAX_POINTS
+
+    async def rollup(self, db: AsyncSession) -> Dict[str, int]:
+        """Aggregate every complete bucket not yet rolled up, finest tier first"""
+        if not self.supports_rollups(db):
+            return {}
+        counts = {}
+        for resolution, unit, _, source, _ in self.tiers:
+            result = await db.execute(
+                text(
+                    f"INSERT INTO server_metrics_rollup "
+                    f"(server_id, resolution, bucket, sample_count, online_count, {self._rollup_columns()}) "
+                    f"{self._aggregate_select(source, unit)} "
+                    f"AND {self._time_column(source)} >= COALESCE("
+                    f"    (SELECT max(bucket) FROM server_metrics_rollup WHERE resolution = :resolution),"
+                    f"    '-infinity'::timestamp"
+                    f") "
+                    f"AND {self._time_column(source)} < date_trunc('{unit}', now() AT TIME ZONE 'utc') "
+                    f"GROUP BY 1, 3 "
+                    f"ON CONFLICT (server_id, resolution, bucket) DO UPDATE SET "
+                    f"sample_count = EXCLUDED.sample_count, online_count = EXCLUDED.online_count, "
+                    + ", ".join(f"{c} = EXCLUDED.{c}" for c in self._rollup_column_list())
+                ),
+                {"resolution": resolution, "source": source}
+            )
+            counts[resolution] = result.rowcount
+        await db.commit()
+        logger.info(f"Metrics rollup: {counts}")
+        return counts
+
+    async def enforce_retention(self, db: AsyncSession) -> Dict[str, int]:
+        """Delete raw samples and rollups past their tier's retention"""
+        now = datetime.utcnow()
+        counts = {}
+        rollups = self.supports_rollups(db)
+        raw_retention_days = self.raw_retention_days if rollups else self.unrolled_retention_days
+        result = await db.execute(
+            delete(ServerMetrics.__table__).where(
+                ServerMetrics.__table__.c.timestamp < now - timedelta(days=raw_retention_days)
+            )
+        )
+        counts[RAW] = result.rowcount
+        for resolution, _, _, _, retention_days in self.tiers if rollups else []:
+            result = await db.execute(
+                delete(ServerMetricsRollup.__table__).where(
+                    ServerMetricsRollup.__table__.c.resolution == resolution,
+                    ServerMetricsRollup.__table__.c.bucket < now - timedelta(days=retention_days)
+                )
+            )
+            counts[resolution] = result.rowcount
+        await db.commit()
+        logger.info(f"Metrics retention: deleted {counts}")
+        return counts
+
+    def choose_resolution(self, start: datetime, end: datetime) -> str:
+        """
+        Coarsest tier that still fits: the finest one whose point count stays
+        within max_points and whose retention still covers the start.
+        """
+        span = (end - start).total_seconds()
+        age_days = (datetime.utcnow() - start).total_seconds() / 86400
+
+        if span / self.raw_interval <= self.max_points and age_days <= self.raw_retention_days:
+            return RAW
+        for resolution, _, seconds, _, retention_days in self.tiers:
+            if span / seconds <= self.max_points and age_days <= retention_days:
+                return resolution
+        return self.tiers[-1][0]
+
+    async def get_history(
+        self,
+        db: AsyncSession,
+        server_id: int,
+        hours: int = 24,
+        end: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Metrics history, newest first, read from the tier chosen for the range"""
+        end = end or datetime.utcnow()
+        start = end - timedelta(hours=hours)
+        resolution = self.choose_resolution(start, end) if self.supports_rollups(db) else RAW
+
+        if resolution == RAW:
+            table = ServerMetrics.__table__
+            result = await db.execute(
+                select(table.c.timestamp, table.c.is_online, *(table.c[m] for m in ROLLUP_METRICS))
+                .where(
+                    table.c.server_id == server_id,
+                    table.c.timestamp >= start,
+                    table.c.timestamp < end
+                )
+                .order_by(table.c.timestamp.desc())
+            )
+            return [
+                {
+                    "timestamp": row.timestamp,
+                    "resolution": RAW,
+                    "samples": 1,
+                    "uptime": 1.0 if row.is_online else 0.0,
+                    **{metric: getattr(row, metric) for metric in ROLLUP_METRICS}
+                }
+                for row in result
+            ]
+
+        unit, source = next((u, s) for r, u, _, s, _ in self.tiers if r == resolution)
+        stored = await db.execute(
+            text(
+                f"SELECT bucket, sample_count, online_count, {self._rollup_columns()} "
+                "FROM server_metrics_rollup "
+                "WHERE server_id = :server_id AND resolution = :resolution "
+                "AND bucket >= :start AND bucket < :end"
+            ),
+            {"server_id": server_id, "resolution": resolution, "start": start, "end": end}
+        )
+        rows = [self._rollup_row(row, resolution) for row in stored]
+
+        # Buckets newer than the last rollup run are aggregated on the fly
+        watermark = max((row["timestamp"] for row in rows), default=start)
+        if rows:
+            watermark += timedelta(seconds=next(s for r, _, s, _, _ in self.tiers if r == resolution))
+        tail = await db.execute(
+            text(
+                f"SELECT bucket, sample_count, online_count, {self._rollup_columns()} FROM ("
+                f"{self._aggregate_select(source, unit)} "
+                f"AND server_id = :server_id "
+                f"AND {self._time_column(source)} >= :start AND {self._time_column(source)} < :end "
+                "GROUP BY 1, 3"
+                ") AS tail"
+            ),
+            {
+                "server_id": server_id,
+                "resolution": resolution,
+                "source": source,
+                "start": watermark,
+                "end": end
+            }
+        )
+        rows.extend(self._rollup_row(row, resolution) for row in tail)
+        rows.sort(key=lambda row: row["timestamp"], reverse=True)
+        return rows
+
+    async def get_averages(
+        self,
+        db: AsyncSession,
+        server_id: int,
+        hours: int = 24
+    ) -> Dict[str, Any]:
+        """Sample-weighted averages over the range, from the chosen tier"""
+        rows = await self.get_history(db, server_id, hours)
+        averages = {}
+        for metric in ROLLUP_METRICS:
+            weighted = [(row[metric], row["samples"]) for row in rows if row[metric] is not None]
+            weight = sum(samples for _, samples in weighted)
+            averages[metric] = (
+                sum(value * samples for value, samples in weighted) / weight
+                if weight else None
+            )
+        return averages
+
+    @staticmethod
+    def supports_rollups(db: AsyncSession) -> bool:
+        return db.bind.dialect.name == "postgresql"
+
+    def _aggregate_select(self, source: str, unit: str) -> str:
+        """
+        SELECT aggregating the source tier into buckets of unit. Finer rollups
+        are merged exactly for min/max/avg; p95 becomes the p95 of the finer
+        p95s, a close upper-leaning estimate.
+        """
+        time_column = self._time_column(source)
+        if source == RAW:
+            aggregates = ", ".join(
+                f"min({m}) AS {m}_min, max({m}) AS {m}_max, avg({m}) AS {m}_avg, "
+                f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {m}) AS {m}_p95"
+                for m in ROLLUP_METRICS
+            )
+            return (
+                f"SELECT server_id, :resolution AS resolution, "
+                f"date_trunc('{unit}', {time_column}) AS bucket, "
+                f"count(*) AS sample_count, count(*) FILTER (WHERE is_online) AS online_count, "
+                f"{aggregates} "
+                f"FROM server_metrics WHERE TRUE"
+            )
+
+        aggregates = ", ".join(
+            f"min({m}_min) AS {m}_min, max({m}_max) AS {m}_max, "
+            f"sum({m}_avg * sample_count) / NULLIF(sum(sample_count) FILTER (WHERE {m}_avg IS NOT NULL), 0) AS {m}_avg, "
+            f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {m}_p95) AS {m}_p95"
+            for m in ROLLUP_METRICS
+        )
+        # Callers group by position (GROUP BY 1, 3): a plain "bucket" would
+        # resolve to the source tier's column, not the truncated one
+        return (
+            f"SELECT server_id, :resolution AS resolution, "
+            f"date_trunc('{unit}', {time_column}) AS bucket, "
+            f"sum(sample_count) AS sample_count, sum(online_count) AS online_count, "
+            f"{aggregates} "
+            f"FROM server_metrics_rollup WHERE resolution = :source"
+        )
+
+    @staticmethod
+    def _time_column(source: str) -> str:
+        return "timestamp" if source == RAW else "bucket"
+
+    @staticmethod
+    def _rollup_column_list() -> List[str]:
+        return [f"{m}_{agg}" for m in ROLLUP_METRICS for agg in ("min", "max", "avg", "p95")]
+
+    def _rollup_columns(self) -> str:
+        return ", ".join(self._rollup_column_list())
+
+    @staticmethod
+    def _rollup_row(row: Any, resolution: str) -> Dict[str, Any]:
+        """Rollup row (stored or aggregated on the fly) as a history entry"""
+        values = row._mapping
+        samples = values["sample_count"] or 0
+        entry = {
+            "timestamp": values["bucket"],
+            "resolution": resolution,
+            "samples": samples,
+            "uptime": (values["online_count"] or 0) / samples if samples else 0.0
+        }
+        for metric in ROLLUP_METRICS:
+            entry[metric] = values[f"{metric}_avg"]
+            entry[f"{metric}_min"] = values[f"{metric}_min"]
+            entry[f"{metric}_max"] = values[f"{metric}_max"]
+            entry[f"{metric}_p95"] = values[f"{metric}_p95"]
+        return entry
+
+# Create rollup service instance
+metrics_rollup = MetricsRollupService()
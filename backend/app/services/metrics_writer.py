@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+
+from ..core.config import settings
+from ..db.models.server_metrics import ServerMetrics
+from ..db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Column order used for COPY; every buffered sample carries all of them.
+# Every NOT NULL column without a server default has to be listed here.
+METRICS_COLUMNS = [
+    "server_id",
+    "timestamp",
+    "cpu_usage",
+    "memory_usage",
+    "disk_usage",
+    "bandwidth_in",
+    "bandwidth_out",
+    "active_connections",
+    "load_avg_1m",
+    "load_avg_5m",
+    "load_avg_15m",
+    "response_time",
+    "is_online",
+    "cookie_valid",
+    "login_success",
+    "error_message",
+    "is_active",
+    "is_deleted",
+    "created_at",
+    "updated_at",
+]
+
+SAMPLE_DEFAULTS = {
+    "cpu_usage": 0.0,
+    "memory_usage": 0.0,
+    "disk_usage": 0.0,
+    "bandwidth_in": 0.0,
+    "bandwidth_out": 0.0,
+    "active_connections": 0,
+    "load_avg_1m": 0.0,
+    "load_avg_5m": 0.0,
+    "load_avg_15m": 0.0,
+    "response_time": None,
+    "is_online": True,
+    "cookie_valid": True,
+    "login_success": True,
+    "error_message": None,
+    # BaseModel flags; NOT NULL and only defaulted on the Python side
+    "is_active": True,
+    "is_deleted": False,
+}
+
+class MetricsWriter:
+    """
+    Buffer ServerMetrics samples in memory and write them in batches on one
+    pooled connection: COPY on Postgres, multi-row INSERT elsewhere.
+    The buffer is bounded, so a slow database pushes back on producers
+    instead of piling up writes next to API transactions.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.METRICS_BUFFER_MAX_SIZE,
+        batch_size: int = settings.METRICS_FLUSH_BATCH_SIZE,
+        flush_interval: float = settings.METRICS_FLUSH_INTERVAL,
+        submit_timeout: float = settings.METRICS_SUBMIT_TIMEOUT,
+        max_retries: int = 3
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # seconds a sample may wait
+        self.submit_timeout = submit_timeout  # producers block this long when full
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "failed_batches": 0}
+
+    async def start(self) -> None:
+        """Start the background flusher"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._bind(loop)
+        if self._flusher and not self._flusher.done():
+            return
+        self._flusher = asyncio.create_task(self._run())
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        The queue, lock and flusher belong to the loop that made them, and
+        Celery runs each task on a new one. Start over on the current loop;
+        samples left on a loop that is gone can no longer be written.
+        """
+        if self._queue is not None and not self._queue.empty():
+            self.stats["dropped"] += self._queue.qsize()
+            logger.warning(f"Dropping {self._queue.qsize()} metrics samples left on a closed event loop")
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        self._loop = loop
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still buffered"""
+        if self._loop is not asyncio.get_running_loop():
+            # Nothing was buffered on this loop
+            return
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def submit(self, sample: Dict[str, Any]) -> bool:
+        """
+        Buffer one sample. Waits up to submit_timeout for room when the
+        buffer is full; returns False if the sample had to be dropped.
+        """
+        await self.start()
+        try:
+            await asyncio.wait_for(
+                self._queue.put(self._normalize(sample)),
+                timeout=self.submit_timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            self.stats["dropped"] += 1
+            logger.warning(
+                f"Metrics buffer full ({self.max_size} samples), dropping sample "
+                f"for server {sample.get('server_id')}"
+            )
+            return False
+
+    async def submit_many(self, samples: Iterable[Dict[str, Any]]) -> int:
+        """Buffer several samples; returns how many were accepted"""
+        accepted = 0
+        for sample in samples:
+            if await self.submit(sample):
+                accepted += 1
+        return accepted
+
+    async def flush(self) -> int:
+        """Write everything buffered right now; returns rows written"""
+        if self._queue is None:
+            return 0
+        written = 0
+        while not self._queue.empty():
+            written += await self._write_batch(self._drain(self.batch_size))
+        return written
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _run(self) -> None:
+        """Flush when a batch fills up or the oldest sample hits flush_interval"""
+        while True:
+            batch: List[Dict[str, Any]] = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._write_batch(batch)
+            except asyncio.CancelledError:
+                # Hand samples taken off the queue back for stop() to flush
+                for sample in batch:
+                    try:
+                        self._queue.put_nowait(sample)
+                    except asyncio.QueueFull:
+                        self.stats["dropped"] += 1
+                raise
+            except Exception as e:
+                logger.error(f"Metrics flusher error: {str(e)}")
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Write one batch, retrying with backoff. While this runs producers
+        keep filling the bounded buffer, which is where backpressure comes from.
+        """
+        if not batch:
+            return 0
+        async with self._flush_lock:
+            for attempt in range(self.max_retries):
+                try:
+                    started = time.monotonic()
+                    await self._write(batch)
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                    logger.debug(
+                        f"Wrote {len(batch)} metrics samples in "
+                        f"{(time.monotonic() - started) * 1000:.1f}ms"
+                    )
+                    return len(batch)
+                except Exception as e:
+                    logger.warning(
+                        f"Metrics batch write failed (attempt {attempt + 1}/{self.max_retries}): {str(e)}"
+                    )
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(2 ** attempt)
+
+        self.stats["failed_batches"] += 1
+        self.stats["dropped"] += len(batch)
+        logger.error(f"Dropping {len(batch)} metrics samples after {self.max_retries} failed writes")
+        return 0
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        async with engine.connect() as conn:
+            if engine.dialect.name == "postgresql" and engine.dialect.driver == "asyncpg":
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    ServerMetrics.__tablename__,
+                    records=[tuple(sample[c] for c in METRICS_COLUMNS) for sample in batch],
+                    columns=METRICS_COLUMNS
+                )
+            else:
+                await conn.execute(insert(ServerMetrics.__table__), batch)
+            await conn.commit()
+
+    @staticmethod
+    def _normalize(sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill defaults so every row has the same columns"""
+        row = {**SAMPLE_DEFAULTS, **sample}
+        row.setdefault("timestamp", datetime.utcnow())
+        row.setdefault("created_at", row["timestamp"])
+        row.setdefault("updated_at", row["timestamp"])
+        return {column: row[column] for column in METRICS_COLUMNS}
+
+# Create metrics writer instance
+metrics_writer = MetricsWriter()
@@ -6,6 +6,7 @@ from telegram import Bot, ParseMode
 import json
 
 from ..core.config import settings
+from ..core.monitoring.prometheus import TELEGRAM_MESSAGES, TELEGRAM_SEND_SECONDS
 from ..db.models.user import User, UserRole
 from ..db.models.subscription import Subscription, SubscriptionStatus
 from ..db.models.payment import Payment, PaymentStatus
@@ -35,15 +36,18 @@ class NotificationService:
         
         for attempt in range(max_retries):
             try:
-                await self.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode=parse_mode,
-                    reply_markup=reply_markup
-                )
+                with TELEGRAM_SEND_SECONDS.labels(sender="notifications").time():
+                    await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=text,
+                        parse_mode=parse_mode,
+                        reply_markup=reply_markup
+                    )
+                TELEGRAM_MESSAGES.labels(sender="notifications", result="sent").inc()
                 return True
             except Exception as e:
                 if attempt == max_retries - 1:
+                    TELEGRAM_MESSAGES.labels(sender="notifications", result="failed").inc()
                     logger.error(f"Failed to send message to {chat_id}: {str(e)}")
                     return False
                 await asyncio.sleep(retry_delay)
@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.monitoring.anomaly import AnomalyTransition, ServerAnomalies, anomaly_detector
+from ..core.monitoring.metrics_snapshot import MetricsSnapshot, metrics_snapshots
+from ..core.monitoring.prometheus import FLEET_SYNC_SECONDS, FLEET_SYNC_SERVERS
+from ..db.models.server import Server, ServerStatus, ServerSyncStatus
+from .metrics_writer import metrics_writer
+from .notification import NotificationService
+from .xui_service import XUIService
+
+logger = logging.getLogger(__name__)
+
+# Smoothed levels past which an anomalous server goes to maintenance
+CRITICAL_LEVELS = {
+    "cpu_usage": 90.0,
+    "memory_usage": 90.0,
+    "disk_usage": 95.0,
+    "load": 10.0,
+}
+
+class FleetSyncEngine:
+    """Sync all servers with their 3x-ui panels concurrently"""
+
+    def __init__(
+        self,
+        concurrency: int = settings.SERVER_SYNC_CONCURRENCY,
+        server_timeout: float = settings.SERVER_SYNC_TIMEOUT
+    ):
+        self.concurrency = concurrency
+        self.server_timeout = server_timeout  # per-server deadline in seconds
+        # Cookies are refreshed this long before expiry; still being inside
+        # the window at sync time means the refresh logins are failing
+        self.cookie_warning_seconds = settings.PANEL_SESSION_REFRESH_MARGIN
+
+    async def sync_servers(
+        self,
+        servers: List[Server],
+        db: AsyncSession,
+        notify: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Sync servers with bounded concurrency and per-server deadlines.
+        Panel I/O runs in parallel; all DB writes are applied afterwards
+        and committed once.
+        """
+        started = time.monotonic()
+        results = {
+            "success": [],
+            "failed": [],
+            "timed_out": []
+        }
+        if not servers:
+            results["duration"] = 0.0
+            return results
+
+        now = datetime.utcnow()
+        for server in servers:
+            server.sync_status = ServerSyncStatus.IN_PROGRESS
+            server.last_sync = now
+        await db.commit()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes = await asyncio.gather(
+            *(self._sync_with_deadline(server, semaphore) for server in servers)
+        )
+
+        snapshots = [
+            self._build_snapshot(server, outcome)
+            for server, outcome in zip(servers, outcomes)
+        ]
+        # Status and alerts follow the detector, not single raw samples
+        transitions = await anomaly_detector.observe_many(snapshots)
+
+        notifications = []
+        samples = []
+        for server, outcome in zip(servers, outcomes):
+            notifications.extend(self._apply_outcome(server, outcome, results, samples))
+        notifications.extend(self._anomaly_alerts(servers, transitions))
+
+        try:
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Error committing fleet sync results: {str(e)}")
+            await db.rollback()
+            raise
+
+        # Placement reads these instead of calling the panels
+        await metrics_snapshots.update_many(snapshots)
+        # History rows go through the buffered writer, off this transaction
+        await metrics_writer.submit_many(samples)
+
+        if notify and notifications:
+            await asyncio.gather(*notifications, return_exceptions=True)
+        else:
+            for notification in notifications:
+                notification.close()
+
+        results["duration"] = time.monotonic() - started
+        FLEET_SYNC_SECONDS.observe(results["duration"])
+        for result in ("success", "failed", "timed_out"):
+            FLEET_SYNC_SERVERS.labels(result=result).inc(len(results[result]))
+        logger.info(
+            f"Fleet sync finished in {results['duration']:.2f}s: "
+            f"{len(results['success'])} ok, {len(results['failed'])} failed, "
+            f"{len(results['timed_out'])} timed out"
+        )
+        return results
+
+    async def _sync_with_deadline(
+        self,
+        server: Server,
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Fetch panel data for one server under the shared semaphore"""
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                data = await asyncio.wait_for(
+                    self._fetch_server(server),
+                    timeout=self.server_timeout
+                )
+                data["elapsed"] = time.monotonic() - started
+                return data
+            except asyncio.TimeoutError:
+                return {
+                    "ok": False,
+                    "timed_out": True,
+                    "is_online": False,
+                    "error": f"Sync exceeded {self.server_timeout}s deadline",
+                    "elapsed": time.monotonic() - started
+                }
+            except aiohttp.ClientError as e:
+                return {
+                    "ok": False,
+                    "timed_out": False,
+                    "is_online": False,
+                    "error": f"Network error: {str(e)}",
+                    "elapsed": time.monotonic() - started
+                }
+            except Exception as e:
+                return {
+                    "ok": False,
+                    "timed_out": False,
+                    "is_online": True,
+                    "error": str(e),
+                    "elapsed": time.monotonic() - started
+                }
+
+    async def _fetch_server(self, server: Server) -> Dict[str, Any]:
+        """Fetch stats and active users for a server without touching the DB"""
+        xui = XUIService(server)
+        stats = await xui.get_server_stats()
+        active_users = await xui._get_active_users_count()
+        # Served from the snapshot the active user count just fetched
+        inbounds = await xui.get_inbound_snapshot()
+        return {
+            "ok": True,
+            "stats": stats,
+            "active_users": active_users,
+            "total_clients": inbounds.total_clients
+        }
+
+    def _apply_outcome(
+        self,
+        server: Server,
+        outcome: Dict[str, Any],
+        results: Dict[str, Any],
+        samples: List[Dict[str, Any]]
+    ) -> List:
+        """
+        Apply a fetch outcome to the server row, collect its metrics sample
+        and return pending notifications
+        """
+        notification_service = NotificationService()
+        notifications = []
+
+        if not outcome["ok"]:
+            error_msg = outcome["error"]
+            logger.error(f"Error syncing server {server.id}: {error_msg}")
+
+            server.sync_status = ServerSyncStatus.FAILED
+            server.sync_error = error_msg
+            if not outcome["is_online"]:
+                samples.append(self._build_metrics(server, None, is_online=False, error=error_msg))
+
+            entry = {
+                "server_id": server.id,
+                "error": error_msg,
+                "elapsed": outcome["elapsed"]
+            }
+            results["timed_out" if outcome["timed_out"] else "failed"].append(entry)
+
+            notifications.append(notification_service.send_system_alert(
+                "server_sync_failed",
+                {
+                    "server_id": server.id,
+                    "server_name": server.name,
+                    "error": error_msg,
+                    "failed_login_attempts": server.failed_login_attempts,
+                    "last_failed_login": server.last_failed_login.isoformat() if server.last_failed_login else None
+                }
+            ))
+            return notifications
+
+        stats = outcome["stats"]
+        new_status = self._status_from_anomalies(anomaly_detector.get(server.id))
+
+        # Notify if status changed
+        if server.status != new_status:
+            notifications.append(notification_service.notify_server_status(
+                server.id,
+                new_status,
+                stats
+            ))
+            server.status = new_status
+
+        server.current_users = outcome["active_users"]
+        server.bandwidth_used = (
+            stats["network_in"] + stats["network_out"]
+        ) / (1024 * 1024 * 1024)  # Convert to GB
+
+        # Check cookie expiration
+        if (
+            server.xui_cookie_expiry and
+            (server.xui_cookie_expiry - datetime.utcnow()).total_seconds() < self.cookie_warning_seconds
+        ):
+            notifications.append(notification_service.send_system_alert(
+                "cookie_expiring_soon",
+                {
+                    "server_id": server.id,
+                    "server_name": server.name,
+                    "expiry_time": server.xui_cookie_expiry.isoformat()
+                }
+            ))
+
+        server.sync_status = ServerSyncStatus.SUCCESS
+        server.sync_error = None
+        samples.append(self._build_metrics(server, stats))
+
+        results["success"].append({
+            "server_id": server.id,
+            "stats": stats,
+            "status": server.status,
+            "elapsed": outcome["elapsed"]
+        })
+        return notifications
+
+    @staticmethod
+    def _status_from_anomalies(anomalies: Optional[ServerAnomalies]) -> ServerStatus:
+        """Derive server status from the anomaly detector's smoothed metrics"""
+        active = anomalies.active() if anomalies else {}
+        if not active:
+            return ServerStatus.ACTIVE
+        if any(
+            state.level > CRITICAL_LEVELS[metric]
+            for metric, state in active.items()
+            if metric in CRITICAL_LEVELS
+        ):
+            return ServerStatus.MAINTENANCE
+        return ServerStatus.HIGH_LOAD
+
+    @staticmethod
+    def _anomaly_alerts(
+        servers: List[Server],
+        transitions: List[AnomalyTransition]
+    ) -> List:
+        """One admin alert per metric entering or leaving the anomalous state"""
+        if not transitions:
+            return []
+        notification_service = NotificationService()
+        names = {server.id: server.name for server in servers}
+        return [
+            notification_service.send_system_alert(
+                "server_metric_anomaly" if t.anomalous else "server_metric_recovered",
+                {
+                    "server_id": t.server_id,
+                    "server_name": names.get(t.server_id),
+                    "metric": t.metric,
+                    "value": round(t.value, 2),
+                    "level": round(t.level, 2),
+                    "baseline": round(t.baseline, 2),
+                    "zscore": round(t.zscore, 2),
+                    "reason": t.reason
+                }
+            )
+            for t in transitions
+        ]
+
+    @staticmethod
+    def _build_snapshot(server: Server, outcome: Dict[str, Any]) -> MetricsSnapshot:
+        """Build the in-memory placement snapshot from a fetch outcome"""
+        if not outcome["ok"]:
+            return MetricsSnapshot(
+                server_id=server.id,
+                is_online=False,
+                updated_at=time.time()
+            )
+
+        stats = outcome["stats"]
+        load_avg = stats.get("load_avg") or [0, 0, 0]
+        return MetricsSnapshot(
+            server_id=server.id,
+            cpu_usage=stats.get("cpu_usage", 0),
+            memory_usage=stats.get("memory_usage", 0),
+            disk_usage=stats.get("disk_usage", 0),
+            load=load_avg[0],
+            network_in=stats.get("network_in", 0),
+            network_out=stats.get("network_out", 0),
+            total_clients=outcome.get("total_clients", 0),
+            active_users=outcome.get("active_users", 0),
+            response_time=stats.get("response_time"),
+            is_online=True,
+            updated_at=time.time()
+        )
+
+    @staticmethod
+    def _build_metrics(
+        server: Server,
+        stats: Optional[Dict[str, Any]],
+        is_online: bool = True,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build a ServerMetrics sample from synced stats"""
+        stats = stats or {}
+        load_avg = stats.get("load_avg") or [0, 0, 0]
+        return {
+            "server_id": server.id,
+            "cpu_usage": stats.get("cpu_usage", 0),
+            "memory_usage": stats.get("memory_usage", 0),
+            "disk_usage": stats.get("disk_usage", 0),
+            "bandwidth_in": stats.get("network_in", 0) / (1024 * 1024 * 1024),  # Convert to GB
+            "bandwidth_out": stats.get("network_out", 0) / (1024 * 1024 * 1024),  # Convert to GB
+            "active_connections": stats.get("active_connections", 0),
+            "load_avg_1m": load_avg[0],
+            "load_avg_5m": load_avg[1],
+            "load_avg_15m": load_avg[2],
+            "response_time": stats.get("response_time"),
+            "is_online": is_online,
+            "error_message": error
+        }
+
+# Create sync engine instance
+sync_engine = FleetSyncEngine()
@@ -1,15 +1,29 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import aiohttp
 import json
 import logging
 import uuid
-import random
 import asyncio
+import time
 from datetime import datetime, timedelta
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import settings
+from ..core.server_connector.http_client import panel_http
+from ..core.server_connector.session_store import panel_sessions
+from ..core.server_connector.inbound_cache import InboundSnapshot, inbound_cache
+from ..core.server_connector.port_allocator import port_allocator
+from ..core.server_connector.circuit_breaker import CircuitOpenError, panel_breakers
 from ..db.models.subscription import Subscription, SubscriptionStatus
-from ..db.models.server import Server, ServerStatus
+from ..db.models.server import (
+    Server,
+    PanelInfo,
+    SystemStatus,
+    InboundConfig,
+    TrafficStats,
+    PanelSettings
+)
+from .notification import NotificationService
 
 logger = logging.getLogger(__name__)
 
@@ -22,31 +36,52 @@ class XUIService:
         self.username = server.xui_username
         self.password = server.xui_password
         self.port_range = (10000, 60000)  # Configurable port range
-        self.retry_attempts = 5  # Increased as per requirement
-        self.retry_delay = 5  # seconds
+        self.retry_attempts = settings.PANEL_REQUEST_RETRIES
         self.cookie_check_interval = 1800  # 30 minutes in seconds
         self.notification_service = NotificationService()
+        self.snapshot_key = f"xui:{self.base_url}"
+        self.session_key = panel_sessions.session_key(
+            self.base_url,
+            self.username,
+            self.password
+        )
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        """Get authenticated aiohttp session with cookie management"""
-        session = aiohttp.ClientSession()
+        """Get pooled aiohttp session for the panel, logging in if needed"""
+        session = await panel_http.get_session(self.base_url)
         
-        # Check if we have a valid session cookie
-        if (self.server.xui_session_cookie and 
-            self.server.xui_cookie_expiry and 
-            self.server.xui_cookie_expiry > datetime.utcnow()):
-            
-            # Set the cookie in session
-            session.cookie_jar.update_cookies({
-                'session': self.server.xui_session_cookie
-            })
-            return session
-            
-        # No valid cookie, try to login
+        # Cookie is shared with every worker; only one of them logs in
+        cookie = await panel_sessions.get_cookie(
+            self.session_key,
+            lambda: self._login_with_retries(session)
+        )
+        if cookie != self.server.xui_session_cookie:
+            self.server.xui_session_cookie = cookie
+            self.server.xui_cookie_expiry = datetime.utcnow() + timedelta(
+                seconds=panel_sessions.session_ttl
+            )
+        return session
+    
+    async def _login_with_retries(self, session: aiohttp.ClientSession) -> str:
+        """Login with retries and alert admins when the panel keeps refusing"""
+        breaker = panel_breakers.get(self.base_url)
         for attempt in range(self.retry_attempts):
             try:
-                await self._login(session)
-                return session
+                probing = breaker.before_request()
+                started = time.monotonic()
+                try:
+                    cookie = await self._login(session)
+                    breaker.record_success(time.monotonic() - started)
+                    return cookie
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    breaker.record_failure(str(e) or type(e).__name__, time.monotonic() - started)
+                    raise
+                finally:
+                    # No outcome recorded (cancelled, other error): free the probe slot
+                    if probing:
+                        breaker.abandon_probe()
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 self.server.failed_login_attempts += 1
                 self.server.last_failed_login = datetime.utcnow()
@@ -65,11 +100,16 @@ class XUIService:
                     raise
                     
                 logger.warning(f"Login retry {attempt + 1} after error: {str(e)}")
-                await asyncio.sleep(self.retry_delay)
-                
-        return session
+                await asyncio.sleep(breaker.backoff(attempt))
     
-    async def _login(self, session: aiohttp.ClientSession) -> None:
+    def _auth_headers(self) -> Dict[str, str]:
+        """Build request headers carrying the panel session cookie"""
+        headers = {"Content-Type": "application/json"}
+        if self.server.xui_session_cookie:
+            headers["Cookie"] = f"session={self.server.xui_session_cookie}"
+        return headers
+    
+    async def _login(self, session: aiohttp.ClientSession) -> str:
         """Login to 3x-ui panel and manage session cookies"""
         try:
             login_data = {
@@ -79,7 +119,9 @@ class XUIService:
             async with session.post(
                 f"{self.base_url}/login",
                 json=login_data,
-                timeout=30
+                timeout=aiohttp.ClientTimeout(
+                    total=panel_breakers.get(self.base_url).timeout(30)
+                )
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
@@ -95,15 +137,14 @@ class XUIService:
                 
                 # Update server with new cookie and reset failed attempts
                 self.server.xui_session_cookie = session_cookie.value
-                self.server.xui_cookie_expiry = datetime.utcnow() + timedelta(days=30)
+                self.server.xui_cookie_expiry = datetime.utcnow() + timedelta(
+                    seconds=panel_sessions.session_ttl
+                )
                 self.server.failed_login_attempts = 0
                 self.server.last_failed_login = None
                 await self.server.save()
                 
-                # Set cookie in session
-                session.cookie_jar.update_cookies({
-                    'session': session_cookie.value
-                })
+                return session_cookie.value
                 
         except aiohttp.ClientError as e:
             logger.error(f"Network error during XUI login: {str(e)}")
@@ -119,57 +160,87 @@ class XUIService:
         data: Optional[Dict] = None,
         timeout: int = 30
     ) -> Dict:
-        """Make authenticated request with cookie management"""
+        """Make authenticated request behind the panel's circuit breaker"""
+        breaker = panel_breakers.get(self.base_url)
+        probing = False
         try:
-            async with await self._get_session() as session:
-                headers = {"Content-Type": "application/json"}
-                
-                for attempt in range(self.retry_attempts):
-                    try:
-                        if method.upper() == "GET":
-                            async with session.get(
-                                f"{self.base_url}/{endpoint}",
-                                headers=headers,
-                                timeout=timeout
-                            ) as response:
-                                return await self._handle_response(response)
-                        else:
-                            async with session.post(
-                                f"{self.base_url}/{endpoint}",
-                                headers=headers,
-                                json=data,
-                                timeout=timeout
-                            ) as response:
-                                return await self._handle_response(response)
-                                
-                    except aiohttp.ClientResponseError as e:
-                        if e.status == 401:
-                            # Session expired, clear cookie and try login again
-                            self.server.xui_session_cookie = None
-                            self.server.xui_cookie_expiry = None
-                            await self.server.save()
-                            
-                            # Get new session with fresh login
-                            session = await self._get_session()
-                            continue
-                            
-                        raise
-                        
-                    except Exception as e:
-                        if attempt == self.retry_attempts - 1:
-                            raise
-                        logger.warning(f"Request retry {attempt + 1} after error: {str(e)}")
-                        await asyncio.sleep(self.retry_delay)
+            # Login goes through the breaker on its own
+            session = await self._get_session()
+            probing = breaker.before_request()
+            reauthenticated = False
+            attempt = 0
+            
+            while True:
+                started = time.monotonic()
+                try:
+                    async with session.request(
+                        method.upper(),
+                        f"{self.base_url}/{endpoint}",
+                        headers=self._auth_headers(),
+                        json=data if method.upper() != "GET" else None,
+                        timeout=aiohttp.ClientTimeout(total=breaker.timeout(timeout))
+                    ) as response:
+                        result = await self._handle_response(response)
+                    breaker.record_success(time.monotonic() - started)
+                    return result
+                    
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 401 and not reauthenticated:
+                        # Panel is reachable, only the cookie is stale
+                        breaker.record_success(time.monotonic() - started)
+                        await panel_sessions.invalidate(
+                            self.session_key,
+                            self.server.xui_session_cookie
+                        )
+                        self.server.xui_session_cookie = None
+                        self.server.xui_cookie_expiry = None
+                        await self.server.save()
                         
+                        # Get new session with fresh login
+                        session = await self._get_session()
+                        reauthenticated = True
+                        continue
+                    if e.status < 500:
+                        breaker.record_success(time.monotonic() - started)
+                        raise
+                    breaker.record_failure(str(e), time.monotonic() - started)
+                    error = e
+                    
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    breaker.record_failure(str(e) or type(e).__name__, time.monotonic() - started)
+                    error = e
+                    
+                except Exception:
+                    # Panel answered with an application error
+                    breaker.record_success(time.monotonic() - started)
+                    raise
+                
+                attempt += 1
+                if attempt >= self.retry_attempts or breaker.is_open:
+                    raise error
+                delay = breaker.backoff(attempt - 1)
+                logger.warning(f"Request retry {attempt} in {delay:.2f}s after error: {str(error)}")
+                await asyncio.sleep(delay)
+                probing = breaker.before_request() or probing
+                    
         except Exception as e:
             logger.error(f"XUI request error: {str(e)}")
             raise
+        finally:
+            # Cancelled or failed outside the recorded paths: free the probe slot
+            if probing:
+                breaker.abandon_probe()
     
     async def _handle_response(self, response: aiohttp.ClientResponse) -> Dict:
         """Handle API response with proper error handling"""
         if response.status == 401:
-            self.session_token = None  # Reset token for re-authentication
-            raise Exception("Authentication failed")
+            # Surface as ClientResponseError so _make_request re-authenticates
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=401,
+                message="Authentication failed"
+            )
             
         try:
             data = await response.json()
@@ -184,6 +255,8 @@ class XUIService:
     
     async def create_client(self, subscription: Subscription) -> Dict:
         """Create new client in 3x-ui panel with optimized configuration"""
+        port = None
+        created = False
         try:
             port = await self._generate_unique_port()
             uuid_str = str(uuid.uuid4())
@@ -221,55 +294,73 @@ class XUIService:
                 }
             }
             
-            response = await self._make_request(
+            await self._make_request(
                 "POST",
                 "inbounds",
                 data=client_data
             )
-            
-            if response.get("success"):
-                config = self._generate_config(
-                    uuid_str,
-                    port,
-                    subscription.user_id
-                )
-                return {
-                    "client_id": uuid_str,
-                    "config": config
-                }
-            else:
-                raise Exception(f"Failed to create client: {response.get('msg')}")
+            # _make_request raises unless the panel reported success
+            created = True
+            inbound_cache.invalidate(self.snapshot_key)
+            port_allocator.confirm(self.snapshot_key, port)
+            config = self._generate_config(
+                uuid_str,
+                port,
+                subscription.user_id
+            )
+            return {
+                "client_id": uuid_str,
+                "config": config
+            }
                 
         except Exception as e:
             logger.error(f"Error creating XUI client: {str(e)}")
             raise
+        finally:
+            if port is not None and not created:
+                # Rejected, failed or cancelled: hand the port and its
+                # reservation back instead of waiting for the TTL
+                inbound_cache.invalidate(self.snapshot_key)
+                await port_allocator.release(self.snapshot_key, port)
     
     async def _generate_unique_port(self) -> int:
-        """Generate unique port number with collision checking"""
+        """Allocate a unique port from the per-server index"""
         try:
-            existing_ports = await self._get_used_ports()
-            while True:
-                port = random.randint(
-                    self.port_range[0],
-                    self.port_range[1]
-                )
-                if port not in existing_ports:
-                    return port
+            return await port_allocator.allocate(
+                self.snapshot_key,
+                self.port_range,
+                self._load_used_ports
+            )
         except Exception as e:
             logger.error(f"Error generating port: {str(e)}")
             raise
     
-    async def _get_used_ports(self) -> List[int]:
-        """Get list of ports currently in use"""
+    async def _load_used_ports(self) -> Set[int]:
+        """Used ports for seeding the allocator; errors propagate so the
+        index is never seeded from an empty list by mistake"""
+        snapshot = await self.get_inbound_snapshot()
+        return snapshot.ports
+    
+    async def _get_used_ports(self) -> Set[int]:
+        """Get set of ports currently in use"""
         try:
-            response = await self._make_request("GET", "inbounds")
-            return [
-                client["port"]
-                for client in response.get("data", [])
-                if "port" in client
-            ]
+            snapshot = await self.get_inbound_snapshot()
+            return snapshot.ports
         except Exception:
-            return []
+            return set()
+    
+    async def get_inbound_snapshot(self, max_age: Optional[float] = None) -> InboundSnapshot:
+        """Get inbound list shared by every consumer within the snapshot TTL"""
+        return await inbound_cache.get(
+            self.snapshot_key,
+            self._fetch_inbounds,
+            max_age=max_age
+        )
+    
+    async def _fetch_inbounds(self) -> List[Dict]:
+        """Fetch raw inbound list from the panel"""
+        response = await self._make_request("GET", "inbounds")
+        return response.get("data") or []
     
     def _generate_config(
         self,
@@ -316,6 +407,7 @@ class XUIService:
                 f"inbounds/client/{client_id}",
                 data=client_data
             )
+            inbound_cache.invalidate(self.snapshot_key)
             
             if response.get("success"):
                 return {
@@ -332,11 +424,26 @@ class XUIService:
     async def delete_client(self, client_id: str) -> bool:
         """Delete client from 3x-ui panel"""
         try:
+            # Look up the client's port before it disappears from the panel
+            port = None
+            try:
+                snapshot = await self.get_inbound_snapshot()
+                found = snapshot.find_client_by_id(client_id)
+                if found:
+                    port = found[0].get("port")
+            except Exception as e:
+                logger.warning(f"Could not resolve port for client {client_id}: {str(e)}")
+            
             response = await self._make_request(
                 "DELETE",
                 f"inbounds/client/{client_id}"
             )
-            return response.get("success", False)
+            inbound_cache.invalidate(self.snapshot_key)
+            
+            success = response.get("success", False)
+            if success and port:
+                await port_allocator.release(self.snapshot_key, int(port))
+            return success
         except Exception as e:
             logger.error(f"Error deleting XUI client: {str(e)}")
             raise
@@ -415,27 +522,25 @@ class XUIService:
     async def list_inbounds(self) -> List[InboundConfig]:
         """Get all inbound configurations"""
         try:
-            response = await self._make_request("GET", "inbounds")
-            if response.get("success"):
-                return [
-                    InboundConfig(
-                        id=inbound["id"],
-                        tag=inbound["tag"],
-                        protocol=inbound["protocol"],
-                        port=inbound["port"],
-                        settings=inbound["settings"],
-                        stream_settings=inbound["streamSettings"],
-                        sniffing=inbound["sniffing"],
-                        remark=inbound["remark"],
-                        enable=inbound["enable"],
-                        up=inbound["up"],
-                        down=inbound["down"],
-                        total=inbound["total"],
-                        expiry_time=inbound.get("expiryTime")
-                    )
-                    for inbound in response["data"]
-                ]
-            raise Exception(f"Failed to list inbounds: {response.get('msg')}")
+            snapshot = await self.get_inbound_snapshot()
+            return [
+                InboundConfig(
+                    id=inbound["id"],
+                    tag=inbound["tag"],
+                    protocol=inbound["protocol"],
+                    port=inbound["port"],
+                    settings=inbound["settings"],
+                    stream_settings=inbound["streamSettings"],
+                    sniffing=inbound["sniffing"],
+                    remark=inbound["remark"],
+                    enable=inbound["enable"],
+                    up=inbound["up"],
+                    down=inbound["down"],
+                    total=inbound["total"],
+                    expiry_time=inbound.get("expiryTime")
+                )
+                for inbound in snapshot.inbounds
+            ]
         except Exception as e:
             logger.error(f"Error listing inbounds: {str(e)}")
             raise
@@ -483,6 +588,7 @@ class XUIService:
                 "panel/restore",
                 data=backup_data
             )
+            inbound_cache.invalidate(self.snapshot_key)
             return response.get("success", False)
         except Exception as e:
             logger.error(f"Error restoring config: {str(e)}")
@@ -501,7 +607,7 @@ class XUIService:
             logger.error(f"Error updating panel settings: {str(e)}")
             raise
 
-    async def get_server_stats(self, db: Session = None) -> Dict:
+    async def get_server_stats(self, db: Optional[AsyncSession] = None) -> Dict:
         """Get server statistics with enhanced metrics and monitoring"""
         start_time = time.time()
         is_online = True
@@ -587,117 +693,20 @@ class XUIService:
                     logger.error(f"Error recording failure metrics: {str(e)}")
     
     @staticmethod
-    async def sync_all_servers(servers: List[Server], db: Session) -> Dict:
+    async def sync_all_servers(servers: List[Server], db: AsyncSession) -> Dict:
         """Sync all servers with their respective 3x-ui panels and record metrics"""
-        results = {
-            "success": [],
-            "failed": []
-        }
-        
-        notification_service = NotificationService()
+        from .sync_service import sync_engine
         
-        for server in servers:
-            try:
-                # Update sync status
-                server.sync_status = ServerSyncStatus.IN_PROGRESS
-                server.last_sync = datetime.utcnow()
-                await db.commit()
-                
-                xui = XUIService(server)
-                stats = await xui.get_server_stats(db=db)  # Pass db to record metrics
-                
-                # Update server status based on comprehensive metrics
-                if (
-                    stats["cpu_usage"] > 90 or
-                    stats["memory_usage"] > 90 or
-                    stats["disk_usage"] > 95 or
-                    any(load > 10 for load in stats["load_avg"])
-                ):
-                    new_status = ServerStatus.MAINTENANCE
-                elif (
-                    stats["cpu_usage"] > 75 or
-                    stats["memory_usage"] > 80
-                ):
-                    new_status = ServerStatus.HIGH_LOAD
-                else:
-                    new_status = ServerStatus.ACTIVE
-                
-                # Notify if status changed
-                if server.status != new_status:
-                    await notification_service.notify_server_status(
-                        server.id,
-                        new_status,
-                        stats
-                    )
-                    server.status = new_status
-                
-                server.current_users = await xui._get_active_users_count()
-                server.bandwidth_used = (
-                    stats["network_in"] + stats["network_out"]
-                ) / (1024 * 1024 * 1024)  # Convert to GB
-                
-                # Check cookie expiration
-                if (
-                    server.xui_cookie_expiry and
-                    (server.xui_cookie_expiry - datetime.utcnow()).total_seconds() < 86400  # 24 hours
-                ):
-                    await notification_service.send_system_alert(
-                        "cookie_expiring_soon",
-                        {
-                            "server_id": server.id,
-                            "server_name": server.name,
-                            "expiry_time": server.xui_cookie_expiry.isoformat()
-                        }
-                    )
-                
-                # Update sync status
-                server.sync_status = ServerSyncStatus.SUCCESS
-                server.sync_error = None
-                
-                results["success"].append({
-                    "server_id": server.id,
-                    "stats": stats,
-                    "status": server.status
-                })
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error syncing server {server.id}: {error_msg}")
-                
-                server.sync_status = ServerSyncStatus.FAILED
-                server.sync_error = error_msg
-                
-                results["failed"].append({
-                    "server_id": server.id,
-                    "error": error_msg
-                })
-                
-                await notification_service.send_system_alert(
-                    "server_sync_failed",
-                    {
-                        "server_id": server.id,
-                        "server_name": server.name,
-                        "error": error_msg,
-                        "failed_login_attempts": server.failed_login_attempts,
-                        "last_failed_login": server.last_failed_login.isoformat() if server.last_failed_login else None
-                    }
-                )
-            
-            finally:
-                await db.commit()
-        
-        return results
+        return await sync_engine.sync_servers(servers, db)
     
     async def _get_active_users_count(self) -> int:
         """Get count of active users on the server"""
         try:
-            response = await self._make_request("GET", "inbounds")
-            if response.get("success"):
-                return len([
-                    client for client in response["data"]
-                    if client.get("enable", False) and 
-                    datetime.fromtimestamp(client.get("expiryTime", 0)) > datetime.utcnow()
-                ])
-            return 0
+            snapshot = await self.get_inbound_snapshot()
+            return len([
+                client for client in snapshot.inbounds
+                if client.get("enable", False) and 
+                datetime.fromtimestamp(client.get("expiryTime", 0)) > datetime.utcnow()
+            ])
         except Exception:
             return 0
@@ -1,11 +1,25 @@
+import asyncio
+import logging
 from celery import Celery
 from celery.schedules import crontab
-from sqlalchemy.orm import Session
+from celery.signals import task_postrun, task_prerun
+from sqlalchemy import select
 
 from ..core.config import settings
-from ..db.session import SessionLocal
+from ..db.session import SessionLocal, async_redis_client, engine
 from ..services.backup import backup_service
 from ..services.activity_logger import ActivityLogger
+from ..services.sync_service import sync_engine
+from ..db.models.server import Server
+from ..db.models.backup import BackupMetadata
+from ..models.server import Server as PanelServer
+from ..core.monitoring.probes import prober
+from ..core.monitoring.query_profiler import query_profiler
+from ..core.server_connector.http_client import panel_http
+from ..services.metrics_rollup import metrics_rollup
+from ..services.metrics_writer import metrics_writer
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "tasks",
@@ -22,8 +36,26 @@ celery_app.conf.update(
 )
 
 # Configure periodic tasks
+celery_app.conf.beat_schedule = {
+    "sync-servers": {
+        "task": "app.tasks.celery.sync_servers",
+        "schedule": settings.SERVER_SYNC_INTERVAL,
+        "options": {"expires": settings.SERVER_SYNC_INTERVAL},  # Drop stale runs
+    },
+    "probe-servers": {
+        "task": "app.tasks.celery.probe_servers",
+        "schedule": settings.PROBE_INTERVAL,
+        "options": {"expires": settings.PROBE_INTERVAL},
+    },
+    "rollup-metrics": {
+        "task": "app.tasks.celery.rollup_metrics",
+        "schedule": settings.METRICS_ROLLUP_INTERVAL,
+        "options": {"expires": settings.METRICS_ROLLUP_INTERVAL},
+    }
+}
+
 if settings.BACKUP_SCHEDULE_ENABLED:
-    celery_app.conf.beat_schedule = {
+    celery_app.conf.beat_schedule.update({
         "automated-backup": {
             "task": "app.tasks.celery.create_automated_backup",
             "schedule": crontab.from_string(settings.BACKUP_SCHEDULE_CRON),
@@ -32,7 +64,112 @@ if settings.BACKUP_SCHEDULE_ENABLED:
             "task": "app.tasks.celery.cleanup_old_backups",
             "schedule": crontab(hour=1, minute=0),  # Run daily at 1 AM
         }
-    }
+    })
+
+def run_async(coro):
+    """
+    Run an async task body on a fresh event loop. Pooled DB, Redis and
+    panel connections and the metrics buffer are bound to the loop they
+    were made on, so they are flushed and closed before the loop goes away.
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            try:
+                await metrics_writer.stop()
+            finally:
+                await engine.dispose()
+                await async_redis_client.connection_pool.disconnect()
+                await panel_http.close()
+    return asyncio.run(runner())
+
+# Profile the SQL each task runs, like requests in the API
+query_profiler.instrument(engine)
+_task_profiles = {}
+
+@task_prerun.connect
+def start_query_profile(task_id=None, task=None, **kwargs):
+    if query_profiler.enabled:
+        _task_profiles[task_id] = query_profiler.start("task", task.name)
+
+@task_postrun.connect
+def finish_query_profile(task_id=None, task=None, **kwargs):
+    started = _task_profiles.pop(task_id, None)
+    if started:
+        profile, token = started
+        query_profiler.publish_sync(query_profiler.finish(profile, token))
+        logger.info(
+            f"Task {task.name} ran {profile.count} queries "
+            f"in {profile.total_time * 1000:.1f}ms"
+        )
+
+@celery_app.task(bind=True)
+def sync_servers(self):
+    """Sync all active servers with their 3x-ui panels"""
+    # Celery does not await coroutines; run the sync on a loop of its own
+    return run_async(_sync_servers())
+
+async def _sync_servers():
+    db = SessionLocal()
+    try:
+        servers = (await db.execute(
+            select(Server).where(Server.is_active == True)
+        )).scalars().all()
+        results = await sync_engine.sync_servers(servers, db)
+        
+        return {
+            "status": "success",
+            "synced": len(results["success"]),
+            "failed": len(results["failed"]),
+            "timed_out": len(results["timed_out"]),
+            "duration": results["duration"]
+        }
+        
+    finally:
+        await db.close()
+
+@celery_app.task(bind=True)
+def probe_servers(self):
+    """Run lightweight liveness probes against all active server panels"""
+    return run_async(_probe_servers())
+
+async def _probe_servers():
+    db = SessionLocal()
+    try:
+        rows = (await db.execute(
+            select(PanelServer.id, PanelServer.url).where(PanelServer.is_active == True)
+        )).all()
+        results = await prober.probe_many((row.id, str(row.url)) for row in rows)
+        
+        return {
+            "status": "success",
+            "alive": sum(1 for result in results if result.alive),
+            "dead": [result.server_id for result in results if not result.alive]
+        }
+        
+    finally:
+        await db.close()
+
+@celery_app.task(bind=True)
+def rollup_metrics(self):
+    """Roll raw server metrics up into 1m/1h/1d tiers and apply retention"""
+    return run_async(_rollup_metrics())
+
+async def _rollup_metrics():
+    db = SessionLocal()
+    try:
+        rolled_up = await metrics_rollup.rollup(db)
+        deleted = await metrics_rollup.enforce_retention(db)
+        
+        return {
+            "status": "success",
+            "rolled_up": rolled_up,
+            "deleted": deleted
+        }
+        
+    finally:
+        await db.close()
 
 @celery_app.task(bind=True, max_retries=3)
 async def create_automated_backup(self):
@@ -64,7 +201,7 @@ async def create_automated_backup(self):
             raise
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         # Retry on failure
@@ -105,7 +242,7 @@ async def cleanup_old_backups(self):
             }
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         # Log failure
@@ -124,7 +261,9 @@ async def verify_backup_integrity(self, backup_path: str):
         db = SessionLocal()
         try:
             # Get backup metadata
-            backup = db.query(BackupMetadata).filter_by(backup_path=backup_path).first()
+            backup = (await db.exec(
+                select(BackupMetadata).where(BackupMetadata.backup_path == backup_path)
+            )).first()
             if not backup:
                 raise ValueError("Backup not found")
             
@@ -158,7 +297,7 @@ async def verify_backup_integrity(self, backup_path: str):
             }
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         # Log verification failure
@@ -203,7 +342,7 @@ async def rotate_backups(self, max_backups: int = 10):
             }
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         # Log rotation failure
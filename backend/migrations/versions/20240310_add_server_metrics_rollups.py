@@ -0,0 +1,74 @@
+"""Add server metrics rollups
+
+Revision ID: 20240310_add_server_metrics_rollups
+Revises: 20240309_add_backup_system
+Create Date: 2024-03-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240310_add_server_metrics_rollups'
+down_revision = '20240309_add_backup_system'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Create server_metrics_rollup table (1m / 1h / 1d aggregates)
+    op.create_table(
+        'server_metrics_rollup',
+        sa.Column('server_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(length=2), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('online_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cpu_usage_min', sa.Float(), nullable=True),
+        sa.Column('cpu_usage_max', sa.Float(), nullable=True),
+        sa.Column('cpu_usage_avg', sa.Float(), nullable=True),
+        sa.Column('cpu_usage_p95', sa.Float(), nullable=True),
+        sa.Column('memory_usage_min', sa.Float(), nullable=True),
+        sa.Column('memory_usage_max', sa.Float(), nullable=True),
+        sa.Column('memory_usage_avg', sa.Float(), nullable=True),
+        sa.Column('memory_usage_p95', sa.Float(), nullable=True),
+        sa.Column('disk_usage_min', sa.Float(), nullable=True),
+        sa.Column('disk_usage_max', sa.Float(), nullable=True),
+        sa.Column('disk_usage_avg', sa.Float(), nullable=True),
+        sa.Column('disk_usage_p95', sa.Float(), nullable=True),
+        sa.Column('load_avg_1m_min', sa.Float(), nullable=True),
+        sa.Column('load_avg_1m_max', sa.Float(), nullable=True),
+        sa.Column('load_avg_1m_avg', sa.Float(), nullable=True),
+        sa.Column('load_avg_1m_p95', sa.Float(), nullable=True),
+        sa.Column('response_time_min', sa.Float(), nullable=True),
+        sa.Column('response_time_max', sa.Float(), nullable=True),
+        sa.Column('response_time_avg', sa.Float(), nullable=True),
+        sa.Column('response_time_p95', sa.Float(), nullable=True),
+        sa.Column('active_connections_min', sa.Float(), nullable=True),
+        sa.Column('active_connections_max', sa.Float(), nullable=True),
+        sa.Column('active_connections_avg', sa.Float(), nullable=True),
+        sa.Column('active_connections_p95', sa.Float(), nullable=True),
+        sa.Column('bandwidth_in_min', sa.Float(), nullable=True),
+        sa.Column('bandwidth_in_max', sa.Float(), nullable=True),
+        sa.Column('bandwidth_in_avg', sa.Float(), nullable=True),
+        sa.Column('bandwidth_in_p95', sa.Float(), nullable=True),
+        sa.Column('bandwidth_out_min', sa.Float(), nullable=True),
+        sa.Column('bandwidth_out_max', sa.Float(), nullable=True),
+        sa.Column('bandwidth_out_avg', sa.Float(), nullable=True),
+        sa.Column('bandwidth_out_p95', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['server_id'], ['server.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('server_id', 'resolution', 'bucket')
+    )
+    
+    # Retention deletes scan by resolution and bucket across all servers
+    op.create_index(
+        'ix_server_metrics_rollup_resolution_bucket',
+        'server_metrics_rollup',
+        ['resolution', 'bucket']
+    )
+
+def downgrade():
+    # Drop indexes
+    op.drop_index('ix_server_metrics_rollup_resolution_bucket', table_name='server_metrics_rollup')
+    
+    # Drop server_metrics_rollup table
+    op.drop_table('server_metrics_rollup')
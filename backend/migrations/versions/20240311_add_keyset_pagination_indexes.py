@@ -0,0 +1,59 @@
+"""Add keyset pagination indexes
+
+Revision ID: 20240311_add_keyset_pagination_indexes
+Revises: 20240310_add_server_metrics_rollups
+Create Date: 2024-03-11 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240311_add_keyset_pagination_indexes'
+down_revision = '20240310_add_server_metrics_rollups'
+branch_labels = None
+depends_on = None
+
+# List endpoints page newest first on (created_at, id); users see only
+# their own rows, so those tables also get a per-user variant
+PAGINATED_TABLES = {
+    'user': False,
+    'subscription': True,
+    'payment': True,
+    'ticket': True,
+}
+
+# Single-column indexes made redundant by the composite ones
+REPLACED_INDEXES = {
+    'user': 'ix_user_created_at',
+    'subscription': 'ix_subscription_created_at',
+}
+
+def upgrade():
+    # payment and ticket may only exist where create_all built them
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    for table, per_user in PAGINATED_TABLES.items():
+        if table not in existing:
+            continue
+        op.create_index(f'ix_{table}_created_at_id', table, ['created_at', 'id'])
+        if per_user:
+            op.create_index(f'ix_{table}_user_created_at_id', table, ['user_id', 'created_at', 'id'])
+
+    for table, index in REPLACED_INDEXES.items():
+        if table in existing:
+            op.drop_index(index, table_name=table)
+
+def downgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    for table, index in REPLACED_INDEXES.items():
+        if table in existing:
+            op.create_index(index, table, ['created_at'])
+
+    for table, per_user in PAGINATED_TABLES.items():
+        if table not in existing:
+            continue
+        if per_user:
+            op.drop_index(f'ix_{table}_user_created_at_id', table_name=table)
+        op.drop_index(f'ix_{table}_created_at_id', table_name=table)
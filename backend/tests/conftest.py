@@ -0,0 +1,29 @@
+"""
+Shared test setup
+"""
+import os
+import sys
+
+# Settings are read at import time; give the required ones test values
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-bot-token")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+class UnavailableRedis:
+    """Redis client whose every command fails, as when the server is down"""
+
+    def pipeline(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("Redis unavailable")
+        return unavailable
+
+@pytest.fixture
+def unavailable_redis():
+    return UnavailableRedis()
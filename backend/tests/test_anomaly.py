@@ -0,0 +1,113 @@
+"""
+EWMA anomaly detection with hysteresis
+"""
+from typing import Iterable, List, Optional
+import pytest
+from app.core.monitoring.anomaly import AnomalyDetector, MetricState
+
+pytestmark = pytest.mark.unit
+
+@pytest.fixture
+def detector():
+    # fast_alpha=1 makes the level the raw value, so each sample is easy to follow
+    return AnomalyDetector(
+        fast_alpha=1.0,
+        slow_alpha=0.01,
+        z_enter=3.0,
+        z_exit=1.0,
+        enter_samples=3,
+        exit_samples=2,
+        warmup_samples=10
+    )
+
+def feed(
+    detector: AnomalyDetector,
+    state: MetricState,
+    values: Iterable[float],
+    threshold: Optional[float] = None,
+    min_deviation: float = 1.0
+) -> List[bool]:
+    """Anomalous flag after each sample"""
+    flags = []
+    for value in values:
+        detector.update(state, value, threshold, min_deviation, now=1000.0)
+        flags.append(state.anomalous)
+    return flags
+
+def test_first_sample_seeds_level_and_baseline(detector):
+    state = MetricState()
+
+    assert detector.update(state, 42.0, None, 1.0) is False
+    assert state.level == state.baseline == 42.0
+    assert state.samples == 1
+    assert state.zscore == 0.0
+
+def test_threshold_needs_consecutive_samples(detector):
+    state = MetricState()
+
+    flags = feed(detector, state, [50, 90, 90, 50, 90, 90], threshold=80.0)
+
+    assert flags == [False] * 6
+    assert state.streak == 2
+
+def test_threshold_enters_after_enter_samples(detector):
+    state = MetricState()
+    feed(detector, state, [50, 90, 90], threshold=80.0)
+
+    assert detector.update(state, 90.0, 80.0, 2.0, now=1234.0) is True
+    assert state.anomalous
+    assert state.reason == "threshold"
+    assert state.since == 1234.0
+    assert state.streak == 0
+
+def test_clears_only_after_exit_samples_below_clear_ratio(detector):
+    state = MetricState()
+    feed(detector, state, [50, 90, 90, 90], threshold=80.0)
+
+    # 75 is under the threshold but not 10% under it, so it isn't calm
+    assert feed(detector, state, [50, 75, 50], threshold=80.0) == [True] * 3
+    assert detector.update(state, 50.0, 80.0, 2.0) is True
+    assert not state.anomalous
+    assert state.reason is None
+    assert state.since is None
+
+def test_deviation_from_baseline_enters_after_warmup(detector):
+    state = MetricState()
+    feed(detector, state, [100] * 20)
+
+    flags = feed(detector, state, [200] * 3)
+
+    assert flags == [False, False, True]
+    assert state.reason == "deviation"
+    assert state.zscore >= detector.z_enter
+
+def test_deviation_is_ignored_during_warmup(detector):
+    state = MetricState()
+
+    flags = feed(detector, state, [100] * 3 + [200] * 6)
+
+    assert flags == [False] * 9
+    assert state.streak == 0
+
+def test_single_spike_does_not_flap(detector):
+    state = MetricState()
+    feed(detector, state, [100] * 20)
+
+    assert feed(detector, state, [200, 100, 200, 200, 100]) == [False] * 5
+
+def test_baseline_learns_slower_while_anomalous(detector):
+    state = MetricState()
+    feed(detector, state, [100] * 20 + [200] * 3)
+    before = state.baseline
+
+    feed(detector, state, [200])
+
+    assert state.anomalous
+    assert state.baseline - before == pytest.approx(0.001 * (200 - before))
+
+def test_calm_sample_streak_resets_on_relapse(detector):
+    state = MetricState()
+    feed(detector, state, [100] * 20 + [200] * 3)
+
+    assert feed(detector, state, [100, 200, 100]) == [True] * 3
+    assert feed(detector, state, [100]) == [False]
@@ -0,0 +1,148 @@
+"""
+Panel circuit breaker state machine
+"""
+from types import SimpleNamespace
+import pytest
+from app.core.server_connector import circuit_breaker
+from app.core.server_connector.circuit_breaker import (
+    BreakerState,
+    CircuitOpenError,
+    PanelCircuitBreaker
+)
+
+pytestmark = pytest.mark.unit
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock.monotonic))
+    # Full cool-down, no jitter
+    monkeypatch.setattr(circuit_breaker, "random", SimpleNamespace(uniform=lambda low, high: high))
+    return clock
+
+@pytest.fixture
+def breaker(clock):
+    return PanelCircuitBreaker(
+        "panel.test:2053",
+        failure_threshold=3,
+        reset_timeout=10.0,
+        max_reset_timeout=30.0,
+        min_timeout=1.0,
+        max_timeout=5.0
+    )
+
+def trip(breaker: PanelCircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("timeout")
+
+def test_closed_breaker_lets_requests_through(breaker):
+    assert breaker.before_request() is False
+    assert breaker.state == BreakerState.CLOSED
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    breaker.record_success(0.1)
+    breaker.record_failure("timeout")
+
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.consecutive_failures == 1
+
+def test_trips_at_failure_threshold(breaker, clock):
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    assert breaker.state == BreakerState.CLOSED
+
+    breaker.record_failure("timeout")
+
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.is_open
+    assert breaker.open_until == clock.now + 10.0
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_request()
+    assert error.value.retry_in == pytest.approx(10.0)
+
+def test_half_open_allows_a_single_probe(breaker, clock):
+    trip(breaker)
+    clock.now += 10.0
+
+    assert breaker.before_request() is True
+    assert breaker.state == BreakerState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+def test_successful_probe_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 10.0
+    breaker.before_request()
+
+    breaker.record_success(0.2)
+
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.open_count == 0
+    assert breaker.last_error is None
+    assert breaker.before_request() is False
+
+def test_failed_probe_reopens_with_longer_cool_down(breaker, clock):
+    trip(breaker)
+    clock.now += 10.0
+    breaker.before_request()
+
+    breaker.record_failure("refused")
+
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.open_until == clock.now + 20.0
+
+def test_cool_down_is_capped(breaker, clock):
+    trip(breaker)
+    for _ in range(4):
+        clock.now = breaker.open_until
+        breaker.before_request()
+        breaker.record_failure("refused")
+
+    assert breaker.open_count == 5
+    assert breaker.open_until == clock.now + 30.0
+
+def test_abandoned_probe_frees_the_slot(breaker, clock):
+    trip(breaker)
+    clock.now += 10.0
+    breaker.before_request()
+
+    breaker.abandon_probe()
+
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert breaker.before_request() is True
+
+def test_abandon_probe_is_a_no_op_when_closed(breaker):
+    breaker.abandon_probe()
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.before_request() is False
+
+def test_lost_probe_expires_after_max_timeout(breaker, clock):
+    trip(breaker)
+    clock.now += 10.0
+    breaker.before_request()
+
+    clock.now += 4.0
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_request()
+    assert error.value.retry_in == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert breaker.before_request() is True
+
+def test_timeout_follows_latency_p95(breaker):
+    assert breaker.timeout() == 5.0
+
+    for _ in range(20):
+        breaker.record_success(0.5)
+
+    assert breaker.timeout() == pytest.approx(1.5)
+    assert breaker.timeout(default=1.0) == 1.0
@@ -0,0 +1,134 @@
+"""
+CRUDBase bulk writes against SQLite
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Field, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.crud.base import CRUDBase
+
+pytestmark = pytest.mark.unit
+
+class Widget(SQLModel, table=True):
+    __tablename__ = "test_widgets"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(unique=True)
+    quantity: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+crud_widget = CRUDBase(Widget)
+
+@asynccontextmanager
+async def widget_session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Widget.__table__.create)
+    try:
+        async with AsyncSession(engine) as db:
+            yield db
+    finally:
+        await engine.dispose()
+
+async def quantities(db: AsyncSession):
+    result = await db.execute(select(Widget.name, Widget.quantity).order_by(Widget.name))
+    return dict(result.all())
+
+def test_column_groups_split_rows_by_columns_set():
+    rows = [
+        {"name": "a", "quantity": 1},
+        {"id": 7, "name": "b", "quantity": 2},
+        {"name": "c", "quantity": 3},
+        {"id": 8, "name": "d", "quantity": 4}
+    ]
+
+    groups = CRUDBase._column_groups(rows)
+
+    assert groups == [[rows[0], rows[2]], [rows[1], rows[3]]]
+
+@pytest.mark.asyncio
+async def test_create_many_mixes_rows_with_and_without_id():
+    async with widget_session() as db:
+        inserted = await crud_widget.create_many(db, objs_in=[
+            {"name": "a", "quantity": 1},
+            {"id": 10, "name": "b", "quantity": 2},
+            {"name": "c", "quantity": 3}
+        ], batch_size=1)
+
+        assert inserted == 3
+        assert await quantities(db) == {"a": 1, "b": 2, "c": 3}
+        assert (await crud_widget.get(db, 10)).name == "b"
+
+@pytest.mark.asyncio
+async def test_update_many_sets_each_row_its_own_values():
+    async with widget_session() as db:
+        await crud_widget.create_many(db, objs_in=[
+            {"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}
+        ])
+
+        updated = await crud_widget.update_many(db, objs_in=[
+            {"id": 1, "quantity": 5},
+            {"id": 2, "quantity": 6, "name": "bb"},
+            {"id": 3, "unknown": 1}
+        ])
+
+        assert updated == 2
+        assert await quantities(db) == {"a": 5, "bb": 6, "c": 0}
+
+@pytest.mark.asyncio
+async def test_upsert_collapses_repeated_keys_to_the_last_row():
+    async with widget_session() as db:
+        affected = await crud_widget.upsert_many(db, objs_in=[
+            {"name": "a", "quantity": 1},
+            {"name": "b", "quantity": 2},
+            {"name": "a", "quantity": 3}
+        ], index_elements=("name",))
+
+        assert affected == 2
+        assert await quantities(db) == {"a": 3, "b": 2}
+
+@pytest.mark.asyncio
+async def test_upsert_updates_existing_rows_and_inserts_new_ones():
+    async with widget_session() as db:
+        await crud_widget.create_many(db, objs_in=[{"name": "a", "quantity": 1}])
+        created_at = (await crud_widget.get(db, 1)).created_at
+
+        await crud_widget.upsert_many(db, objs_in=[
+            {"name": "a", "quantity": 9},
+            {"name": "b", "quantity": 2}
+        ], index_elements=("name",))
+
+        assert await quantities(db) == {"a": 9, "b": 2}
+        # created_at is never overwritten by default
+        db.expire_all()
+        assert (await crud_widget.get(db, 1)).created_at == created_at
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_every_row_without_a_key():
+    async with widget_session() as db:
+        await crud_widget.create_many(db, objs_in=[{"id": 1, "name": "a", "quantity": 1}])
+
+        # Rows without an id all insert; the one with id 1 updates
+        affected = await crud_widget.upsert_many(db, objs_in=[
+            {"name": "b", "quantity": 2},
+            {"id": 1, "name": "a", "quantity": 5},
+            {"name": "c", "quantity": 3}
+        ])
+
+        assert affected == 3
+        assert await quantities(db) == {"a": 5, "b": 2, "c": 3}
+
+@pytest.mark.asyncio
+async def test_upsert_only_touches_update_fields():
+    async with widget_session() as db:
+        await crud_widget.create_many(db, objs_in=[{"id": 1, "name": "a", "quantity": 1}])
+
+        await crud_widget.upsert_many(db, objs_in=[
+            {"id": 1, "name": "renamed", "quantity": 7}
+        ], update_fields=["quantity"])
+
+        assert await quantities(db) == {"a": 7}
@@ -0,0 +1,124 @@
+"""
+Inbound snapshot cache and its shared fetch
+"""
+import asyncio
+import json
+import pytest
+from app.core.server_connector.inbound_cache import InboundSnapshot, InboundSnapshotCache
+
+pytestmark = pytest.mark.unit
+
+INBOUNDS = [
+    {
+        "id": 1,
+        "port": 443,
+        "settings": json.dumps({"clients": [{"id": "uuid-1", "email": "alice"}]})
+    },
+    {
+        "id": 2,
+        "port": 8443,
+        "settings": {"clients": [{"id": "uuid-2", "email": "bob"}]}
+    }
+]
+
+class SlowFetch:
+    """Inbound fetch that blocks until released, counting its calls"""
+
+    def __init__(self, inbounds=INBOUNDS):
+        self.inbounds = inbounds
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return self.inbounds
+
+def test_snapshot_parses_clients_and_ports():
+    snapshot = InboundSnapshot(INBOUNDS)
+
+    assert snapshot.ports == {443, 8443}
+    assert snapshot.total_clients == 2
+    inbound, client = snapshot.find_client("bob")
+    assert inbound["id"] == 2 and client["id"] == "uuid-2"
+    assert snapshot.find_client_by_id("uuid-1")[1]["email"] == "alice"
+    assert snapshot.find_client("carol") is None
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    cache = InboundSnapshotCache(ttl=60)
+    fetch = SlowFetch()
+    callers = [asyncio.ensure_future(cache.get("panel", fetch)) for _ in range(5)]
+    await fetch.started.wait()
+    fetch.release.set()
+
+    snapshots = await asyncio.gather(*callers)
+
+    assert fetch.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert await cache.get("panel", fetch) is snapshots[0]
+    assert fetch.calls == 1
+
+@pytest.mark.asyncio
+async def test_max_age_forces_a_fresh_fetch():
+    cache = InboundSnapshotCache(ttl=60)
+    fetch = SlowFetch()
+    fetch.release.set()
+    first = await cache.get("panel", fetch)
+
+    assert await cache.get("panel", fetch, max_age=0) is not first
+    assert fetch.calls == 2
+
+@pytest.mark.asyncio
+async def test_fetch_racing_an_invalidation_is_not_cached():
+    cache = InboundSnapshotCache(ttl=60)
+    fetch = SlowFetch()
+    pending = asyncio.ensure_future(cache.get("panel", fetch))
+    await fetch.started.wait()
+
+    cache.invalidate("panel")
+    fetch.release.set()
+    await pending
+
+    assert cache.peek("panel") is None
+
+@pytest.mark.asyncio
+async def test_fetch_error_is_shared_and_not_cached():
+    cache = InboundSnapshotCache(ttl=60)
+    calls = 0
+
+    async def failing_fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("panel down")
+
+    results = await asyncio.gather(
+        *(cache.get("panel", failing_fetch) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.peek("panel") is None
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_strand_followers():
+    cache = InboundSnapshotCache(ttl=60)
+    fetch = SlowFetch()
+    leader = asyncio.ensure_future(cache.get("panel", fetch))
+    await fetch.started.wait()
+    follower = asyncio.ensure_future(cache.get("panel", fetch))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(follower, timeout=1)
+    assert "panel" not in cache._inflight
+
+    fetch.release.set()
+    assert (await cache.get("panel", fetch)).ports == {443, 8443}
+    assert fetch.calls == 2
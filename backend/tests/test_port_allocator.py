@@ -0,0 +1,93 @@
+"""
+Port index and allocator
+"""
+import asyncio
+import pytest
+from app.core.server_connector import port_allocator
+from app.core.server_connector.port_allocator import PortAllocator, PortIndex
+
+pytestmark = pytest.mark.unit
+
+@pytest.fixture
+def allocator(monkeypatch, unavailable_redis):
+    # Without Redis reservations succeed locally
+    monkeypatch.setattr(port_allocator, "async_redis_client", unavailable_redis)
+    return PortAllocator(reservation_ttl=60, reseed_interval=300)
+
+class SlowUsedPorts:
+    """Used-port loader that blocks until released, counting its calls"""
+
+    def __init__(self, ports=()):
+        self.ports = set(ports)
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return self.ports
+
+def test_index_hands_out_each_free_port_once():
+    index = PortIndex((10000, 10009), {10000, 10005, 20000})
+
+    taken = [index.take() for _ in range(8)]
+
+    assert sorted(taken) == [10001, 10002, 10003, 10004, 10006, 10007, 10008, 10009]
+    assert index.take() is None
+
+def test_index_skips_ports_marked_used_after_seeding():
+    index = PortIndex((10000, 10002), set())
+    index.mark_used(10001)
+
+    assert sorted([index.take(), index.take()]) == [10000, 10002]
+    assert index.take() is None
+
+    index.release(10001)
+    assert index.take() == 10001
+
+@pytest.mark.asyncio
+async def test_concurrent_allocations_get_distinct_ports(allocator):
+    used = SlowUsedPorts({10000})
+    used.release.set()
+
+    ports = await asyncio.gather(
+        *(allocator.allocate("server", (10000, 10009), used) for _ in range(9))
+    )
+
+    assert sorted(ports) == list(range(10001, 10010))
+    assert used.calls == 1
+    with pytest.raises(Exception, match="No free ports"):
+        await allocator.allocate("server", (10000, 10009), used)
+
+@pytest.mark.asyncio
+async def test_pending_ports_survive_a_reseed(allocator):
+    used = SlowUsedPorts()
+    used.release.set()
+    port = await allocator.allocate("server", (10000, 10001), used)
+
+    # The panel doesn't list the new inbound yet
+    allocator._indexes["server"].seeded_at = 0
+    other = await allocator.allocate("server", (10000, 10001), used)
+
+    assert used.calls == 2
+    assert {port, other} == {10000, 10001}
+
+@pytest.mark.asyncio
+async def test_cancelled_seeding_does_not_strand_waiters(allocator):
+    used = SlowUsedPorts()
+    leader = asyncio.ensure_future(allocator.allocate("server", (10000, 10009), used))
+    await used.started.wait()
+    follower = asyncio.ensure_future(allocator.allocate("server", (10000, 10009), used))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(follower, timeout=1)
+    assert "server" not in allocator._seeding
+
+    used.release.set()
+    assert 10000 <= await allocator.allocate("server", (10000, 10009), used) <= 10009
+    assert used.calls == 2
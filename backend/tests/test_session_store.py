@@ -0,0 +1,106 @@
+"""
+Panel session store single-flight login
+"""
+import asyncio
+import time
+import pytest
+from app.core.server_connector import session_store
+from app.core.server_connector.session_store import PanelSessionStore
+
+pytestmark = pytest.mark.unit
+
+@pytest.fixture
+def store(monkeypatch, unavailable_redis):
+    # Without Redis the store falls back to its in-process cache and lock
+    monkeypatch.setattr(session_store, "async_redis_client", unavailable_redis)
+    return PanelSessionStore(session_ttl=3600, refresh_margin=300, lock_timeout=5)
+
+class SlowLogin:
+    """Login that blocks until released, counting its calls"""
+
+    def __init__(self, cookie: str = "session=abc"):
+        self.cookie = cookie
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return self.cookie
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_login(store):
+    login = SlowLogin()
+    callers = [asyncio.ensure_future(store.get_cookie("panel", login)) for _ in range(5)]
+    await login.started.wait()
+    login.release.set()
+
+    assert await asyncio.gather(*callers) == ["session=abc"] * 5
+    assert login.calls == 1
+    assert "panel" not in store._inflight
+
+@pytest.mark.asyncio
+async def test_fresh_cookie_skips_login(store):
+    login = SlowLogin()
+    login.release.set()
+    await store.get_cookie("panel", login)
+
+    assert await store.get_cookie("panel", login) == "session=abc"
+    assert login.calls == 1
+
+@pytest.mark.asyncio
+async def test_login_error_reaches_every_caller_and_is_not_cached(store):
+    calls = 0
+
+    async def failing_login():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("bad credentials")
+
+    results = await asyncio.gather(
+        *(store.get_cookie("panel", failing_login) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        await store.get_cookie("panel", failing_login)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_strand_followers(store):
+    login = SlowLogin()
+    leader = asyncio.ensure_future(store.get_cookie("panel", login))
+    await login.started.wait()
+    follower = asyncio.ensure_future(store.get_cookie("panel", login))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(follower, timeout=1)
+    assert "panel" not in store._inflight
+    assert "panel" not in store._lock_tokens
+
+    # The next caller leads a new login
+    login.release.set()
+    assert await store.get_cookie("panel", login) == "session=abc"
+    assert login.calls == 2
+
+@pytest.mark.asyncio
+async def test_near_expiry_cookie_is_refreshed_once(store):
+    store._local["panel"] = ("session=old", time.time() + 60)
+    login = SlowLogin("session=new")
+
+    refresh = asyncio.ensure_future(store.get_cookie("panel", login))
+    await login.started.wait()
+    # Callers arriving during the refresh keep the current cookie
+    assert await store.get_cookie("panel", login) == "session=old"
+
+    login.release.set()
+    assert await refresh == "session=new"
+    assert login.calls == 1
@@ -11,14 +11,16 @@ import sys
 from typing import List, Optional
 import uvicorn
 from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 sys.path.append(".")  # Add current directory to path
 
-from backend.app.db.session import get_db
+from backend.app.db.session import async_session
 from backend.app.db.models.user import User, UserRole, UserStatus
 from backend.app.db.models.subscription import Subscription, SubscriptionStatus
 from backend.app.db.models.server import Server, ServerStatus
-from backend.app.services.xui_service import XUIService
+from backend.app.services.sync_service import sync_engine
 from backend.scripts.create_admin import create_admin
 from backend.scripts.init_db import init_db
 
@@ -49,36 +51,50 @@ class CommandManager:
         bot.run()
 
     @staticmethod
-    async def sync_servers():
+    async def sync_servers(concurrency: Optional[int] = None, timeout: Optional[float] = None):
         """Synchronize all servers with 3x-ui panels"""
         print("🔄 Syncing servers...")
-        async with get_db() as db:
-            servers = await db.query(Server).all()
-            results = await XUIService.sync_all_servers(servers)
+        if concurrency:
+            sync_engine.concurrency = concurrency
+        if timeout:
+            sync_engine.server_timeout = timeout
+            
+        async with async_session() as db:
+            servers = (await db.execute(
+                select(Server).where(Server.is_active == True)
+            )).scalars().all()
+            results = await sync_engine.sync_servers(servers, db)
             
             print("\n📊 Sync Results:")
             print("✅ Successful syncs:")
             for success in results["success"]:
-                print(f"  • Server #{success['server_id']}: {success['status']}")
+                print(f"  • Server #{success['server_id']}: {success['status']} ({success['elapsed']:.1f}s)")
                 
             if results["failed"]:
                 print("\n❌ Failed syncs:")
                 for failure in results["failed"]:
                     print(f"  • Server #{failure['server_id']}: {failure['error']}")
+                    
+            if results["timed_out"]:
+                print("\n⏱️ Timed out:")
+                for failure in results["timed_out"]:
+                    print(f"  • Server #{failure['server_id']}: {failure['error']}")
+                    
+            print(f"\n⏲️ Total sync time: {results['duration']:.1f}s")
 
     @staticmethod
     async def list_users(role: Optional[str] = None, status: Optional[str] = None):
         """List users with optional filtering"""
         print("👥 Listing users...")
-        async with get_db() as db:
-            query = db.query(User)
+        async with async_session() as db:
+            query = select(User)
             
             if role:
-                query = query.filter(User.role == UserRole(role))
+                query = query.where(User.role == UserRole(role))
             if status:
-                query = query.filter(User.status == UserStatus(status))
+                query = query.where(User.status == UserStatus(status))
                 
-            users = await query.all()
+            users = (await db.execute(query)).scalars().all()
             
             print("\n📋 User List:")
             print("=" * 50)
@@ -98,13 +114,17 @@ class CommandManager:
     async def list_subscriptions(status: Optional[str] = None):
         """List subscriptions with optional filtering"""
         print("📱 Listing subscriptions...")
-        async with get_db() as db:
-            query = db.query(Subscription)
+        async with async_session() as db:
+            # user and server are printed below; async sessions can't lazy-load
+            query = select(Subscription).options(
+                selectinload(Subscription.user),
+                selectinload(Subscription.server)
+            )
             
             if status:
-                query = query.filter(Subscription.status == SubscriptionStatus(status))
+                query = query.where(Subscription.status == SubscriptionStatus(status))
                 
-            subscriptions = await query.all()
+            subscriptions = (await db.execute(query)).scalars().all()
             
             print("\n📋 Subscription List:")
             print("=" * 50)
@@ -124,12 +144,12 @@ class CommandManager:
     async def cleanup_expired():
         """Clean up expired subscriptions and inactive users"""
         print("🧹 Starting cleanup...")
-        async with get_db() as db:
+        async with async_session() as db:
             # Clean up expired subscriptions
-            expired = await db.query(Subscription).filter(
+            expired = (await db.execute(select(Subscription).where(
                 Subscription.end_date < datetime.utcnow(),
                 Subscription.status != SubscriptionStatus.EXPIRED
-            ).all()
+            ))).scalars().all()
             
             for sub in expired:
                 sub.status = SubscriptionStatus.EXPIRED
@@ -137,11 +157,11 @@ class CommandManager:
             
             # Clean up inactive users
             month_ago = datetime.utcnow() - timedelta(days=30)
-            inactive = await db.query(User).filter(
+            inactive = (await db.execute(select(User).where(
                 User.last_login < month_ago,
                 User.status == UserStatus.ACTIVE,
                 User.role == UserRole.USER
-            ).all()
+            ))).scalars().all()
             
             for user in inactive:
                 user.status = UserStatus.INACTIVE
@@ -171,7 +191,9 @@ def main():
     subparsers.add_parser("create-admin", help="Create admin user")
 
     # Sync command
-    subparsers.add_parser("sync", help="Sync servers with 3x-ui panels")
+    sync_parser = subparsers.add_parser("sync", help="Sync servers with 3x-ui panels")
+    sync_parser.add_argument("--concurrency", type=int, help="Maximum panels synced in parallel")
+    sync_parser.add_argument("--timeout", type=float, help="Per-server sync deadline in seconds")
 
     # Users command
     users_parser = subparsers.add_parser("users", help="List users")
@@ -197,7 +219,7 @@ def main():
         elif args.command == "create-admin":
             asyncio.run(create_admin())
         elif args.command == "sync":
-            asyncio.run(CommandManager.sync_servers())
+            asyncio.run(CommandManager.sync_servers(args.concurrency, args.timeout))
         elif args.command == "users":
             asyncio.run(CommandManager.list_users(args.role, args.status))
         elif args.command == "subscriptions":